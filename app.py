@@ -1,9 +1,7 @@
-import os
-import uvicorn
-from backend.app import app as backend_app
-
 def start_backend():
     """Inicia o servidor backend FastAPI"""
+    # uvicorn carrega a app pela string; importar backend.app aqui só atrasaria o startup
+    import uvicorn
     uvicorn.run("backend.app:app", host="0.0.0.0", port=8000, reload=True)
 
 def main():
@@ -0,0 +1,336 @@
+import json
+import logging
+import queue
+import smtplib
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from backend.config import ALERT_CONFIG, SECURITY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledAlertRule:
+    """Regra de roteamento com conjuntos prontos para teste de pertinência"""
+
+    def __init__(self, rule: dict):
+        self.name = rule["name"]
+        self.alert_levels = frozenset(rule.get("alert_levels") or ())
+        self.network_zones = frozenset(rule.get("network_zones") or ())
+        self.asset_criticality = frozenset(rule.get("asset_criticality") or ())
+        self.min_score = rule.get("min_score", 0.0)
+        self.targets = tuple(rule["targets"])
+
+    def matches(self, alert_level, network_zone, criticality) -> bool:
+        # Conjunto vazio significa "qualquer valor"
+        return (
+            (not self.alert_levels or alert_level in self.alert_levels)
+            and (not self.network_zones or network_zone in self.network_zones)
+            and (not self.asset_criticality or criticality in self.asset_criticality)
+        )
+
+
+class AlertMatcher:
+    """Casa eventos com as regras; o resultado por (nível, zona, criticidade) fica em cache
+
+    O domínio dessas três dimensões é pequeno, então depois do aquecimento cada evento custa
+    um lookup em dicionário, independentemente do número de regras.
+    """
+
+    MAX_CACHE = 4096
+
+    def __init__(self, rules: list):
+        self.rules = [CompiledAlertRule(rule) for rule in rules]
+        self._cache = {}
+
+    def match(self, alert_level, network_zone, criticality) -> tuple:
+        key = (alert_level, network_zone, criticality)
+        matched = self._cache.get(key)
+        if matched is None:
+            matched = tuple(rule for rule in self.rules if rule.matches(*key))
+            if len(self._cache) < self.MAX_CACHE:
+                self._cache[key] = matched
+        return matched
+
+
+class TokenBucket:
+    """Limite de envio por canal (rate por segundo, rajada de até `burst`)"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class EmailChannel:
+    """Envio por SMTP (em testes, um servidor local como `python -m aiosmtpd -n -l localhost:1025`)"""
+
+    def __init__(self, config: dict):
+        self.config = config
+
+    def send(self, address: str, subject: str, body: str, payload: dict):
+        message = EmailMessage()
+        message["From"] = self.config["sender"]
+        message["To"] = address
+        message["Subject"] = subject
+        message.set_content(body)
+        with smtplib.SMTP(self.config["host"], self.config["port"], timeout=self.config["timeout"]) as smtp:
+            smtp.send_message(message)
+
+
+class WebhookChannel:
+    """Envio por webhook HTTP (Slack ou um servidor local de teste)"""
+
+    def __init__(self, config: dict):
+        self.config = config
+
+    def send(self, address: str, subject: str, body: str, payload: dict):
+        if not self.config["url"]:
+            raise RuntimeError("Webhook não configurado")
+        data = json.dumps({"channel": address, "text": f"{subject}\n{body}", "alert": payload}, default=str)
+        request = urllib.request.Request(
+            self.config["url"], data=data.encode("utf-8"), headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.config["timeout"]) as response:
+            if response.status >= 300:
+                raise RuntimeError(f"Webhook respondeu {response.status}")
+
+
+def resolve_target(target: str):
+    """'email:security_team' -> ('email', 'security@empresa.com')"""
+    channel, _, name = target.partition(":")
+    address = SECURITY_CONFIG["notifications"].get(channel, {}).get(name, name)
+    return channel, address
+
+
+class AlertDispatcher:
+    """Roteia eventos para notificações sem bloquear a ingestão
+
+    A ingestão só casa as regras (O(1)) e faz put_nowait numa fila limitada; uma thread
+    agrupa eventos iguais por janela e um pool de workers envia respeitando o limite de
+    cada canal, com retentativas e fila de mensagens mortas (dead-letter). O primeiro evento
+    de um grupo é notificado na hora; só os seguintes esperam o fim da janela.
+    """
+
+    def __init__(self, config: dict = ALERT_CONFIG, channels: dict = None):
+        self.config = config
+        self.matcher = AlertMatcher(config["rules"])
+        self.channels = channels or {
+            "email": EmailChannel(config["email"]),
+            "slack": WebhookChannel(config["slack"]),
+        }
+        self.limits = {
+            name: TokenBucket(limit["rate_per_second"], limit["burst"])
+            for name, limit in config["rate_limits"].items()
+        }
+        self._queue = queue.Queue(maxsize=config["queue_size"])
+        self._groups = {}
+        self._dead_letters = deque(maxlen=config["dead_letter_size"])
+        self._pool = None
+        self._thread = None
+        self._running = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.counters = {
+            "matched": 0, "dropped": 0, "grouped": 0, "notifications": 0,
+            "sent": 0, "retries": 0, "dead_lettered": 0
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    # Lado da ingestão
+
+    def submit(self, logs, scores):
+        """Enfileira os eventos que casam alguma regra; nunca bloqueia"""
+        for log, score in zip(logs, scores):
+            rules = self.matcher.match(log.alert_level, log.network_zone, log.asset_criticality)
+            rules = [rule for rule in rules if score >= rule.min_score]
+            if not rules:
+                continue
+            event = {
+                "ip_address": log.ip_address,
+                "alert_level": log.alert_level,
+                "network_zone": log.network_zone,
+                "asset_name": log.asset_name,
+                "description": log.description,
+                "threat_score": score,
+                "timestamp": log.timestamp
+            }
+            try:
+                self._queue.put_nowait((rules, event))
+                self._count("matched")
+            except queue.Full:
+                self._count("dropped")
+
+    # Thread de agrupamento
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._pool = ThreadPoolExecutor(max_workers=self.config["workers"], thread_name_prefix="alert-send")
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        self._running.clear()
+        self._thread.join(timeout)
+        # Agrupa o que ainda estava na fila e envia todos os grupos abertos
+        while True:
+            try:
+                rules, event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._group(rules, event)
+        self._flush(force=True)
+        self._pool.shutdown(wait=True, cancel_futures=False)
+        self._thread = None
+
+    def _run(self):
+        while self._running.is_set():
+            deadline = time.monotonic() + 0.5
+            while time.monotonic() < deadline:
+                try:
+                    rules, event = self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                self._group(rules, event)
+            self._flush()
+
+    def _group(self, rules, event):
+        now = time.monotonic()
+        for rule in rules:
+            key = (rule.name, event["ip_address"], event["alert_level"])
+            group = self._groups.get(key)
+            if group is None:
+                # Grupo novo: o evento sai sozinho agora e a janela agrupa só os seguintes
+                self._notify({
+                    "rule": rule, "count": 1, "first": event, "follow_up": False,
+                    "descriptions": {event["description"]}, "max_score": event["threat_score"]
+                })
+                self._groups[key] = {
+                    "rule": rule, "opened": now, "count": 0, "first": None, "follow_up": True,
+                    "descriptions": set(), "max_score": 0.0
+                }
+                continue
+            group["count"] += 1
+            if group["first"] is None:
+                group["first"] = event
+            group["max_score"] = max(group["max_score"], event["threat_score"])
+            if len(group["descriptions"]) < 5:
+                group["descriptions"].add(event["description"])
+            self._count("grouped")
+
+    def _flush(self, force: bool = False):
+        now = time.monotonic()
+        window = self.config["group_window_seconds"]
+        ready = [key for key, group in self._groups.items() if force or now - group["opened"] >= window]
+        for key in ready:
+            group = self._groups.pop(key)
+            if group["count"]:
+                self._notify(group)
+
+    def _notify(self, group: dict):
+        for target in group["rule"].targets:
+            notification = self._build_notification(group, target)
+            self._count("notifications")
+            self._pool.submit(self._deliver, notification)
+
+    @staticmethod
+    def _build_notification(group: dict, target: str) -> dict:
+        first = group["first"]
+        channel, address = resolve_target(target)
+        subject = f"[SafeShield] {first['alert_level']} - {group['rule'].name} - {first['ip_address']}"
+        lines = [
+            f"Eventos após o primeiro alerta: {group['count']}" if group["follow_up"] else f"Eventos: {group['count']}",
+            f"Zona: {first['network_zone']}",
+            f"Ativo: {first['asset_name']}",
+            f"Maior threat score: {group['max_score']:.2f}",
+        ]
+        lines.extend(f"- {description}" for description in sorted(group["descriptions"]))
+        return {
+            "channel": channel,
+            "address": address,
+            "subject": subject,
+            "body": "\n".join(lines),
+            "payload": {"rule": group["rule"].name, "count": group["count"], **first},
+            "attempts": 0
+        }
+
+    # Workers de envio
+
+    def _deliver(self, notification: dict):
+        channel = self.channels.get(notification["channel"])
+        limit = self.limits.get(notification["channel"])
+        max_attempts = self.config["max_attempts"]
+        while notification["attempts"] < max_attempts:
+            notification["attempts"] += 1
+            try:
+                if channel is None:
+                    raise RuntimeError(f"Canal desconhecido: {notification['channel']}")
+                if limit:
+                    limit.acquire()
+                channel.send(notification["address"], notification["subject"], notification["body"],
+                             notification["payload"])
+                self._count("sent")
+                return
+            except Exception as e:
+                notification["error"] = str(e)
+                if notification["attempts"] < max_attempts:
+                    self._count("retries")
+                    time.sleep(self.config["retry_backoff_seconds"] * 2 ** (notification["attempts"] - 1))
+        logger.warning(f"Notificação enviada para dead-letter: {notification['subject']} ({notification.get('error')})")
+        self._dead_letters.append(notification)
+        self._count("dead_lettered")
+
+    def dead_letters(self) -> list:
+        return list(self._dead_letters)
+
+    def retry_dead_letters(self) -> int:
+        """Reenvia as notificações da dead-letter"""
+        retried = 0
+        while self._dead_letters and self._pool is not None:
+            notification = self._dead_letters.popleft()
+            notification["attempts"] = 0
+            self._pool.submit(self._deliver, notification)
+            retried += 1
+        return retried
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self.counters[name] += amount
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            counters = dict(self.counters)
+        return {
+            **counters,
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "open_groups": len(self._groups),
+            "dead_letters": len(self._dead_letters)
+        }
+
+
+# Instância compartilhada pela ingestão
+alert_dispatcher = AlertDispatcher()
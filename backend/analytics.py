@@ -0,0 +1,369 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, cast, Integer
+from sqlalchemy.orm import Session
+from backend.config import ANALYTICS_CONFIG
+from backend.models import AccessLog
+
+logger = logging.getLogger(__name__)
+
+# Colunas espelhadas no Parquet; as dimensões de texto usam codificação por dicionário
+MIRROR_COLUMNS = (
+    "id", "timestamp", "ip_address", "country", "network_zone", "asset_type", "alert_level",
+    "technique", "cve", "threat_score", "is_threat", "login_attempts", "transaction_value", "occurrence_count",
+    "threat_count", "login_attempts_total", "transaction_value_total"
+)
+DICTIONARY_COLUMNS = ["ip_address", "country", "network_zone", "asset_type", "alert_level", "technique", "cve"]
+
+
+def _arrow_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.int64()),
+        ("timestamp", pa.timestamp("us")),
+        ("ip_address", pa.string()),
+        ("country", pa.string()),
+        ("network_zone", pa.string()),
+        ("asset_type", pa.string()),
+        ("alert_level", pa.string()),
+        ("technique", pa.string()),
+        ("cve", pa.string()),
+        ("threat_score", pa.float64()),
+        ("is_threat", pa.bool_()),
+        ("login_attempts", pa.int64()),
+        ("transaction_value", pa.float64()),
+        ("occurrence_count", pa.int64()),
+        ("threat_count", pa.int64()),
+        ("login_attempts_total", pa.int64()),
+        ("transaction_value_total", pa.float64()),
+    ])
+
+
+# Consultas analíticas suportadas: SQL DuckDB sobre o espelho e expressões SQLAlchemy para o
+# banco de linhas. Todas retornam (chave..., contagens...) com métricas somáveis entre as fontes.
+# Eventos somam occurrence_count (linhas coalescidas; ausente nas partições antigas = 1) e
+# ameaças somam threat_count (ausente: a linha inteira conta se is_threat).
+EVENTS_SQL = "sum(coalesce(occurrence_count, 1))"
+THREATS_SQL = "sum(coalesce(threat_count, CASE WHEN is_threat THEN coalesce(occurrence_count, 1) ELSE 0 END))"
+
+
+def _events():
+    return func.sum(func.coalesce(AccessLog.occurrence_count, 1))
+
+
+def _threat_events():
+    return func.sum(func.coalesce(
+        AccessLog.threat_count, cast(AccessLog.is_threat, Integer) * func.coalesce(AccessLog.occurrence_count, 1)
+    ))
+
+
+ANALYTICS_QUERIES = {
+    "top_countries": {
+        "keys": ["country"],
+        "metrics": ["events", "threats"],
+        "duckdb": f"SELECT country, {EVENTS_SQL}, {THREATS_SQL} FROM logs GROUP BY country",
+        "rows": lambda: (
+            [AccessLog.country],
+            [_events(), _threat_events()]
+        ),
+    },
+    "score_distribution": {
+        "keys": ["bucket"],
+        "metrics": ["events"],
+        "duckdb": f"SELECT CAST(floor(threat_score * 10) AS INTEGER), {EVENTS_SQL} FROM logs GROUP BY 1",
+        "rows": lambda: (
+            [cast(func.floor(AccessLog.threat_score * 10), Integer)],
+            [_events()]
+        ),
+    },
+    "zone_hour_heatmap": {
+        "keys": ["network_zone", "hour"],
+        "metrics": ["events"],
+        "duckdb": f"SELECT network_zone, hour(timestamp), {EVENTS_SQL} FROM logs GROUP BY 1, 2",
+        "rows": lambda: (
+            [AccessLog.network_zone, cast(func.extract("hour", AccessLog.timestamp), Integer)],
+            [_events()]
+        ),
+    },
+}
+
+
+class ColumnarMirror:
+    """Espelho colunar (Parquet por dia + DuckDB) das partições fechadas de access_logs"""
+
+    def __init__(self, config: dict = ANALYTICS_CONFIG):
+        self.config = config
+        self.root = os.path.join(config["data_dir"], "access_logs")
+        self._lock = threading.Lock()
+        self._duckdb = None
+
+    # Partições
+
+    def _partition_path(self, day) -> str:
+        return os.path.join(self.root, f"date={day.isoformat()}", "part.parquet")
+
+    def _stale_path(self, day) -> str:
+        return os.path.join(self.root, f"date={day.isoformat()}", "stale")
+
+    def compacted_days(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        days = []
+        for name in os.listdir(self.root):
+            if name.startswith("date=") and os.path.exists(os.path.join(self.root, name, "part.parquet")):
+                days.append(datetime.strptime(name[5:], "%Y-%m-%d").date())
+        return sorted(days)
+
+    def watermark(self):
+        """Fim do intervalo coberto pelo espelho (partições compactadas são contíguas)"""
+        days = self.compacted_days()
+        if not days:
+            return None
+        return datetime.combine(days[-1] + timedelta(days=1), datetime.min.time())
+
+    def invalidate(self, days) -> list:
+        """Marca para recompactação os dias já compactados cujas linhas mudaram no banco (ex.: rescore)"""
+        marked = []
+        for day in sorted(set(days)):
+            if os.path.exists(self._partition_path(day)):
+                with open(self._stale_path(day), "w"):
+                    pass
+                marked.append(day)
+        return marked
+
+    def stale_days(self) -> list:
+        return [day for day in self.compacted_days() if os.path.exists(self._stale_path(day))]
+
+    def compact_partition(self, db: Session, day) -> int:
+        """Grava um dia de logs em Parquet, ordenado por timestamp, em row groups"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        start = datetime.combine(day, datetime.min.time())
+        end = start + timedelta(days=1)
+        columns = [getattr(AccessLog, name) for name in MIRROR_COLUMNS]
+        query = db.query(*columns).filter(
+            AccessLog.timestamp >= start, AccessLog.timestamp < end
+        ).order_by(AccessLog.timestamp).yield_per(self.config["batch_size"])
+
+        path = self._partition_path(day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        schema = _arrow_schema()
+        written = 0
+        with pq.ParquetWriter(tmp_path, schema, compression="zstd", use_dictionary=DICTIONARY_COLUMNS) as writer:
+            chunk = []
+            for row in query:
+                chunk.append(row)
+                if len(chunk) >= self.config["batch_size"]:
+                    writer.write_table(pa.Table.from_pylist([r._asdict() for r in chunk], schema=schema))
+                    written += len(chunk)
+                    chunk = []
+            if chunk:
+                writer.write_table(pa.Table.from_pylist([r._asdict() for r in chunk], schema=schema))
+                written += len(chunk)
+        os.replace(tmp_path, path)
+        return written
+
+    def recompact_partition(self, db: Session, day) -> int:
+        """Regrava um dia compactado com os valores atuais do banco
+
+        Linhas que a retenção já removeu do banco continuam no Parquet como estavam; as demais
+        são substituídas (por id) pela versão do banco.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        start = datetime.combine(day, datetime.min.time())
+        end = start + timedelta(days=1)
+        columns = [getattr(AccessLog, name) for name in MIRROR_COLUMNS]
+        schema = _arrow_schema()
+        current = pa.Table.from_pylist(
+            [row._asdict() for row in db.query(*columns).filter(
+                AccessLog.timestamp >= start, AccessLog.timestamp < end
+            ).yield_per(self.config["batch_size"])],
+            schema=schema
+        )
+        path = self._partition_path(day)
+        old = pq.read_table(path)
+        # Partições de versões anteriores podem não ter todas as colunas
+        for field in schema:
+            if field.name not in old.column_names:
+                old = old.append_column(field, pa.nulls(old.num_rows, field.type))
+        kept = old.filter(pc.invert(pc.is_in(old["id"], value_set=current["id"])))
+        table = pa.concat_tables([kept.select(schema.names).cast(schema), current]).sort_by("timestamp")
+
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path, compression="zstd", use_dictionary=DICTIONARY_COLUMNS,
+                       row_group_size=self.config["batch_size"])
+        os.replace(tmp_path, path)
+        return table.num_rows
+
+    def _recompact_stale(self, db: Session, limit: int = None) -> list:
+        recompacted = []
+        for day in self.stale_days()[:limit]:
+            start = time.perf_counter()
+            # Desmarca antes de ler: uma nova marcação durante a regravação continua valendo
+            os.remove(self._stale_path(day))
+            try:
+                rows = self.recompact_partition(db, day)
+            except Exception:
+                self.invalidate([day])
+                raise
+            recompacted.append({
+                "day": day.isoformat(),
+                "rows": rows,
+                "ms": round((time.perf_counter() - start) * 1000, 1),
+                "recompacted": True
+            })
+        return recompacted
+
+    def recompact_stale(self, db: Session) -> list:
+        """Recompacta todos os dias marcados por invalidate"""
+        with self._lock:
+            return self._recompact_stale(db)
+
+    def run_compaction(self, db: Session) -> list:
+        """Recompacta os dias marcados e compacta as partições fechadas ainda não espelhadas (mais antigas primeiro)"""
+        with self._lock:
+            compacted = self._recompact_stale(db, self.config["max_partitions_per_run"])
+            cutoff = datetime.now() - timedelta(hours=self.config["partition_grace_hours"])
+            last_closed = (cutoff - timedelta(days=1)).date()
+            watermark = self.watermark()
+            if watermark is None:
+                oldest = db.query(func.min(AccessLog.timestamp)).scalar()
+                if oldest is None:
+                    return compacted
+                day = oldest.date()
+            else:
+                day = watermark.date()
+
+            while day <= last_closed and len(compacted) < self.config["max_partitions_per_run"]:
+                start = time.perf_counter()
+                rows = self.compact_partition(db, day)
+                compacted.append({
+                    "day": day.isoformat(),
+                    "rows": rows,
+                    "ms": round((time.perf_counter() - start) * 1000, 1)
+                })
+                day += timedelta(days=1)
+            return compacted
+
+    # Consultas
+
+    def _connection(self):
+        import duckdb
+        if self._duckdb is None:
+            self._duckdb = duckdb.connect(database=":memory:")
+        return self._duckdb.cursor()
+
+    def _missing_columns(self) -> list:
+        """Colunas do espelho ausentes na partição mais recente (gravada por uma versão anterior)"""
+        import pyarrow.parquet as pq
+        days = self.compacted_days()
+        if not days:
+            return []
+        names = pq.read_schema(self._partition_path(days[-1])).names
+        return [name for name in ("occurrence_count", "threat_count") if name not in names]
+
+    def query_mirror(self, name: str, start: datetime, end: datetime) -> list:
+        spec = ANALYTICS_QUERIES[name]
+        # Caminho vem da configuração; o intervalo vai como parâmetro
+        pattern = os.path.join(self.root, "date=*", "part.parquet").replace("'", "''")
+        # Partições gravadas antes de occurrence_count/threat_count não têm as colunas: union_by_name
+        # as preenche com NULL quando alguma partição as tem; se nem a mais recente tem, são NULL
+        columns = ", ".join(["*"] + [f"NULL::BIGINT AS {name}" for name in self._missing_columns()])
+        sql = (
+            f"WITH logs AS (SELECT {columns} FROM read_parquet('{pattern}', hive_partitioning = true, "
+            "union_by_name = true) WHERE timestamp >= ? AND timestamp < ?) " + spec["duckdb"]
+        )
+        cursor = self._connection()
+        try:
+            return cursor.execute(sql, [start, end]).fetchall()
+        finally:
+            cursor.close()
+
+
+def query_rows(db: Session, name: str, start: datetime, end: datetime) -> list:
+    """Executa a consulta analítica no banco de linhas"""
+    keys, metrics = ANALYTICS_QUERIES[name]["rows"]()
+    query = db.query(*keys, *metrics).filter(AccessLog.timestamp >= start, AccessLog.timestamp < end)
+    return query.group_by(*keys).all()
+
+
+def _merge(spec: dict, *results) -> list:
+    n_keys = len(spec["keys"])
+    merged = {}
+    for rows in results:
+        for row in rows:
+            key = tuple(row[:n_keys])
+            values = [value or 0 for value in row[n_keys:]]
+            current = merged.get(key)
+            merged[key] = values if current is None else [a + b for a, b in zip(current, values)]
+    return [
+        {**dict(zip(spec["keys"], key)), **dict(zip(spec["metrics"], values))}
+        for key, values in merged.items()
+    ]
+
+
+def run_analytics_query(db: Session, mirror: ColumnarMirror, name: str, start: datetime, end: datetime,
+                        limit: int = None) -> dict:
+    """Divide o intervalo no watermark: histórico no espelho colunar, recente no PostgreSQL"""
+    if name not in ANALYTICS_QUERIES:
+        raise ValueError(f"Consulta desconhecida: {name}")
+    spec = ANALYTICS_QUERIES[name]
+    watermark = mirror.watermark()
+    split = min(max(watermark, start), end) if watermark else start
+
+    timings = {}
+    results = []
+    if split > start:
+        t0 = time.perf_counter()
+        results.append(mirror.query_mirror(name, start, split))
+        timings["columnar_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    if end > split:
+        t0 = time.perf_counter()
+        results.append(query_rows(db, name, split, end))
+        timings["rows_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+
+    rows = _merge(spec, *results)
+    rows.sort(key=lambda row: row[spec["metrics"][0]], reverse=True)
+    if limit:
+        rows = rows[:limit]
+    return {
+        "query": name,
+        "watermark": watermark,
+        "columnar_range": [start, split] if split > start else None,
+        "rows_range": [split, end] if end > split else None,
+        "timings": timings,
+        "rows": rows
+    }
+
+
+def benchmark(db: Session, mirror: ColumnarMirror, start: datetime, end: datetime, repeat: int = 3) -> list:
+    """Compara o espelho colunar e o banco de linhas nas mesmas consultas e intervalo"""
+    report = []
+    for name in ANALYTICS_QUERIES:
+        entry = {"query": name}
+        for engine_name, run in (
+            ("columnar", lambda: mirror.query_mirror(name, start, end)),
+            ("rows", lambda: query_rows(db, name, start, end)),
+        ):
+            best = None
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                run()
+                elapsed = (time.perf_counter() - t0) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            entry[f"{engine_name}_ms"] = round(best, 2)
+        entry["speedup"] = round(entry["rows_ms"] / entry["columnar_ms"], 1) if entry["columnar_ms"] else None
+        report.append(entry)
+    return report
+
+
+# Instância compartilhada pela API e pelo job de compactação
+columnar_mirror = ColumnarMirror()
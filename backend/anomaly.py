@@ -0,0 +1,253 @@
+import math
+import random
+import threading
+from collections import OrderedDict
+from backend.config import ANOMALY_CONFIG
+
+
+class KLLSketch:
+    """Sketch KLL de quantis: memória limitada (~k/(1-c) itens) e mesclável entre workers"""
+
+    def __init__(self, k: int = 200, c: float = 2 / 3):
+        self.k = k
+        self.c = c
+        self.compactors = [[]]
+        self.size = 0
+        self.n = 0
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, height: int) -> int:
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil(self.c ** depth * self.k)) + 1
+
+    def _grow(self):
+        self.compactors.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def update(self, value: float):
+        self.compactors[0].append(value)
+        self.size += 1
+        self.n += 1
+        if self.size >= self._max_size:
+            self._compress()
+
+    def _compress(self):
+        for height, items in enumerate(self.compactors):
+            if len(items) >= self._capacity(height):
+                if height + 1 >= len(self.compactors):
+                    self._grow()
+                items.sort()
+                # Mantém itens alternados (pares ou ímpares ao acaso); cada um passa a valer o dobro
+                leftover = items[:len(items) % 2]
+                offset = random.getrandbits(1)
+                self.compactors[height + 1].extend(items[len(leftover) + offset::2])
+                self.compactors[height] = leftover
+                self.size = sum(len(level) for level in self.compactors)
+                break
+
+    def merge(self, other: "KLLSketch"):
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for height, items in enumerate(other.compactors):
+            self.compactors[height].extend(items)
+        self.n += other.n
+        self.size = sum(len(level) for level in self.compactors)
+        while self.size >= self._max_size:
+            self._compress()
+
+    def quantiles(self, qs) -> list:
+        """Quantis aproximados para uma lista de probabilidades (erro de rank ~ 1/k)"""
+        weighted = sorted(
+            (value, 1 << height)
+            for height, items in enumerate(self.compactors)
+            for value in items
+        )
+        if not weighted:
+            return [None for _ in qs]
+        total = sum(weight for _, weight in weighted)
+        results = []
+        for q in qs:
+            target = q * total
+            cumulative = 0
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    break
+            results.append(value)
+        return results
+
+    def to_dict(self) -> dict:
+        return {"k": self.k, "c": self.c, "n": self.n, "compactors": self.compactors}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KLLSketch":
+        sketch = cls(data["k"], data["c"])
+        sketch.compactors = [list(level) for level in data["compactors"]] or [[]]
+        sketch._max_size = sum(sketch._capacity(h) for h in range(len(sketch.compactors)))
+        sketch.size = sum(len(level) for level in sketch.compactors)
+        sketch.n = data["n"]
+        return sketch
+
+
+class MetricBaseline:
+    """Linha de base de uma métrica: EWMA/variância + sketch KLL com quantis em cache"""
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, config: dict):
+        self.alpha = config["ewma_alpha"]
+        self.refresh_every = config["quantile_refresh_every"]
+        self.sketch = KLLSketch(config["sketch_k"])
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+        self.p50 = self.p95 = self.p99 = None
+        self._since_refresh = 0
+
+    def update(self, value: float):
+        if self.count == 0:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            incr = self.alpha * diff
+            self.mean += incr
+            self.var = (1 - self.alpha) * (self.var + diff * incr)
+        self.count += 1
+        self.sketch.update(value)
+        self._since_refresh += 1
+        if self.p50 is None or self._since_refresh >= self.refresh_every:
+            self.refresh()
+
+    def refresh(self):
+        self.p50, self.p95, self.p99 = self.sketch.quantiles(self.QUANTILES)
+        self._since_refresh = 0
+
+    def deviation(self, value: float, z_threshold: float) -> float:
+        """Desvio acima da linha de base em [0, 1]; 0.5 equivale a p99 ou z == z_threshold (O(1))"""
+        std = math.sqrt(self.var)
+        z_score = (value - self.mean) / std if std else 0.0
+        z_part = z_score / (2 * z_threshold)
+        width = (self.p99 - self.p95) or std or 1.0
+        quantile_part = 0.5 * (value - self.p95) / width
+        return min(max(z_part, quantile_part, 0.0), 1.0)
+
+    def merge(self, other: "MetricBaseline"):
+        total = self.count + other.count
+        if not total:
+            return
+        # Combina médias e variâncias ponderando pelo número de eventos
+        mean = (self.mean * self.count + other.mean * other.count) / total
+        self.var = (
+            self.count * (self.var + (self.mean - mean) ** 2)
+            + other.count * (other.var + (other.mean - mean) ** 2)
+        ) / total
+        self.mean = mean
+        self.count = total
+        self.sketch.merge(other.sketch)
+        self.refresh()
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "ewma": self.mean,
+            "std": math.sqrt(self.var),
+            "p50": self.p50,
+            "p95": self.p95,
+            "p99": self.p99
+        }
+
+    def to_state(self) -> dict:
+        return {"mean": self.mean, "var": self.var, "count": self.count, "sketch": self.sketch.to_dict()}
+
+    @classmethod
+    def from_state(cls, state: dict, config: dict) -> "MetricBaseline":
+        baseline = cls(config)
+        baseline.mean = state["mean"]
+        baseline.var = state["var"]
+        baseline.count = state["count"]
+        baseline.sketch = KLLSketch.from_dict(state["sketch"])
+        baseline.refresh()
+        return baseline
+
+
+class AnomalyDetector:
+    """Detector online de anomalias por ativo e por zona de rede"""
+
+    METRICS = ("transaction_value", "login_attempts")
+
+    def __init__(self, config: dict = ANOMALY_CONFIG):
+        self.config = config
+        self._baselines = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def keys_for(log):
+        keys = []
+        if log.asset_name:
+            keys.append(("asset", log.asset_name))
+        if log.network_zone:
+            keys.append(("zone", log.network_zone))
+        return keys
+
+    def _baseline(self, key, metric: str, create: bool = False):
+        entry = self._baselines.get(key)
+        if entry is None:
+            if not create:
+                return None
+            entry = self._baselines[key] = {m: MetricBaseline(self.config) for m in self.METRICS}
+            # Limite de chaves: descarta a menos recente
+            if len(self._baselines) > self.config["max_keys"]:
+                self._baselines.popitem(last=False)
+        elif create:
+            self._baselines.move_to_end(key)
+        return entry[metric]
+
+    def deviation(self, log, metric: str):
+        """Maior desvio do evento entre suas chaves; None se ainda não há linha de base suficiente"""
+        value = float(getattr(log, metric) or 0)
+        result = None
+        for key in self.keys_for(log):
+            baseline = self._baseline(key, metric)
+            if baseline is None or baseline.count < self.config["min_samples"]:
+                continue
+            score = baseline.deviation(value, self.config["z_threshold"])
+            result = score if result is None else max(result, score)
+        return result
+
+    def update_batch(self, logs):
+        with self._lock:
+            for log in logs:
+                for key in self.keys_for(log):
+                    for metric in self.METRICS:
+                        self._baseline(key, metric, create=True).update(float(getattr(log, metric) or 0))
+
+    def baselines(self) -> list:
+        with self._lock:
+            items = list(self._baselines.items())
+        return [
+            {"kind": kind, "key": name, **{metric: baseline.as_dict() for metric, baseline in entry.items()}}
+            for (kind, name), entry in items
+        ]
+
+    def export_state(self) -> list:
+        """Estado serializável para mesclar em outro worker"""
+        with self._lock:
+            return [
+                {"kind": kind, "key": name, "metrics": {m: b.to_state() for m, b in entry.items()}}
+                for (kind, name), entry in self._baselines.items()
+            ]
+
+    def merge_state(self, state: list) -> int:
+        with self._lock:
+            for item in state:
+                key = (item["kind"], item["key"])
+                for metric, metric_state in item["metrics"].items():
+                    if metric not in self.METRICS:
+                        continue
+                    other = MetricBaseline.from_state(metric_state, self.config)
+                    self._baseline(key, metric, create=True).merge(other)
+        return len(state)
+
+
+# Instância compartilhada pelo pipeline de ingestão e pelo modelo de regras
+anomaly_detector = AnomalyDetector()
@@ -1,15 +1,39 @@
-import uvicorn
-from fastapi import FastAPI, HTTPException, Depends
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import Body, FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from backend.database import SessionLocal, engine, Base
+from backend.database import SessionLocal, ReadSession, engine
+from backend.read_routing import read_router
 from backend.schemas import AccessLog, AccessLogCreate
-from backend.crud import create_access_log, get_logs, get_threats
-from backend.model import predict_threat
+from backend.crud import get_logs, get_threats, get_incidents, search_logs, count_logs_by_asset_type, get_hourly_stats
+from backend.asset_registry import asset_registry
+from backend.tenants import tenant_registry, UnknownTenantError, DEFAULT_TENANT
+from backend.sketches import sketch_store
+from backend.flows import flow_matrix
+from backend.alerts import alert_dispatcher
+from backend.analytics import columnar_mirror, run_analytics_query, benchmark as benchmark_analytics
+from backend.scoring import scoring_engine, artifact_path_for
+from backend.feature_store import feature_store
+from backend.anomaly import anomaly_detector
+from backend.correlation import correlation_engine
+from backend.ingest import ingest_event, ingest_batch
+from backend.coalescing import event_coalescer
 from backend.network_analyzer import analyze_ip, calculate_alert_level
+from backend.business_hours import business_calendar, BusinessCalendar, off_hours_critical, preview_alert_levels
 from datetime import datetime, timedelta
 import random
-from backend.config import COMPANY_NETWORK
+from typing import List, Optional
+from backend.config import (
+    COMPANY_NETWORK, DB_AUTO_CREATE, DB_POOL_WARM, STARTUP_TARGET_MS,
+    SCORING_BACKEND, MODEL_ARTIFACT_PATH, THREAT_SCORE_THRESHOLD, FEATURE_STORE_CONFIG,
+    ANALYTICS_CONFIG, ALERT_CONFIG, LISTENER_CONFIG, FLOW_CONFIG, READ_ROUTING_CONFIG, RETENTION_CONFIG,
+    REPLAY_CONFIG
+)
+from backend.startup import StartupReport, warm_pool
+
+logger = logging.getLogger(__name__)
 
 # Sample data for simulation
 SAMPLE_IPS = [
@@ -141,7 +165,131 @@ NORMAL_ACTIVITIES = [
     }
 ]
 
-app = FastAPI()
+startup_report = StartupReport(target_ms=STARTUP_TARGET_MS)
+
+def _compact_analytics():
+    db = SessionLocal()
+    try:
+        return columnar_mirror.run_compaction(db)
+    finally:
+        db.close()
+
+async def _analytics_compaction_loop():
+    """Job em segundo plano que compacta partições fechadas para o espelho colunar"""
+    while True:
+        try:
+            compacted = await asyncio.to_thread(_compact_analytics)
+            if compacted:
+                logger.info(f"Partições compactadas: {compacted}")
+        except Exception as e:
+            logger.warning(f"Falha na compactação analítica: {e}")
+        await asyncio.sleep(ANALYTICS_CONFIG["compaction_interval_seconds"])
+
+async def _retention_loop():
+    """Job em segundo plano que aplica a política de retenção em lotes limitados"""
+    # Import tardio: a retenção (e o dialeto postgresql) só carrega quando o job está ativo
+    from backend.retention import retention_job
+    while True:
+        interval = RETENTION_CONFIG["interval_seconds"]
+        try:
+            report = await asyncio.to_thread(retention_job.run)
+            if report["rows_reclaimed"]:
+                logger.info(f"Retenção: {report['rows_reclaimed']} linhas, {report['bytes_reclaimed']} bytes recuperados")
+            if report["remaining"]:
+                interval = RETENTION_CONFIG["backlog_interval_seconds"]
+        except Exception as e:
+            logger.warning(f"Falha na retenção: {e}")
+        await asyncio.sleep(interval)
+
+def _rebuild_flow_matrix():
+    db = SessionLocal()
+    try:
+        return flow_matrix.rebuild(db)
+    finally:
+        db.close()
+
+def _sync_asset_registry():
+    db = SessionLocal()
+    try:
+        tenant_registry.ensure_default(db)
+        asset_registry.sync(db)
+    finally:
+        db.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicialização do worker: schema opcional e aquecimento do pool"""
+    if DB_AUTO_CREATE:
+        with startup_report.phase("schema"):
+            # Import tardio: só carrega os modelos quando o schema é verificado
+            from backend.init_db import init_db
+            await asyncio.to_thread(init_db)
+
+    if SCORING_BACKEND != "rules":
+        with startup_report.phase("scoring_model"):
+            await asyncio.to_thread(scoring_engine.load, SCORING_BACKEND, MODEL_ARTIFACT_PATH)
+
+    try:
+        with startup_report.phase("feature_store"):
+            await asyncio.to_thread(feature_store.load, FEATURE_STORE_CONFIG["snapshot_path"])
+    except Exception as e:
+        # Snapshot corrompido ou incompleto: o store começa vazio e se preenche com os próximos eventos
+        feature_store.reset()
+        logger.warning(f"Falha ao carregar snapshot do feature store: {e}")
+
+    try:
+        with startup_report.phase("pool_warm"):
+            await asyncio.to_thread(warm_pool, engine, DB_POOL_WARM)
+    except Exception as e:
+        # Banco indisponível não impede o worker de subir (pool_pre_ping reconecta)
+        logger.warning(f"Falha ao aquecer pool de conexões: {e}")
+
+    try:
+        with startup_report.phase("asset_registry"):
+            await asyncio.to_thread(_sync_asset_registry)
+    except Exception as e:
+        # Sem sincronização os logs ainda recebem asset_type, só não o asset_id
+        logger.warning(f"Falha ao sincronizar registro de ativos: {e}")
+
+    try:
+        with startup_report.phase("flow_matrix"):
+            await asyncio.to_thread(_rebuild_flow_matrix)
+    except Exception as e:
+        # O mapa começa vazio e se preenche com os próximos eventos
+        logger.warning(f"Falha ao recarregar matriz de fluxos: {e}")
+
+    tenant_registry.start_listener(engine)
+
+    if ALERT_CONFIG["enabled"]:
+        alert_dispatcher.start()
+
+    if LISTENER_CONFIG["enabled"]:
+        # Import tardio: os listeners só carregam quando estão habilitados
+        from backend.listeners import intake_service
+        await intake_service.start()
+
+    background_tasks = []
+    if ANALYTICS_CONFIG["enabled"]:
+        background_tasks.append(asyncio.create_task(_analytics_compaction_loop()))
+    if RETENTION_CONFIG["enabled"]:
+        background_tasks.append(asyncio.create_task(_retention_loop()))
+
+    startup_report.mark_ready()
+    yield
+    for task in background_tasks:
+        task.cancel()
+    if LISTENER_CONFIG["enabled"]:
+        await intake_service.stop()
+    await asyncio.to_thread(alert_dispatcher.stop)
+    await asyncio.to_thread(tenant_registry.stop_listener)
+    try:
+        feature_store.save(FEATURE_STORE_CONFIG["snapshot_path"])
+    except OSError as e:
+        logger.warning(f"Falha ao gravar snapshot do feature store: {e}")
+    engine.dispose()
+    read_router.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configurar CORS
 app.add_middleware(
@@ -150,6 +298,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Marcador de escrita lido pelo frontend para reenviar nas leituras (read-your-writes)
+    expose_headers=[READ_ROUTING_CONFIG["header"]],
 )
 
 @app.get("/")
@@ -162,7 +312,19 @@ async def root():
             "logs": "/api/logs",
             "threats": "/api/threats",
             "simulate_event": "/api/simulate-event",
-            "simulate_multiple": "/api/simulate-multiple"
+            "simulate_multiple": "/api/simulate-multiple",
+            "startup": "/api/status/startup",
+            "logs_batch": "/api/logs/batch",
+            "model": "/api/model",
+            "incidents": "/api/incidents",
+            "search": "/api/logs/search",
+            "tenants": "/api/tenants",
+            "intake": "/api/intake/stats",
+            "map_flows": "/api/map/flows",
+            "read_routing": "/api/db/routing",
+            "retention": "/api/retention",
+            "coalescing": "/api/ingest/coalescing",
+            "replay": "/api/replay"
         }
     }
 
@@ -174,26 +336,298 @@ def get_db():
     finally:
         db.close()
 
-# Criar tabelas
-Base.metadata.create_all(bind=engine)
+def get_read_db(request: Request):
+    """Sessão de leitura: réplica em dia ou pool de leitura do primário (ver ReadRouter)"""
+    marker = request.headers.get(READ_ROUTING_CONFIG["header"]) or request.cookies.get(READ_ROUTING_CONFIG["cookie"])
+    bind, _ = read_router.choose(marker)
+    db = ReadSession(bind=bind)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _mark_write(response: Response, db: Session):
+    """Envia ao cliente o marcador da escrita (cookie e cabeçalho) para ler as próprias escritas"""
+    try:
+        marker = read_router.write_marker(db)
+    except Exception as e:
+        logger.warning(f"Falha ao obter marcador de escrita: {e}")
+        return
+    response.set_cookie(
+        READ_ROUTING_CONFIG["cookie"], marker,
+        max_age=READ_ROUTING_CONFIG["sticky_seconds"], httponly=True, samesite="lax"
+    )
+    response.headers[READ_ROUTING_CONFIG["header"]] = marker
+
+@app.get("/api/db/routing")
+async def get_read_routing():
+    """Destino das leituras (réplica/primário e motivo) e lag medido de cada réplica"""
+    return read_router.stats()
+
+@app.get("/api/status/startup")
+async def get_startup_report():
+    """Relatório de tempo de inicialização do worker"""
+    return startup_report.as_dict()
 
 @app.get("/api/logs")
 async def list_logs(
     skip: int = 0,
     limit: int = 100,
     sort: str = "desc",
-    db: Session = Depends(get_db)
+    tenant_id: str = DEFAULT_TENANT,
+    db: Session = Depends(get_read_db)
 ):
     """Lista logs de acesso ordenados por timestamp"""
-    return get_logs(db, skip=skip, limit=limit, sort=sort)
+    return get_logs(db, skip=skip, limit=limit, sort=sort, tenant_id=tenant_id)
+
+@app.get("/api/logs/search")
+async def search_access_logs(
+    q: str,
+    network_zone: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
+    tenant_id: str = DEFAULT_TENANT,
+    db: Session = Depends(get_read_db)
+):
+    """Busca logs: CVE-xxxx e Txxxx usam colunas indexadas; o texto aceita OR, -termo e aspas"""
+    return search_logs(
+        db, q,
+        network_zone=network_zone,
+        start_time=start_time,
+        end_time=end_time,
+        skip=skip,
+        limit=limit,
+        tenant_id=tenant_id
+    )
 
 @app.get("/api/threats")
-async def list_threats(db: Session = Depends(get_db)):
+async def list_threats(tenant_id: str = DEFAULT_TENANT, db: Session = Depends(get_read_db)):
     """Lista ameaças detectadas"""
-    return get_threats(db)
+    return get_threats(db, tenant_id=tenant_id)
+
+@app.post("/api/logs/batch")
+async def create_logs_batch(
+    logs: List[AccessLogCreate],
+    response: Response,
+    tenant_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Registra um lote de logs com inferência em lote (tenant_id vale para os logs sem tenant próprio)"""
+    try:
+        scores = ingest_batch(db, logs, tenant_id)
+    except UnknownTenantError as e:
+        raise HTTPException(status_code=404, detail=f"Tenant não encontrado: {e.args[0]}")
+    _mark_write(response, db)
+    return {
+        "created": len(logs),
+        "threats": sum(1 for score in scores if score > THREAT_SCORE_THRESHOLD)
+    }
+
+@app.get("/api/tenants")
+async def list_tenants(db: Session = Depends(get_db)):
+    """Tenants cadastrados"""
+    return tenant_registry.list_tenants(db)
+
+@app.get("/api/tenants/cache")
+async def get_tenant_cache_stats():
+    """Cache de classificadores compilados (acertos, faltas, remoções, invalidações)"""
+    return tenant_registry.stats()
+
+@app.put("/api/tenants/{tenant_id}")
+async def upsert_tenant(tenant_id: str, config: dict, db: Session = Depends(get_db)):
+    """Cria ou altera a configuração de rede de um tenant (mesmo formato de COMPANY_NETWORK)"""
+    network = {
+        "internal_networks": config.get("internal_networks") or {},
+        "authorized_external_ips": config.get("authorized_external_ips") or {}
+    }
+    try:
+        return tenant_registry.upsert(
+            db, tenant_id, config.get("name", tenant_id), network, config.get("critical_assets") or {}
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Configuração inválida: {e}")
+
+@app.get("/api/features/{kind}/{key}")
+async def get_entity_features(kind: str, key: str):
+    """Agregados comportamentais de uma entidade (ip, asset, country)"""
+    if kind not in feature_store.tables:
+        raise HTTPException(status_code=400, detail="Tipo de entidade inválido")
+    features = feature_store.get(kind, key)
+    if features is None:
+        raise HTTPException(status_code=404, detail="Entidade sem eventos recentes")
+    return features
+
+@app.get("/api/analytics/query")
+async def analytics_query(
+    name: str,  # top_countries, score_distribution, zone_hour_heatmap
+    start_time: datetime,
+    end_time: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Consulta analítica: histórico no espelho colunar, período recente no PostgreSQL"""
+    try:
+        return await asyncio.to_thread(
+            run_analytics_query, db, columnar_mirror, name, start_time, end_time or datetime.now(), limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/analytics/compact")
+async def analytics_compact():
+    """Força uma rodada de compactação das partições fechadas"""
+    return await asyncio.to_thread(_compact_analytics)
+
+@app.get("/api/analytics/benchmark")
+async def analytics_benchmark(start_time: datetime, end_time: datetime, db: Session = Depends(get_db)):
+    """Compara o espelho colunar com o banco de linhas nas mesmas consultas"""
+    return await asyncio.to_thread(benchmark_analytics, db, columnar_mirror, start_time, end_time)
+
+@app.get("/api/retention")
+async def get_retention_status():
+    """Política de retenção e relatório da última execução"""
+    from backend.retention import retention_job
+    return retention_job.status()
+
+@app.post("/api/retention/run")
+async def run_retention(dry_run: bool = False):
+    """Executa uma rodada limitada da retenção (dry_run só conta as linhas elegíveis)"""
+    from backend.retention import retention_job
+    if dry_run:
+        return await asyncio.to_thread(retention_job.preview)
+    try:
+        return await asyncio.to_thread(retention_job.run)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/api/replay")
+async def replay_config(
+    overrides: dict = Body(default={}),
+    days: float = REPLAY_CONFIG["default_days"],
+    baseline: str = "config"
+):
+    """Reavalia os eventos da janela com as chaves alteradas de SECURITY_CONFIG (nada é gravado)"""
+    if days <= 0:
+        raise HTTPException(status_code=400, detail="days deve ser positivo")
+    # Import tardio: o replay não participa do startup
+    from backend.replay import ReplayJob, candidate_config
+    try:
+        job = ReplayJob(candidate_config(overrides), baseline=baseline)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return await asyncio.to_thread(job.run, since=datetime.now() - timedelta(days=days))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/api/business-hours")
+async def get_business_hours():
+    """Horário de expediente em uso e tamanho das tabelas por minuto"""
+    return business_calendar.describe()
+
+@app.get("/api/business-hours/preview")
+async def preview_business_hours(
+    start: str,
+    end: str,
+    timezone: Optional[str] = None,
+    days: int = 30,
+    db: Session = Depends(get_db)
+):
+    """Prevê quantos eventos dos últimos `days` dias mudariam de nível de alerta com outro horário"""
+    if days < 1:
+        raise HTTPException(status_code=400, detail="days deve ser positivo")
+    config = dict(
+        business_calendar.config, start=start, end=end,
+        timezone=timezone or business_calendar.config["timezone"],
+        table_days_back=days + 1, table_days_ahead=1
+    )
+    try:
+        candidate = BusinessCalendar(config)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Horário inválido: {e}")
+    since = datetime.now() - timedelta(days=days)
+    return await asyncio.to_thread(preview_alert_levels, db, candidate, business_calendar, since)
+
+@app.get("/api/alerts/stats")
+async def get_alert_stats():
+    """Contadores do despachante de alertas (casados, agrupados, enviados, descartados)"""
+    return alert_dispatcher.stats()
+
+@app.get("/api/alerts/dead-letters")
+async def list_dead_letters():
+    """Notificações que falharam após todas as tentativas"""
+    return alert_dispatcher.dead_letters()
+
+@app.post("/api/alerts/dead-letters/retry")
+async def retry_dead_letters():
+    """Reenfileira as notificações da dead-letter"""
+    return {"retried": alert_dispatcher.retry_dead_letters()}
+
+@app.get("/api/ingest/coalescing")
+async def get_coalescing_stats():
+    """Eventos fundidos na gravação e linhas escritas por evento"""
+    return event_coalescer.stats()
+
+@app.get("/api/intake/stats")
+async def get_intake_stats():
+    """Contadores dos listeners syslog/CEF/NDJSON (recebidas, erros de parse, descartadas, gravadas)"""
+    from backend.listeners import intake_service
+    return intake_service.stats()
+
+@app.get("/api/incidents")
+async def list_incidents(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
+    """Lista incidentes de ataques em múltiplas etapas"""
+    return get_incidents(db, skip=skip, limit=limit)
+
+@app.get("/api/correlation/stats")
+async def get_correlation_stats():
+    """Custo de avaliação por evento e estados parciais da correlação"""
+    return correlation_engine.stats()
+
+@app.get("/api/anomaly/baselines")
+async def get_anomaly_baselines():
+    """Linhas de base aprendidas por ativo e zona de rede"""
+    return anomaly_detector.baselines()
+
+@app.get("/api/anomaly/state")
+async def export_anomaly_state():
+    """Estado completo (sketches) para mesclar em outro worker"""
+    return anomaly_detector.export_state()
+
+@app.post("/api/anomaly/merge")
+async def merge_anomaly_state(state: List[dict]):
+    """Mescla o estado exportado por outro worker"""
+    try:
+        return {"merged": anomaly_detector.merge_state(state)}
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Estado inválido: {e}")
+
+@app.get("/api/model")
+async def get_model_info():
+    """Backend de score em uso e latência por tamanho de lote"""
+    return {
+        "model": scoring_engine.describe(),
+        "feature_store": feature_store.stats(),
+        "latency": scoring_engine.latency_report()
+    }
+
+@app.post("/api/model/reload")
+async def reload_model(backend: str = SCORING_BACKEND, artifact: Optional[str] = None):
+    """Recarrega o modelo de score sem reiniciar o worker
+
+    artifact é o nome de um arquivo em MODEL_DIR; sem ele, usa MODEL_ARTIFACT_PATH.
+    """
+    try:
+        path = artifact_path_for(artifact) if artifact else MODEL_ARTIFACT_PATH
+        return await asyncio.to_thread(scoring_engine.load, backend, path)
+    except (OSError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Falha ao carregar modelo: {e}")
 
 @app.post("/api/simulate-event")
-async def simulate_event(db: Session = Depends(get_db)):
+async def simulate_event(response: Response, db: Session = Depends(get_db)):
     """Simula um evento de acesso para teste"""
     timestamp = datetime.now() - timedelta(minutes=random.randint(0, 5))
     
@@ -253,7 +687,11 @@ async def simulate_event(db: Session = Depends(get_db)):
         description += f" | {event_type['technique']}"
     
     # Calcula nível de alerta
-    alert_level = calculate_alert_level(ip_info, login_attempts, country_code)
+    asset = asset_registry.resolve(ip_address)
+    critical_off_hours = off_hours_critical(
+        business_calendar.context(timestamp.timestamp()), asset.criticality if asset else None
+    )
+    alert_level = calculate_alert_level(ip_info, login_attempts, country_code, critical_off_hours)
     
     log = AccessLogCreate(
         ip_address=ip_address,
@@ -269,15 +707,16 @@ async def simulate_event(db: Session = Depends(get_db)):
         alert_level=alert_level
     )
     
-    threat_score = predict_threat(log)
-    return create_access_log(db=db, log=log, threat_score=threat_score)
+    db_log = ingest_event(db, log)
+    _mark_write(response, db)
+    return db_log
 
 @app.post("/api/simulate-multiple")
-async def simulate_multiple_events(count: int = 10, db: Session = Depends(get_db)):
+async def simulate_multiple_events(response: Response, count: int = 10, db: Session = Depends(get_db)):
     """Simula múltiplos eventos de acesso para teste"""
     events = []
     for _ in range(count):
-        event = await simulate_event(db)
+        event = await simulate_event(response, db)
         events.append(event)
     return events
 
@@ -286,69 +725,131 @@ async def list_logs_by_network(
     network_zone: str,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    tenant_id: str = DEFAULT_TENANT,
+    db: Session = Depends(get_read_db)
 ):
     """Lista logs de uma zona de rede específica (local, vpn, dmz, etc)"""
-    return get_logs(db, skip=skip, limit=limit, network_zone=network_zone)
+    return get_logs(db, skip=skip, limit=limit, network_zone=network_zone, tenant_id=tenant_id)
 
 @app.get("/api/logs/asset/{asset_type}")
 async def list_logs_by_asset_type(
     asset_type: str,  # database, web, email, storage, payment, api
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    tenant_id: str = DEFAULT_TENANT,
+    db: Session = Depends(get_read_db)
 ):
     """Lista logs de um tipo específico de ativo"""
-    return get_logs(db, skip=skip, limit=limit, asset_type=asset_type)
+    return get_logs(db, skip=skip, limit=limit, asset_type=asset_type, tenant_id=tenant_id)
 
 @app.get("/api/logs/criticality/{level}")
 async def list_logs_by_criticality(
     level: str,  # BAIXA, MÉDIA, ALTA, CRÍTICA
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    tenant_id: str = DEFAULT_TENANT,
+    db: Session = Depends(get_read_db)
 ):
     """Lista logs por nível de criticidade"""
-    return get_logs(db, skip=skip, limit=limit, criticality=level)
+    return get_logs(db, skip=skip, limit=limit, criticality=level, tenant_id=tenant_id)
 
 @app.get("/api/stats/network")
-async def get_network_stats(db: Session = Depends(get_db)):
+async def get_network_stats(tenant_id: str = DEFAULT_TENANT, db: Session = Depends(get_read_db)):
     """Retorna estatísticas por zona de rede"""
     return {
-        "local": get_logs(db, network_zone="local", count_only=True),
-        "vpn": get_logs(db, network_zone="vpn", count_only=True),
-        "dmz": get_logs(db, network_zone="dmz", count_only=True),
-        "external": get_logs(db, network_zone="external", count_only=True)
+        "local": get_logs(db, network_zone="local", count_only=True, tenant_id=tenant_id),
+        "vpn": get_logs(db, network_zone="vpn", count_only=True, tenant_id=tenant_id),
+        "dmz": get_logs(db, network_zone="dmz", count_only=True, tenant_id=tenant_id),
+        "external": get_logs(db, network_zone="external", count_only=True, tenant_id=tenant_id)
     }
 
 @app.get("/api/stats/assets")
-async def get_asset_stats(db: Session = Depends(get_db)):
+async def get_asset_stats(tenant_id: str = DEFAULT_TENANT, db: Session = Depends(get_read_db)):
     """Retorna estatísticas por tipo de ativo"""
+    counts = count_logs_by_asset_type(db, tenant_id=tenant_id)
     return {
-        "database": get_logs(db, asset_type="database", count_only=True),
-        "web": get_logs(db, asset_type="web", count_only=True),
-        "email": get_logs(db, asset_type="email", count_only=True),
-        "storage": get_logs(db, asset_type="storage", count_only=True),
-        "payment": get_logs(db, asset_type="payment", count_only=True),
-        "api": get_logs(db, asset_type="api", count_only=True)
+        asset_type: counts.get(asset_type, 0)
+        for asset_type in ("database", "web", "email", "storage", "payment", "api")
     }
 
 @app.get("/api/stats/threats")
-async def get_threat_stats(db: Session = Depends(get_db)):
+async def get_threat_stats(tenant_id: str = DEFAULT_TENANT, db: Session = Depends(get_read_db)):
     """Retorna estatísticas por nível de ameaça"""
     return {
-        "BAIXA": get_logs(db, alert_level="BAIXA", count_only=True),
-        "MÉDIA": get_logs(db, alert_level="MÉDIA", count_only=True),
-        "ALTA": get_logs(db, alert_level="ALTA", count_only=True),
-        "CRÍTICA": get_logs(db, alert_level="CRÍTICA", count_only=True)
+        "BAIXA": get_logs(db, alert_level="BAIXA", count_only=True, tenant_id=tenant_id),
+        "MÉDIA": get_logs(db, alert_level="MÉDIA", count_only=True, tenant_id=tenant_id),
+        "ALTA": get_logs(db, alert_level="ALTA", count_only=True, tenant_id=tenant_id),
+        "CRÍTICA": get_logs(db, alert_level="CRÍTICA", count_only=True, tenant_id=tenant_id)
     }
 
+@app.get("/api/stats/hourly")
+async def get_hourly_log_stats(
+    start_time: datetime,
+    end_time: Optional[datetime] = None,
+    network_zone: Optional[str] = None,
+    tenant_id: str = DEFAULT_TENANT,
+    db: Session = Depends(get_read_db)
+):
+    """Totais por hora do tráfego já agregado pela retenção"""
+    return get_hourly_stats(db, start_time, end_time, network_zone=network_zone, tenant_id=tenant_id)
+
+@app.get("/api/stats/distinct")
+async def get_distinct_stats(dimension: str = "ip_address", hours: float = 24, threats_only: bool = False):
+    """Distintos aproximados (HyperLogLog) na janela; threats_only conta só eventos de ameaça"""
+    try:
+        return sketch_store.distinct(dimension, hours, threats_only)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/stats/top")
+async def get_top_stats(dimension: str = "ip_address", metric: str = "threat_score", hours: float = 24, k: int = 20):
+    """Top-K aproximado (Space-Saving) por número de eventos ou soma do threat score"""
+    try:
+        return sketch_store.top(dimension, metric, hours, k)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/map/flows")
+async def get_map_flows(
+    since: Optional[int] = None,
+    minutes: int = 60,
+    countries: int = 0,
+    zones: int = 0,
+    tenant_id: str = DEFAULT_TENANT,
+    sequence: Optional[int] = None
+):
+    """Fluxos país de origem -> zona por minuto (eventos, ameaças, nível máximo)
+
+    Com `sequence` (a da resposta anterior) devolve só os buckets alterados depois dela,
+    inclusive minutos antigos que receberam eventos atrasados; `countries`/`zones` informam
+    quantas entradas das tabelas de ids o cliente já tem.
+    """
+    if not 1 <= minutes <= FLOW_CONFIG["retention_minutes"]:
+        raise HTTPException(status_code=400, detail=f"minutes deve estar entre 1 e {FLOW_CONFIG['retention_minutes']}")
+    if countries < 0 or zones < 0:
+        raise HTTPException(status_code=400, detail="countries e zones não podem ser negativos")
+    return flow_matrix.flows(tenant_id, since, minutes, countries, zones, sequence)
+
+@app.get("/api/stats/sketches")
+async def export_sketches():
+    """Estado dos sketches por bucket para mesclar em outro worker"""
+    return sketch_store.export_state()
+
+@app.post("/api/stats/sketches/merge")
+async def merge_sketches(state: dict):
+    """Mescla sketches exportados por outro worker"""
+    try:
+        return {"merged_buckets": sketch_store.merge_state(state)}
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Estado inválido: {e}")
+
 @app.get("/api/logs/time/{time_range}")
 async def list_logs_by_time(
     time_range: str,  # 1h, 24h, 7d, 30d
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    tenant_id: str = DEFAULT_TENANT,
+    db: Session = Depends(get_read_db)
 ):
     """Lista logs por período de tempo"""
     now = datetime.now()
@@ -364,7 +865,7 @@ async def list_logs_by_time(
     else:
         raise HTTPException(status_code=400, detail="Período inválido")
     
-    return get_logs(db, skip=skip, limit=limit, start_time=start_time)
+    return get_logs(db, skip=skip, limit=limit, start_time=start_time, tenant_id=tenant_id)
 
 @app.get("/api/config/monitoring")
 async def get_monitoring_config():
@@ -413,5 +914,6 @@ def generate_alert_level():
     return random.choice(["BAIXO", "MÉDIO", "ALTO", "CRÍTICO"])
 
 if __name__ == "__main__":
+    import uvicorn
     print("🚀 Iniciando servidor backend na porta 8002...")
     uvicorn.run("app:app", host="0.0.0.0", port=8002, reload=True) 
\ No newline at end of file
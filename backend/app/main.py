@@ -4,7 +4,7 @@ from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
-import uvicorn
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 import random
 
@@ -32,13 +32,21 @@ ATTACK_DESCRIPTIONS = [
 ]
 
 # Mudar imports para relativos
-from backend.database import SessionLocal, engine, Base
-from backend.model import predict_threat
+from backend.database import SessionLocal, engine
+from backend.scoring import scoring_engine
 from backend.schemas import AccessLog, AccessLogCreate
 from backend.crud import create_access_log, get_logs, get_threats
-
-# Criar tabelas no banco de dados
-Base.metadata.create_all(bind=engine)
+from backend.events import Event
+from backend.config import DB_AUTO_CREATE
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Criação do schema apenas quando DB_AUTO_CREATE=true"""
+    if DB_AUTO_CREATE:
+        from backend.init_db import init_db
+        init_db()
+    yield
+    engine.dispose()
 
 # Configuração da API
 app = FastAPI(
@@ -93,7 +101,8 @@ app = FastAPI(
     """,
     version="1.0.0",
     docs_url=None,  # Desabilita Swagger UI padrão
-    redoc_url=None  # Desabilita ReDoc padrão
+    redoc_url=None,  # Desabilita ReDoc padrão
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -154,8 +163,9 @@ async def system_status():
     summary="Registrar novo log de acesso",
     description="Registra e analisa um novo log de acesso em busca de ameaças")
 async def create_log(log: AccessLogCreate, db: Session = Depends(get_db)):
-    threat_score = predict_threat(log)
-    return create_access_log(db=db, log=log, threat_score=threat_score)
+    event = Event.from_schema(log)
+    event.threat_score = scoring_engine.score(event)
+    return create_access_log(db=db, event=event)
 
 @app.get("/api/logs",
     response_model=List[AccessLog],
@@ -194,8 +204,9 @@ async def simulate_event(db: Session = Depends(get_db)):
         timestamp=timestamp
     )
     
-    threat_score = predict_threat(log)
-    return create_access_log(db=db, log=log, threat_score=threat_score)
+    event = Event.from_schema(log)
+    event.threat_score = scoring_engine.score(event)
+    return create_access_log(db=db, event=event)
 
 @app.post("/api/simulate-multiple")
 async def simulate_multiple_events(count: int = 10, db: Session = Depends(get_db)):
@@ -208,12 +219,13 @@ async def simulate_multiple_events(count: int = 10, db: Session = Depends(get_db
             login_attempts=random.randint(1, 5),
             transaction_value=random.uniform(100, 10000)
         )
-        threat_score = predict_threat(log)
-        event = create_access_log(db=db, log=log, threat_score=threat_score)
-        events.append(event)
+        event = Event.from_schema(log)
+        event.threat_score = scoring_engine.score(event)
+        events.append(create_access_log(db=db, event=event))
     
     return events
 
 # Inicialização
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
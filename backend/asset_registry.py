@@ -0,0 +1,67 @@
+import logging
+import threading
+from sqlalchemy.orm import Session
+from backend.config import COMPANY_NETWORK, TENANT_CONFIG
+from backend.models import Asset
+
+logger = logging.getLogger(__name__)
+
+
+class AssetEntry:
+    """Ativo resolvido na ingestão (id é None até o registro ser sincronizado com o banco)"""
+
+    __slots__ = ("id", "ip_address", "name", "type", "criticality")
+
+    def __init__(self, ip_address: str, name: str, type: str, criticality: str, id: int = None):
+        self.id = id
+        self.ip_address = ip_address
+        self.name = name
+        self.type = type
+        self.criticality = criticality
+
+
+class AssetRegistry:
+    """Cache IP -> ativo crítico do tenant padrão (COMPANY_NETWORK), sincronizado com a tabela assets"""
+
+    def __init__(self, critical_assets: dict = COMPANY_NETWORK["critical_assets"]):
+        self._lock = threading.Lock()
+        self._by_ip = {
+            ip: AssetEntry(ip, info["name"], info["type"], info["criticality"])
+            for ip, info in critical_assets.items()
+        }
+        self.synced = False
+
+    def resolve(self, ip_address: str):
+        """Lookup O(1) do ativo de um IP"""
+        return self._by_ip.get(ip_address)
+
+    def entries(self) -> list:
+        return list(self._by_ip.items())
+
+    def sync(self, db: Session) -> int:
+        """Garante uma linha em assets para cada ativo configurado e guarda os ids"""
+        tenant_id = TENANT_CONFIG["default_tenant"]
+        with self._lock:
+            rows = {
+                asset.ip_address: asset
+                for asset in db.query(Asset).filter(Asset.tenant_id == tenant_id).all() if asset.ip_address
+            }
+            for ip, entry in self._by_ip.items():
+                row = rows.get(ip)
+                if row is None:
+                    row = Asset(tenant_id=tenant_id, ip_address=ip, name=entry.name, type=entry.type,
+                                criticality=entry.criticality)
+                    db.add(row)
+                else:
+                    row.name, row.type, row.criticality = entry.name, entry.type, entry.criticality
+                rows[ip] = row
+            db.commit()
+            for ip, entry in self._by_ip.items():
+                entry.id = rows[ip].id
+            self.synced = True
+        logger.info(f"Registro de ativos sincronizado: {len(self._by_ip)} ativos")
+        return len(self._by_ip)
+
+
+# Instância compartilhada pela ingestão
+asset_registry = AssetRegistry()
@@ -0,0 +1,126 @@
+"""Preenche colunas derivadas nas linhas antigas de access_logs
+
+As colunas derivadas são calculadas na ingestão; linhas gravadas antes de elas existirem ficam
+com NULL. Cada preenchimento percorre a tabela uma vez em lotes por id (keyset), com uma
+transação curta por lote. init_db roda os preenchimentos das colunas que acabou de criar.
+
+    python -m backend.backfill                # todos
+    python -m backend.backfill description    # cve e technique
+    python -m backend.backfill asset_type     # tipo do ativo (assets / COMPANY_NETWORK)
+"""
+import argparse
+import json
+import logging
+from sqlalchemy import bindparam, select, update
+from backend.config import COMPANY_NETWORK, TENANT_CONFIG
+from backend.database import SessionLocal
+from backend.description_parser import parse_cve, parse_technique
+from backend.models import AccessLog, Asset
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+
+def _batches(db, columns: list, condition, batch_size: int):
+    """Lotes de linhas (id, ...) que atendem à condição, em ordem de id"""
+    table = AccessLog.__table__
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(table.c.id, *columns).where(table.c.id > last_id, condition)
+            .order_by(table.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield rows
+
+
+def backfill_descriptions(db, batch_size: int = BATCH_SIZE) -> int:
+    """cve e technique extraídos da descrição"""
+    table = AccessLog.__table__
+    statement = update(table).where(table.c.id == bindparam("row_id")).values(
+        cve=bindparam("cve"), technique=bindparam("technique")
+    ).execution_options(synchronize_session=False)
+    condition = table.c.cve.is_(None) & table.c.technique.is_(None) & table.c.description.isnot(None)
+    updated = 0
+    for rows in _batches(db, [table.c.description], condition, batch_size):
+        params = [
+            {"row_id": row_id, "cve": cve, "technique": technique}
+            for row_id, cve, technique in (
+                (row_id, parse_cve(description), parse_technique(description)) for row_id, description in rows
+            )
+            if cve or technique
+        ]
+        if params:
+            db.execute(statement, params)
+        db.commit()
+        updated += len(params)
+    return updated
+
+
+def backfill_asset_types(db, batch_size: int = BATCH_SIZE) -> int:
+    """asset_type pelo ativo do IP no tenant (tabela assets; COMPANY_NETWORK para o tenant padrão)"""
+    default_tenant = TENANT_CONFIG["default_tenant"]
+    types = {(default_tenant, ip): info["type"] for ip, info in COMPANY_NETWORK["critical_assets"].items()}
+    for tenant_id, ip, asset_type in db.execute(select(Asset.tenant_id, Asset.ip_address, Asset.type)):
+        if ip and asset_type:
+            types[(tenant_id or default_tenant, ip)] = asset_type
+    if not types:
+        return 0
+    table = AccessLog.__table__
+    statement = update(table).where(table.c.id == bindparam("row_id")).values(
+        asset_type=bindparam("asset_type")
+    ).execution_options(synchronize_session=False)
+    condition = table.c.asset_type.is_(None) & table.c.ip_address.in_({ip for _, ip in types})
+    updated = 0
+    for rows in _batches(db, [table.c.tenant_id, table.c.ip_address], condition, batch_size):
+        params = [
+            {"row_id": row_id, "asset_type": asset_type}
+            for row_id, asset_type in (
+                (row_id, types.get((tenant_id or default_tenant, ip))) for row_id, tenant_id, ip in rows
+            )
+            if asset_type
+        ]
+        if params:
+            db.execute(statement, params)
+        db.commit()
+        updated += len(params)
+    return updated
+
+
+# Nome -> (colunas preenchidas, função)
+BACKFILLS = {
+    "description": (("cve", "technique"), backfill_descriptions),
+    "asset_type": (("asset_type",), backfill_asset_types),
+}
+
+
+def run_backfills(names=None, batch_size: int = BATCH_SIZE) -> dict:
+    """Executa os preenchimentos pedidos (todos sem nomes) e retorna as linhas alteradas por nome"""
+    names = list(BACKFILLS) if names is None else names
+    unknown = set(names) - set(BACKFILLS)
+    if unknown:
+        raise ValueError(f"Preenchimento desconhecido: {sorted(unknown)[0]}")
+    report = {}
+    with SessionLocal() as db:
+        for name in names:
+            report[name] = BACKFILLS[name][1](db, batch_size)
+            logger.info(f"Preenchimento {name}: {report[name]} linhas")
+    return report
+
+
+def backfills_for_columns(columns) -> list:
+    """Preenchimentos que alimentam alguma das colunas informadas"""
+    return [name for name, (filled, _) in BACKFILLS.items() if set(filled) & set(columns)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("names", nargs="*", help=f"Preenchimentos: {', '.join(BACKFILLS)} (padrão: todos)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    print(json.dumps(run_backfills(args.names or None, args.batch_size), indent=2))
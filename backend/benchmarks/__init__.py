@@ -0,0 +1 @@
+# Scripts de benchmark: python -m backend.benchmarks.<nome>
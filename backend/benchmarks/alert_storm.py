@@ -0,0 +1,86 @@
+"""Vazão do despachante de alertas sob uma tempestade de eventos
+
+Sobe um webhook local (stand-in do Slack/e-mail), injeta N eventos de alto nível vindos de
+poucos IPs atacantes e mede: eventos/s aceitos pela ingestão, latência de submit, eventos
+descartados, notificações geradas após o agrupamento e entregas no webhook.
+
+    python -m backend.benchmarks.alert_storm --events 200000 --attackers 50
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from backend.config import ALERT_CONFIG
+from backend.alerts import AlertDispatcher, WebhookChannel
+
+
+class _WebhookStandIn(BaseHTTPRequestHandler):
+    received = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with _WebhookStandIn.lock:
+            _WebhookStandIn.received += 1
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def run(events: int, attackers: int, batch: int):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _WebhookStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    # Todos os canais apontam para o webhook local; limites altos para medir o pipeline
+    config = dict(ALERT_CONFIG, group_window_seconds=1)
+    config["rate_limits"] = {name: {"rate_per_second": 1000.0, "burst": 1000} for name in ("email", "slack")}
+    webhook = WebhookChannel({"url": url, "timeout": 5})
+    dispatcher = AlertDispatcher(config, channels={"email": webhook, "slack": webhook})
+    dispatcher.start()
+
+    ips = [f"45.33.{i // 256}.{i % 256}" for i in range(attackers)]
+    logs = [
+        SimpleNamespace(
+            ip_address=random.choice(ips), alert_level="CRÍTICO", network_zone="external",
+            asset_name=None, asset_criticality=None, description="🔒 Atividade de Ransomware | T1486",
+            timestamp=datetime.now()
+        )
+        for _ in range(events)
+    ]
+    scores = [0.9] * events
+
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, events, batch):
+        t0 = time.perf_counter()
+        dispatcher.submit(logs[i:i + batch], scores[i:i + batch])
+        latencies.append((time.perf_counter() - t0) * 1e6 / batch)
+    submit_seconds = time.perf_counter() - start
+
+    dispatcher.stop(timeout=10)
+    server.shutdown()
+    stats = dispatcher.stats()
+    print(f"Eventos: {events} ({attackers} IPs atacantes, lotes de {batch})")
+    print(f"Submit: {events / submit_seconds:,.0f} eventos/s, "
+          f"{statistics.median(latencies):.2f} µs/evento (mediana), "
+          f"{max(latencies):.2f} µs/evento (pior lote)")
+    print(f"Aceitos: {stats['matched']}, descartados (fila cheia): {stats['dropped']}")
+    print(f"Notificações após agrupamento: {stats['notifications']} "
+          f"(redução de {stats['matched'] / max(stats['notifications'], 1):,.0f}x)")
+    print(f"Entregues no webhook: {_WebhookStandIn.received}, dead-letter: {stats['dead_lettered']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--attackers", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=100)
+    args = parser.parse_args()
+    run(args.events, args.attackers, args.batch)
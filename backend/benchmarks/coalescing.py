@@ -0,0 +1,147 @@
+"""Redução de escrita da coalescência de eventos sob rajadas de ataque simuladas
+
+Gera um fluxo com tráfego normal e rajadas (força bruta de poucos IPs, DDoS de muitos IPs com
+a mesma descrição), calcula os scores uma vez pelo pipeline normal e grava os mesmos eventos
+em dois bancos SQLite temporários: um INSERT por evento e com coalescência. Compara linhas,
+escritas (INSERT + UPDATE) por evento, tamanho do banco e tempo de gravação, e confere que
+nenhuma ocorrência se perdeu, que ameaças, tentativas e valores somam o mesmo nos dois bancos e
+que o maior score de cada IP/descrição é o mesmo.
+
+    python -m backend.benchmarks.coalescing --events 200000 --burst-share 0.8 --window 10
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from backend.config import COALESCE_CONFIG, SECURITY_CONFIG
+from backend.database import Base
+from backend.models import AccessLog
+from backend.events import Event
+from backend.coalescing import EventCoalescer
+from backend.crud import create_access_logs
+from backend.ingest import score_events, persist_events
+
+BRUTE_FORCE = "🔨 Ataque de força bruta | T1110 - Brute Force"
+DDOS = "🌊 Ataque DDoS em andamento | T1498 - Network Denial of Service"
+NORMAL = ["✅ Login bem-sucedido", "🔄 Chamada API", "💾 Backup automático"]
+
+
+def generate(events: int, burst_share: float, seconds: float, seed: int = 7) -> list:
+    """Eventos em ordem de tempo: rajadas concentradas em poucas fontes + tráfego de fundo"""
+    random.seed(seed)
+    start = datetime.now() - timedelta(seconds=seconds)
+    brute_ips = [f"45.33.{i // 256}.{i % 256}" for i in range(20)]
+    ddos_ips = [f"185.65.{i // 256}.{i % 256}" for i in range(200)]
+    # Parte da força bruta vem com transação suspeita: ocorrências com e sem ameaça na mesma linha
+    suspicious = SECURITY_CONFIG["suspicious_transaction_threshold"]
+    generated = []
+    for i in range(events):
+        timestamp = start + timedelta(seconds=seconds * i / events)
+        roll = random.random()
+        value = 0.0
+        if roll < burst_share / 2:
+            ip, description, level, attempts = random.choice(brute_ips), BRUTE_FORCE, "ALTO", random.randint(5, 12)
+            value = random.choice([0.0, random.uniform(0, 2 * suspicious)])
+        elif roll < burst_share:
+            ip, description, level, attempts = random.choice(ddos_ips), DDOS, "CRÍTICO", 0
+        else:
+            ip = f"{random.randint(1, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+            description, level, attempts = random.choice(NORMAL), "BAIXO", random.randint(0, 2)
+        generated.append(Event(
+            ip_address=ip, country="RU" if description != NORMAL[0] else "BR", description=description,
+            timestamp=timestamp, login_attempts=attempts, transaction_value=value, alert_level=level
+        ))
+    return generated
+
+
+def _database(directory: str, name: str):
+    engine = create_engine(f"sqlite:///{os.path.join(directory, name)}")
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(bind=engine)
+
+
+def _write(session_factory, events: list, batch: int, coalescer=None) -> float:
+    started = time.perf_counter()
+    with session_factory() as db:
+        for i in range(0, len(events), batch):
+            chunk = events[i:i + batch]
+            if coalescer is None:
+                create_access_logs(db, chunk)
+            else:
+                persist_events(db, chunk, coalescer)
+    return time.perf_counter() - started
+
+
+def run(events: int, burst_share: float, seconds: float, window: float, batch: int, max_entries: int):
+    generated = generate(events, burst_share, seconds)
+    for i in range(0, len(generated), batch):
+        score_events(generated[i:i + batch])
+
+    with tempfile.TemporaryDirectory() as directory:
+        plain_engine, plain_sessions = _database(directory, "plain.db")
+        coalesced_engine, coalesced_sessions = _database(directory, "coalesced.db")
+        coalescer = EventCoalescer(dict(COALESCE_CONFIG, enabled=True, window_seconds=window, max_entries=max_entries))
+
+        plain_seconds = _write(plain_sessions, generated, batch)
+        coalesced_seconds = _write(coalesced_sessions, generated, batch, coalescer)
+
+        results = {}
+        for name, sessions in (("plain", plain_sessions), ("coalesced", coalesced_sessions)):
+            with sessions() as db:
+                rows, occurrences, threat_occurrences, attempts, value = db.query(
+                    func.count(AccessLog.id), func.sum(AccessLog.occurrence_count), func.sum(AccessLog.threat_count),
+                    func.sum(AccessLog.login_attempts_total), func.sum(AccessLog.transaction_value_total)
+                ).one()
+                threat_rows = db.query(func.count(AccessLog.id)).filter(AccessLog.is_threat.is_(True)).scalar()
+                max_scores = dict(
+                    ((ip, description), score) for ip, description, score in db.query(
+                        AccessLog.ip_address, AccessLog.description, func.max(AccessLog.threat_score)
+                    ).group_by(AccessLog.ip_address, AccessLog.description)
+                )
+            results[name] = {"rows": rows, "occurrences": occurrences, "threat_rows": threat_rows,
+                             "threat_occurrences": threat_occurrences or 0, "attempts": attempts or 0,
+                             "value": round(value or 0.0, 2), "max_scores": max_scores}
+        sizes = {name: os.path.getsize(os.path.join(directory, f"{name}.db")) for name in ("plain", "coalesced")}
+        plain_engine.dispose()
+        coalesced_engine.dispose()
+
+    stats = coalescer.stats()
+    plain, coalesced = results["plain"], results["coalesced"]
+    writes = stats["inserted"] + stats["row_updates"]
+    threats = sum(1 for event in generated if event.is_threat)
+    print(f"Eventos: {events} ({burst_share:.0%} em rajadas, {seconds:.0f}s simulados, janela {window:.0f}s, "
+          f"lotes de {batch})")
+    print(f"Sem coalescência: {plain['rows']} linhas, {sizes['plain'] / 1e6:.1f} MB, "
+          f"{events / plain_seconds:,.0f} eventos/s gravados")
+    print(f"Com coalescência: {coalesced['rows']} linhas ({stats['inserted']} INSERT + {stats['row_updates']} UPDATE), "
+          f"{sizes['coalesced'] / 1e6:.1f} MB, {events / coalesced_seconds:,.0f} eventos/s gravados")
+    print(f"Escritas por evento: {writes / events:.4f} (redução de {events / max(writes, 1):,.1f}x), "
+          f"linhas: redução de {plain['rows'] / max(coalesced['rows'], 1):,.1f}x, "
+          f"banco: {sizes['plain'] / max(sizes['coalesced'], 1):,.1f}x menor")
+    print(f"Fundidos no lote: {stats['merged_in_batch']}, em linhas já gravadas: {stats['merged_into_rows']}, "
+          f"impressões descartadas (LRU): {stats['evicted']}")
+    print(f"Ocorrências preservadas: {coalesced['occurrences']} de {events} "
+          f"({'ok' if coalesced['occurrences'] == events else 'DIVERGENTE'})")
+    if threats:
+        print(f"Eventos de ameaça: {threats} em {plain['threat_rows']} → {coalesced['threat_rows']} linhas "
+              f"(threat_count soma {coalesced['threat_occurrences']})")
+    same_sums = all(plain[name] == coalesced[name] for name in ("threat_occurrences", "attempts", "value"))
+    print(f"Ameaças, tentativas e valores somados idênticos nos dois bancos: {'sim' if same_sums else 'NÃO'}")
+    same_scores = plain["max_scores"] == coalesced["max_scores"]
+    print(f"Maior score por IP/descrição idêntico nos dois bancos: {'sim' if same_scores else 'NÃO'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--burst-share", type=float, default=0.8, help="Fração dos eventos vinda de rajadas")
+    parser.add_argument("--seconds", type=float, default=120, help="Intervalo de tempo coberto pelos eventos")
+    parser.add_argument("--window", type=float, default=COALESCE_CONFIG["window_seconds"])
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--max-entries", type=int, default=COALESCE_CONFIG["max_entries"])
+    args = parser.parse_args()
+    run(args.events, args.burst_share, args.seconds, args.window, args.batch, args.max_entries)
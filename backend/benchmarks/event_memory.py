@@ -0,0 +1,103 @@
+"""Memória e vazão da representação de eventos no pipeline de ingestão
+
+Compara, para N eventos mantidos vivos ao mesmo tempo (como num lote em trânsito):
+  - caminho antigo: AccessLogCreate (pydantic) + objeto ORM AccessLog por evento
+  - caminho atual: Event (__slots__, dimensões internadas) + dict da linha para o INSERT em lote
+Reporta bytes alocados por evento (tracemalloc), alocações por evento e eventos/s em score_events
+(feature store, score, linhas de base, sketches), sem banco.
+
+    python -m backend.benchmarks.event_memory --events 50000
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from backend.schemas import AccessLogCreate
+from backend.models import AccessLog
+from backend.events import Event
+from backend.ingest import score_events
+
+_IPS = [f"45.33.{i // 256}.{i % 256}" for i in range(500)] + ["192.168.1.10", "192.168.1.20", "10.0.0.5"]
+_COUNTRIES = ["BR - 🇧🇷 Brasil", "RU - 🇷🇺 Rússia", "CN - 🇨🇳 China", "US - 🇺🇸 Estados Unidos"]
+_DESCRIPTIONS = [
+    "🔒 Tentativa de Força Bruta | T1110",
+    "💉 SQL Injection | T1190 | CVE-2021-44228",
+    "Acesso normal ao sistema",
+]
+
+
+def _payloads(events: int) -> list:
+    now = datetime.now()
+    return [
+        {
+            "ip_address": random.choice(_IPS),
+            "country": random.choice(_COUNTRIES),
+            "timestamp": now - timedelta(seconds=random.randint(0, 3600)),
+            "login_attempts": random.randint(1, 10),
+            "transaction_value": random.uniform(10, 10000),
+            "description": random.choice(_DESCRIPTIONS),
+            "network_zone": random.choice(["external", "dmz", "internal"]),
+            "alert_level": random.choice(["BAIXO", "MÉDIO", "ALTO", "CRÍTICO"]),
+        }
+        for _ in range(events)
+    ]
+
+
+def _legacy(payload: dict):
+    log = AccessLogCreate(**payload)
+    row = AccessLog(**log.model_dump(exclude={"threat_score", "is_threat"}))
+    return log, row
+
+
+def _current(payload: dict):
+    event = Event(**payload)
+    return event, event.row()
+
+
+def _measure(build, payloads: list) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    snapshot_before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    kept = [build(payload) for payload in payloads]
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot_after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in snapshot_after.compare_to(snapshot_before, "filename"))
+    n = len(kept)
+    return {
+        "bytes_per_event": (current - before) / n,
+        "peak_bytes_per_event": (peak - before) / n,
+        "allocations_per_event": blocks / n,
+        "build_events_per_second": n / elapsed,
+    }
+
+
+def run(events: int, batch: int):
+    payloads = _payloads(events)
+    print(f"Eventos: {events}")
+    for name, build in (("AccessLogCreate + ORM", _legacy), ("Event + dict", _current)):
+        result = _measure(build, payloads)
+        print(f"{name:>22}: {result['bytes_per_event']:,.0f} B/evento retidos, "
+              f"pico {result['peak_bytes_per_event']:,.0f} B/evento, "
+              f"{result['allocations_per_event']:.1f} alocações/evento, "
+              f"{result['build_events_per_second']:,.0f} eventos/s na construção")
+
+    pipeline = [Event(**payload) for payload in payloads]
+    start = time.perf_counter()
+    for i in range(0, events, batch):
+        score_events(pipeline[i:i + batch])
+    elapsed = time.perf_counter() - start
+    print(f"score_events: {events / elapsed:,.0f} eventos/s (lotes de {batch})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+    run(args.events, args.batch)
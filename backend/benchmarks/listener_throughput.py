@@ -0,0 +1,135 @@
+"""Vazão dos listeners de ingestão (syslog/CEF/NDJSON) com um remetente local
+
+Sobe um listener numa porta livre, dispara N mensagens de outro processo e mede as
+mensagens/s recebidas e parseadas pelo loop de eventos (um núcleo), além dos contadores
+de erros de parse e descartes. O destino dos lotes é escolhido por --sink:
+
+  none      descarta os campos parseados (mede só recepção, framing e parse)
+  discard   cria os Event e descarta (listener + criação dos eventos)
+  score     cria os Event e roda score_events (agregados, score, sketches), sem banco
+
+    python -m backend.benchmarks.listener_throughput --messages 500000 --protocol syslog --transport tcp
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import time
+from backend.config import LISTENER_CONFIG
+from backend.listeners import IntakeService
+
+COUNTRIES = ["BR", "US", "RU", "CN", "DE", "KP", "IR"]
+DESCRIPTIONS = [
+    "Falha de autenticação SSH | T1110 - Brute Force",
+    "Exploração de aplicação web | CVE-2023-5678 | T1190 - Exploit Public-Facing Application",
+    "Transferência de dados para destino externo | T1048 - Exfiltration",
+    "Login bem-sucedido"
+]
+
+
+def _message(protocol: str, index: int) -> str:
+    ip = f"{random.randint(1, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{index % 256}"
+    country = random.choice(COUNTRIES)
+    description = random.choice(DESCRIPTIONS)
+    attempts = random.randint(0, 12)
+    if protocol == "syslog":
+        return (f'<{random.choice([34, 36, 38, 43])}>1 2026-10-19T10:{index % 60:02d}:00Z gw01 sshd - AUTH '
+                f'[safeshield@32473 src="{ip}" country="{country}" attempts="{attempts}"] {description}')
+    if protocol == "cef":
+        return (f"CEF:0|SafeShield|Gateway|1.0|T1110|{description}|{random.randint(1, 10)}|"
+                f"src={ip} cnt={attempts} cs1={country} cfp1={random.random() * 8000:.2f}")
+    return json.dumps({
+        "ip_address": ip, "country": country, "description": description,
+        "login_attempts": attempts, "transaction_value": round(random.random() * 8000, 2)
+    })
+
+
+def _send(protocol: str, transport: str, port: int, messages: int, ready):
+    random.seed(7)
+    payload = [_message(protocol, index).encode() for index in range(messages)]
+    ready.wait()
+    if transport == "udp":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for index, message in enumerate(payload):
+            sock.sendto(message, ("127.0.0.1", port))
+            if index % 2000 == 1999:
+                time.sleep(0.001)  # Evita estourar o buffer do socket no loopback
+        sock.close()
+        return
+    sock = socket.create_connection(("127.0.0.1", port))
+    data = b"\n".join(payload) + b"\n"
+    chunk = 1 << 20
+    for offset in range(0, len(data), chunk):
+        sock.sendall(data[offset:offset + chunk])
+    sock.close()
+
+
+class _ParseOnlyService(IntakeService):
+    def _write(self, batch):
+        for listener, items in batch:
+            listener.counters["ingested"] += len(items)
+
+
+async def _run(protocol: str, transport: str, messages: int, sink: str):
+    if sink == "score":
+        from backend.ingest import score_events
+        ingest = score_events
+    else:
+        def ingest(events):
+            pass
+    config = dict(
+        LISTENER_CONFIG, host="127.0.0.1", max_pending=max(LISTENER_CONFIG["max_pending"], messages),
+        listeners=[{"name": "bench", "protocol": protocol, "transport": transport, "port": 0}]
+    )
+    service = (_ParseOnlyService if sink == "none" else IntakeService)(config, ingest=ingest)
+    await service.start()
+    listener = service.listeners[0]
+
+    ready = multiprocessing.Event()
+    sender = multiprocessing.Process(target=_send, args=(protocol, transport, listener.port, messages, ready))
+    sender.start()
+    ready.set()
+
+    counters = listener.counters
+    first, last_change, seen = None, time.perf_counter(), 0
+    while True:
+        await asyncio.sleep(0.01)
+        now = time.perf_counter()
+        if counters["received"] != seen:
+            if first is None:
+                first = now
+            seen, last_change = counters["received"], now
+        if seen >= messages or (first is not None and now - last_change > 1.0 and not sender.is_alive()):
+            break
+    receive_seconds = (last_change if seen < messages else time.perf_counter()) - (first or time.perf_counter())
+    socket_drops = listener.stats()["socket_drops"]
+    await service.stop()
+    total_seconds = time.perf_counter() - (first or time.perf_counter())
+    sender.join()
+
+    stats = listener.stats()
+    lost = messages - stats["received"]  # UDP: perdidas antes do listener (socket/loopback)
+    print(f"Protocolo: {protocol}/{transport}  mensagens: {messages}  sink: {sink}")
+    print(f"Recepção + parse: {stats['received'] / max(receive_seconds, 1e-9):,.0f} msgs/s "
+          f"({receive_seconds:.2f}s)")
+    print(f"Até o último lote processado: {stats['ingested'] / max(total_seconds, 1e-9):,.0f} msgs/s "
+          f"({total_seconds:.2f}s, {service.batches} lotes)")
+    print(f"Contadores: parseadas={stats['parsed']} erros_parse={stats['parse_errors']} "
+          f"descartadas={stats['dropped']} rejeitadas={stats['rejected']} processadas={stats['ingested']} "
+          f"não_recebidas={lost} descartes_do_kernel={socket_drops}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500000)
+    parser.add_argument("--protocol", choices=["syslog", "cef", "ndjson"], default="syslog")
+    parser.add_argument("--transport", choices=["tcp", "udp"], default="tcp")
+    parser.add_argument("--sink", choices=["none", "discard", "score"], default="none")
+    args = parser.parse_args()
+    asyncio.run(_run(args.protocol, args.transport, args.messages, args.sink))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Vazão do replay de configuração sobre um Parquet sintético
+
+Gera eventos com a distribuição do simulador (IPs repetidos, países, tentativas, transações,
+horários ao longo de semanas), grava um Parquet com row groups do tamanho das partições e
+reavalia tudo com um SECURITY_CONFIG candidato. Mostra eventos/s total e por worker e a
+estimativa para 100 milhões de eventos.
+
+    python -m backend.benchmarks.replay --events 2000000 --workers 4
+"""
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from backend.config import REPLAY_CONFIG
+from backend.replay import ReplayJob, candidate_config
+
+COUNTRIES = ["BR", "US", "DE", "RU", "CN", "IR", "KP", "FR", "IN", "GB"]
+LEVELS = ["BAIXO", "MÉDIO", "ALTO", "CRÍTICO"]
+
+
+def generate(path: str, events: int, ips: int, days: float, row_group: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    pool = np.array([
+        f"{rng.integers(1, 224)}.{rng.integers(0, 256)}.{rng.integers(0, 256)}.{rng.integers(1, 255)}"
+        for _ in range(ips)
+    ] + ["192.168.1.10", "10.0.0.5"])
+    start = np.datetime64(datetime.now() - timedelta(days=days), "us")
+    offsets = np.sort(rng.integers(0, int(days * 86400e6), events)).astype("timedelta64[us]")
+    table = pa.table({
+        "ip_address": pool[rng.integers(0, len(pool), events)],
+        "country": np.array(COUNTRIES)[rng.integers(0, len(COUNTRIES), events)],
+        "timestamp": pa.array(start + offsets, pa.timestamp("us")),
+        "login_attempts": rng.poisson(1.5, events),
+        "transaction_value": np.round(rng.exponential(1500, events), 2),
+        "alert_level": np.array(LEVELS)[rng.integers(0, len(LEVELS), events)],
+        "is_threat": rng.random(events) < 0.05,
+        "threat_score": np.round(rng.random(events), 3),
+        "occurrence_count": np.ones(events, dtype=np.int64),
+    })
+    pq.write_table(table, path, row_group_size=row_group)
+
+
+def run(events: int, ips: int, days: float, workers: int, row_group: int):
+    candidate = candidate_config({
+        "max_login_attempts": 3, "high_risk_countries": ["RU", "CN", "IR"], "business_hours.start": "07:00"
+    })
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "events.parquet")
+        generate(path, events, ips, days, row_group)
+        size = os.path.getsize(path)
+        report = ReplayJob(candidate).run(path, workers=workers)
+
+    rate = report["rows"] / report["seconds"]
+    print(f"Eventos: {report['rows']} ({ips} IPs, {days:.0f} dias), Parquet de {size / 1e6:.1f} MB "
+          f"em {report['partitions']} row groups")
+    print(f"Replay: {report['seconds']:.2f}s com {report['workers']} worker(s): {rate:,.0f} eventos/s, "
+          f"{rate / report['workers']:,.0f} eventos/s por worker")
+    print(f"Alterados: {report['changed_events']} eventos, transições: {report['transitions']}")
+    print(f"Estimativa para 100M eventos: {100e6 / rate / 60:.1f} min com {report['workers']} worker(s), "
+          f"{100e6 / (rate / report['workers']) / 60 / 16:.1f} min com 16")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=2000000)
+    parser.add_argument("--ips", type=int, default=50000, help="IPs distintos no fluxo")
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=REPLAY_CONFIG["workers"])
+    parser.add_argument("--row-group", type=int, default=REPLAY_CONFIG["partition_rows"])
+    args = parser.parse_args()
+    run(args.events, args.ips, args.days, args.workers, args.row_group)
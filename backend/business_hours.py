@@ -0,0 +1,243 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+from sqlalchemy.orm import Session
+from backend.config import SECURITY_CONFIG
+from backend.models import AccessLog
+from backend.feature_store import country_code
+from backend.asset_registry import asset_registry
+
+# Contexto de horário de um instante (um byte por minuto nas tabelas)
+BUSINESS, OFF_HOURS, WEEKEND, HOLIDAY = range(4)
+TIME_CONTEXTS = ("business", "off_hours", "weekend", "holiday")
+
+
+def _minutes(value: str) -> int:
+    hours, minutes = value.split(":")
+    total = int(hours) * 60 + int(minutes)
+    if not 0 <= total <= 24 * 60 or not 0 <= int(minutes) < 60:
+        raise ValueError(f"Horário fora do intervalo: {value}")
+    return total
+
+
+def easter(year: int) -> date:
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return date(year, month, day)
+
+
+class BusinessCalendar:
+    """Classifica instantes (epoch) em expediente, fora do horário, fim de semana ou feriado
+
+    As tabelas têm um byte por minuto UTC num intervalo em torno de hoje e são montadas dia a
+    dia local (fronteiras calculadas uma vez por dia, com o fuso configurado), então classificar
+    um evento é um índice em bytearray, sem conversão de fuso por evento. Instantes fora do
+    intervalo caem no cálculo direto.
+    """
+
+    def __init__(self, config: dict = SECURITY_CONFIG["business_hours"]):
+        self.config = config
+        self.tz = ZoneInfo(config["timezone"])
+        self.start = _minutes(config["start"])
+        self.end = _minutes(config["end"])
+        self.weekdays = frozenset(config.get("weekdays", range(5)))
+        self._fixed = frozenset(config.get("holidays", ()))
+        self._offsets = tuple(config.get("easter_offsets", ()))
+        self._extra = frozenset(date.fromisoformat(d) for d in config.get("extra_dates", ()))
+        self._holiday_years = {}
+        self._lock = threading.Lock()
+        self._origin = 0  # Minuto UTC (epoch // 60) do primeiro byte da tabela
+        # A tabela só é montada no primeiro uso (ver _maybe_extend), fora do startup da API
+        self._table = bytearray()
+
+    def describe(self) -> dict:
+        return {
+            "start": self.config["start"],
+            "end": self.config["end"],
+            "timezone": self.config["timezone"],
+            "table_minutes": len(self._table)
+        }
+
+    # Calendário
+
+    def is_holiday(self, day: date) -> bool:
+        holidays = self._holiday_years.get(day.year)
+        if holidays is None:
+            sunday = easter(day.year)
+            holidays = self._holiday_years[day.year] = frozenset(
+                sunday + timedelta(days=offset) for offset in self._offsets
+            )
+        return day in holidays or day in self._extra or day.strftime("%m-%d") in self._fixed
+
+    def _day_code(self, day: date) -> int:
+        if self.is_holiday(day):
+            return HOLIDAY
+        if day.weekday() not in self.weekdays:
+            return WEEKEND
+        return OFF_HOURS
+
+    def _business_ranges(self) -> list:
+        """Intervalos de expediente em minutos locais (turno noturno quando end <= start)"""
+        if self.end > self.start:
+            return [(self.start, self.end)]
+        return [(0, self.end), (self.start, 24 * 60)]
+
+    def _local_minute(self, day: date, minute: int) -> int:
+        """Minuto UTC de um minuto local do dia (via fuso; feito só nas fronteiras)"""
+        hours, minutes = divmod(minute, 60)
+        moment = datetime.combine(day, datetime.min.time(), tzinfo=self.tz) + timedelta(hours=hours, minutes=minutes)
+        return int(moment.timestamp()) // 60
+
+    def _build(self, today: date):
+        first = today - timedelta(days=self.config.get("table_days_back", 400))
+        last = today + timedelta(days=self.config.get("table_days_ahead", 35))
+        origin = self._local_minute(first, 0)
+        table = bytearray(self._local_minute(last, 0) - origin)
+        ranges = self._business_ranges()
+        day = first
+        while day < last:
+            begin = self._local_minute(day, 0) - origin
+            finish = self._local_minute(day + timedelta(days=1), 0) - origin
+            code = self._day_code(day)
+            table[begin:finish] = bytes([code]) * (finish - begin)
+            if code == OFF_HOURS:
+                for start, end in ranges:
+                    a = self._local_minute(day, start) - origin
+                    b = self._local_minute(day, end) - origin
+                    table[a:b] = bytes(b - a)  # BUSINESS == 0
+            day += timedelta(days=1)
+        with self._lock:
+            self._origin, self._table = origin, table
+
+    def _slow_context(self, ts: float) -> int:
+        local = datetime.fromtimestamp(ts, self.tz)
+        code = self._day_code(local.date())
+        if code != OFF_HOURS:
+            return code
+        minute = local.hour * 60 + local.minute
+        for start, end in self._business_ranges():
+            if start <= minute < end:
+                return BUSINESS
+        return OFF_HOURS
+
+    def _maybe_extend(self, minute: int):
+        # Primeiro uso ou o tempo andou além do fim da tabela: (re)monta em torno de hoje
+        if minute >= self._origin + len(self._table) and minute * 60 <= time.time() + 86400:
+            self._build(date.today())
+
+    # Classificação
+
+    def context(self, ts: float) -> int:
+        minute = int(ts // 60)
+        index = minute - self._origin
+        table = self._table
+        if 0 <= index < len(table):
+            return table[index]
+        self._maybe_extend(minute)
+        index = minute - self._origin
+        if 0 <= index < len(self._table):
+            return self._table[index]
+        return self._slow_context(ts)
+
+    def context_batch(self, timestamps) -> list:
+        """Classifica um lote; com o lote dentro da tabela, só indexação sem testes por evento"""
+        if not timestamps:
+            return []
+        minutes = [int(ts // 60) for ts in timestamps]
+        origin, table = self._origin, self._table
+        if min(minutes) >= origin and max(minutes) < origin + len(table):
+            return [table[m - origin] for m in minutes]
+        return [self.context(ts) for ts in timestamps]
+
+    def annotate(self, logs):
+        """Preenche time_context dos eventos do lote que ainda não têm"""
+        pending = [log for log in logs if log.time_context is None]
+        if pending:
+            for log, code in zip(pending, self.context_batch([log.ts for log in pending])):
+                log.time_context = code
+
+
+def off_hours_critical(time_context, criticality, config: dict = SECURITY_CONFIG["business_hours"]) -> bool:
+    """Acesso fora do expediente a um ativo crítico"""
+    return time_context not in (None, BUSINESS) and criticality in config["off_hours_criticality"]
+
+
+def preview_alert_levels(db: Session, candidate: BusinessCalendar, current: BusinessCalendar,
+                         since: datetime, batch_size: int = 5000) -> dict:
+    """Quantos eventos desde `since` mudariam de nível de alerta com outro horário de expediente"""
+    from backend.network_analyzer import analyze_ip, calculate_alert_level
+
+    query = db.query(
+        AccessLog.ip_address, AccessLog.country, AccessLog.login_attempts, AccessLog.timestamp
+    ).filter(AccessLog.timestamp >= since).yield_per(batch_size)
+
+    ips = {}
+    contexts = {"current": [0] * len(TIME_CONTEXTS), "candidate": [0] * len(TIME_CONTEXTS)}
+    transitions = {}
+    total = changed = 0
+
+    def evaluate(chunk):
+        nonlocal changed
+        timestamps = [row.timestamp.timestamp() for row in chunk]
+        for row, old, new in zip(chunk, current.context_batch(timestamps), candidate.context_batch(timestamps)):
+            contexts["current"][old] += 1
+            contexts["candidate"][new] += 1
+            if old == new:
+                continue
+            info = ips.get(row.ip_address)
+            if info is None:
+                asset = asset_registry.resolve(row.ip_address)
+                try:
+                    ip_info = analyze_ip(row.ip_address)
+                except ValueError:
+                    ip_info = None
+                info = ips[row.ip_address] = (ip_info, asset.criticality if asset else None)
+            ip_info, criticality = info
+            if ip_info is None:
+                continue
+            code = country_code(row.country)
+            level_old = calculate_alert_level(ip_info, row.login_attempts or 0, code,
+                                              off_hours_critical(old, criticality, current.config))
+            level_new = calculate_alert_level(ip_info, row.login_attempts or 0, code,
+                                              off_hours_critical(new, criticality, candidate.config))
+            if level_old != level_new:
+                changed += 1
+                key = f"{level_old} → {level_new}"
+                transitions[key] = transitions.get(key, 0) + 1
+
+    chunk = []
+    for row in query:
+        chunk.append(row)
+        if len(chunk) >= batch_size:
+            evaluate(chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        evaluate(chunk)
+        total += len(chunk)
+
+    return {
+        "since": since,
+        "current": current.describe(),
+        "candidate": candidate.describe(),
+        "events": total,
+        "changed": changed,
+        "transitions": transitions,
+        "time_contexts": {
+            name: dict(zip(TIME_CONTEXTS, counts)) for name, counts in contexts.items()
+        }
+    }
+
+
+# Instância compartilhada pelo score, pela ingestão e pelo cálculo de nível de alerta
+business_calendar = BusinessCalendar()
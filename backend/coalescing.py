@@ -0,0 +1,145 @@
+import threading
+from collections import OrderedDict
+from backend.config import COALESCE_CONFIG, THREAT_SCORE_THRESHOLD
+
+
+class Occurrences:
+    """Eventos repetidos fundidos numa linha: a primeira ocorrência (event) e os acumulados"""
+
+    __slots__ = (
+        "event", "row_id", "first_ts", "count", "first_seen", "last_seen", "threat_score", "login_attempts",
+        "threats", "login_attempts_total", "transaction_value_total"
+    )
+
+    def __init__(self, event=None, row_id: int = None):
+        self.event = event
+        self.row_id = row_id
+        self.first_ts = event.ts if event is not None else None
+        self.count = 0
+        self.first_seen = None
+        self.last_seen = None
+        self.threat_score = 0.0
+        self.login_attempts = 0
+        self.threats = 0
+        self.login_attempts_total = 0
+        self.transaction_value_total = 0.0
+
+    def add(self, event):
+        self.count += 1
+        if self.first_seen is None or event.timestamp < self.first_seen:
+            self.first_seen = event.timestamp
+        if self.last_seen is None or event.timestamp > self.last_seen:
+            self.last_seen = event.timestamp
+        if event.threat_score > self.threat_score:
+            self.threat_score = event.threat_score
+        if event.login_attempts > self.login_attempts:
+            self.login_attempts = event.login_attempts
+        if event.is_threat:
+            self.threats += 1
+        self.login_attempts_total += event.login_attempts
+        self.transaction_value_total += event.transaction_value
+
+    def row(self) -> dict:
+        """Linha nova: valores da primeira ocorrência, maior score/tentativas, contagens e somas do grupo"""
+        row = self.event.row()
+        row.update(
+            occurrence_count=self.count, first_seen=self.first_seen, last_seen=self.last_seen,
+            threat_score=self.threat_score, is_threat=self.is_threat, login_attempts=self.login_attempts,
+            threat_count=self.threats, login_attempts_total=self.login_attempts_total,
+            transaction_value_total=self.transaction_value_total
+        )
+        return row
+
+    @property
+    def is_threat(self) -> bool:
+        return self.threat_score > THREAT_SCORE_THRESHOLD
+
+
+class EventCoalescer:
+    """Funde eventos idênticos (tenant, IP, descrição, nível) dentro de uma janela curta
+
+    Atua só na gravação, depois do score: agregados, score, correlação, sketches e alertas
+    continuam vendo cada evento. A primeira ocorrência vira uma linha; as seguintes dentro de
+    window_seconds do first_seen dela incrementam occurrence_count/last_seen daquela linha e as
+    somas por ocorrência (threat_count, login_attempts_total, transaction_value_total).
+    A tabela de impressões digitais é limitada (LRU) e guarda só linhas já gravadas; lotes
+    concorrentes podem criar duas linhas para a mesma rajada, mas nenhuma ocorrência se perde.
+    """
+
+    def __init__(self, config: dict = COALESCE_CONFIG):
+        self.config = config
+        self.enabled = config["enabled"]
+        self.window = config["window_seconds"]
+        self._rows = OrderedDict()  # Impressão digital -> (id da linha, ts da primeira ocorrência)
+        self._lock = threading.Lock()
+        self.counters = {"events": 0, "inserted": 0, "merged_in_batch": 0, "merged_into_rows": 0,
+                         "row_updates": 0, "evicted": 0}
+
+    @staticmethod
+    def fingerprint(event) -> tuple:
+        return (event.tenant_id, event.ip_address, event.description, event.alert_level)
+
+    def plan(self, events) -> tuple:
+        """Divide o lote em linhas novas e incrementos de linhas já gravadas
+
+        Retorna (criados, atualizações, destinos): criados são pares (impressão digital, Occurrences)
+        ainda sem linha; destinos[i] é o grupo em que o evento i foi contado.
+        """
+        window = self.window
+        new_groups = {}  # Impressão digital -> Occurrences ainda sem linha
+        updates = {}  # id da linha -> Occurrences com o que falta somar
+        targets = []
+        created = []
+        with self._lock:
+            for event in events:
+                key = self.fingerprint(event)
+                group = new_groups.get(key)
+                if group is not None and abs(event.ts - group.first_ts) <= window:
+                    self.counters["merged_in_batch"] += 1
+                else:
+                    stored = self._rows.get(key)
+                    if stored is not None and abs(event.ts - stored[1]) <= window:
+                        self._rows.move_to_end(key)
+                        group = updates.get(stored[0])
+                        if group is None:
+                            group = updates[stored[0]] = Occurrences(row_id=stored[0])
+                        self.counters["merged_into_rows"] += 1
+                    else:
+                        group = new_groups[key] = Occurrences(event)
+                        created.append((key, group))
+                group.add(event)
+                targets.append(group)
+            self.counters["events"] += len(events)
+            self.counters["inserted"] += len(created)
+            self.counters["row_updates"] += len(updates)
+        return created, list(updates.values()), targets
+
+    def register(self, created: list):
+        """Guarda as linhas recém-gravadas (row_id já preenchido) como destino das próximas ocorrências"""
+        limit = self.config["max_entries"]
+        with self._lock:
+            for key, group in created:
+                self._rows[key] = (group.row_id, group.first_ts)
+                self._rows.move_to_end(key)
+            while len(self._rows) > limit:
+                self._rows.popitem(last=False)
+                self.counters["evicted"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            entries = len(self._rows)
+        writes = counters["inserted"] + counters["row_updates"]
+        return {
+            "enabled": self.enabled,
+            "window_seconds": self.window,
+            "entries": entries,
+            "max_entries": self.config["max_entries"],
+            **counters,
+            # Linhas escritas (INSERT + UPDATE) por evento recebido; 1.0 sem coalescência
+            "writes_per_event": round(writes / counters["events"], 4) if counters["events"] else None
+        }
+
+
+# Instância compartilhada pela ingestão
+event_coalescer = EventCoalescer()
@@ -5,6 +5,32 @@ load_dotenv()
 
 # Configurações do Banco de Dados
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/safeshield")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+# Leituras do dashboard: pool próprio, separado do pool de escrita (ingestão)
+# Réplicas em READ_REPLICA_URLS (separadas por vírgula); sem réplicas o pool de leitura usa o primário
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "5"))
+DB_READ_MAX_OVERFLOW = int(os.getenv("DB_READ_MAX_OVERFLOW", "10"))
+READ_ROUTING_CONFIG = {
+    "max_lag_seconds": float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5")),  # Réplica mais atrasada volta ao primário
+    "lag_check_interval_seconds": 1.0,  # Lag e LSN de cada réplica ficam em cache por esse intervalo
+    "retry_unhealthy_seconds": 10.0,  # Réplica inacessível fica fora por esse intervalo
+    "sticky_seconds": 30,  # Após uma ingestão o cliente lê do primário até a réplica alcançar a escrita
+    "cookie": "ss_last_write",
+    "header": "X-Last-Write"
+}
+
+# Configurações de inicialização
+# Criação/verificação do schema é opcional (o docker-entrypoint já roda init_db)
+DB_AUTO_CREATE = os.getenv("DB_AUTO_CREATE", "false").lower() == "true"
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", "2"))  # Conexões abertas no startup
+# Meta de prontidão do worker. Medido em 1 CPU: ready_ms ~1470 ms, dos quais ~1,0-1,2 s são o
+# import do fastapi/pydantic (~750-900 ms) e do sqlalchemy.orm (~230-330 ms); o código do backend
+# soma ~90 ms e as fases do lifespan ~50 ms. Com esses frameworks os 300 ms não são alcançáveis
+# (within_target fica False); a meta serve para detectar regressões no que o backend controla.
+STARTUP_TARGET_MS = float(os.getenv("STARTUP_TARGET_MS", "300"))
 
 # Configurações da API
 API_VERSION = "1.0.0"
@@ -18,6 +44,209 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 # Configuração de ameaças
 THREAT_SCORE_THRESHOLD = 0.7  # Score acima deste valor é considerado ameaça
 
+# Motor de score: "rules" (regras fixas), "logistic" ou "gbt" (artefato JSON treinado)
+SCORING_BACKEND = os.getenv("SCORING_BACKEND", "rules")
+MODEL_ARTIFACT_PATH = os.getenv("MODEL_ARTIFACT_PATH", "")
+MODEL_DIR = os.getenv("MODEL_DIR", "models")  # Únicos artefatos que /api/model/reload pode carregar
+
+# Feature store de agregados por IP, ativo e país
+FEATURE_STORE_CONFIG = {
+    "max_entities": 100000,  # Por tipo de entidade
+    "idle_ttl_seconds": 3600,  # Entidades sem eventos por mais tempo são removidas
+    "eviction_interval_seconds": 60,
+    "rate_window_seconds": 300,  # Janela (decaimento) das taxas de eventos
+    "ewma_alpha": 0.1,  # Peso do evento mais recente na EWMA do valor da transação
+    "snapshot_path": os.getenv("FEATURE_STORE_SNAPSHOT", "feature_store.snapshot")
+}
+
+# Detecção de anomalias por ativo/zona (sketch KLL + EWMA)
+ANOMALY_CONFIG = {
+    "sketch_k": 200,  # Precisão do sketch (~600 valores por métrica e chave no máximo)
+    "max_keys": 5000,  # Número máximo de ativos/zonas acompanhados
+    "min_samples": 50,  # Eventos necessários antes de usar a linha de base
+    "quantile_refresh_every": 100,  # Recalcula p50/p95/p99 a cada N eventos
+    "ewma_alpha": 0.05,
+    "z_threshold": 3.0  # Desvios-padrão considerados anômalos
+}
+
+# Correlação de eventos: sequências ordenadas de técnicas MITRE por entidade
+CORRELATION_RULES = [
+    {
+        "name": "Força bruta → backdoor → exfiltração",
+        "sequence": ["T1110", "T1133", "T1048"],
+        "group_by": "ip_address",  # ip_address (origem) ou asset_name (alvo)
+        "window_minutes": 60,
+        "severity": "CRÍTICO"
+    },
+    {
+        "name": "Exploração de aplicação → ransomware",
+        "sequence": ["T1190", "T1486"],
+        "group_by": "asset_name",
+        "window_minutes": 60,
+        "severity": "CRÍTICO"
+    },
+    {
+        "name": "Força bruta → exfiltração",
+        "sequence": ["T1110", "T1048"],
+        "group_by": "ip_address",
+        "window_minutes": 30,
+        "severity": "ALTO"
+    }
+]
+CORRELATION_MAX_ENTITIES = 100000  # Estados parciais mantidos em memória
+
+# Espelho colunar (Parquet + DuckDB) para consultas históricas
+ANALYTICS_CONFIG = {
+    "enabled": os.getenv("ANALYTICS_MIRROR", "false").lower() == "true",
+    "data_dir": os.getenv("ANALYTICS_DIR", "analytics"),
+    "partition_grace_hours": 1,  # Um dia só é compactado depois desse atraso (eventos tardios)
+    "compaction_interval_seconds": 600,
+    "max_partitions_per_run": 7,
+    "batch_size": 50000  # Linhas por row group / leitura do cursor
+}
+
+# Sketches de distintos (HyperLogLog) e top-K (Space-Saving) por bucket de tempo
+SKETCH_CONFIG = {
+    "bucket_seconds": 3600,
+    "retention_buckets": 24 * 7,  # Janela máxima consultável: 7 dias
+    "hll_precision": 12,  # 4 KB por sketch, erro padrão relativo ~1,6%
+    "top_k": 200  # Contadores por dimensão/bucket; superestimação máxima total/k
+}
+
+# Matriz de fluxos país de origem -> zona de destino para o mapa de ataques
+FLOW_CONFIG = {
+    "bucket_seconds": 60,
+    "retention_minutes": 24 * 60,
+    "rebuild_minutes": 60,  # Recarregados do banco na inicialização do worker
+    "max_countries": 1024,  # Valores além disso são agregados em "??"
+    "max_zones": 1024
+}
+
+# Configuração de rede por unidade de negócio (tenant), armazenada no banco
+TENANT_CONFIG = {
+    "default_tenant": "default",  # Semeado a partir de COMPANY_NETWORK; usado quando o tenant é omitido
+    "cache_size": 256,  # Classificadores compilados mantidos em memória (LRU)
+    "notify_channel": "tenant_config",  # LISTEN/NOTIFY do PostgreSQL para invalidar caches
+    "listen": os.getenv("TENANT_LISTEN", "true").lower() == "true"
+}
+
+# Reprocessamento (rescore) de logs históricos após mudanças nas regras
+RESCORE_CONFIG = {
+    "chunk_size": 5000,  # Faixa de ids lida por vez
+    "workers": int(os.getenv("RESCORE_WORKERS", "4")),  # Processos de score
+    "write_batch_size": 1000,  # Linhas por UPDATE ... FROM (VALUES ...) (uma transação curta cada)
+    "target_db_load": 0.5,  # Fração do tempo em que o job pode ocupar o banco
+    "lock_timeout_ms": 2000,  # Desiste de um lote bloqueado em vez de esperar (PostgreSQL)
+    "max_retries": 5,
+    "checkpoint_path": os.getenv("RESCORE_CHECKPOINT", "rescore.checkpoint.json")
+}
+
+# Coalescência de eventos repetidos na gravação (o score continua vendo cada evento)
+COALESCE_CONFIG = {
+    "enabled": os.getenv("INGEST_COALESCE", "true").lower() == "true",
+    "window_seconds": float(os.getenv("INGEST_COALESCE_WINDOW", "10")),  # Contada a partir do first_seen da linha
+    "max_entries": 100000  # Impressões digitais mantidas (LRU); as mais antigas deixam de ser fundidas
+}
+
+# Retenção de access_logs: linhas antigas viram agregados por hora e arquivos comprimidos
+RETENTION_CONFIG = {
+    "enabled": os.getenv("RETENTION_ENABLED", "false").lower() == "true",
+    "raw_days": int(os.getenv("RETENTION_RAW_DAYS", "30")),  # Tráfego normal mantido linha a linha
+    "threat_days": int(os.getenv("RETENTION_THREAT_DAYS", "180")),  # Ameaças (is_threat) ficam mais tempo
+    "hourly_days": int(os.getenv("RETENTION_HOURLY_DAYS", "730")),  # Agregados por hora; 0 = sem limite
+    "archive": os.getenv("RETENTION_ARCHIVE", "true").lower() == "true",  # NDJSON gzip antes de remover
+    "archive_dir": os.getenv("RETENTION_ARCHIVE_DIR", "archive"),
+    "compression_level": 6,
+    "batch_size": 5000,  # Linhas por transação (arquivo + agregados + DELETE)
+    "max_batches_per_run": 20,  # O restante fica para a próxima execução
+    "pause_seconds": 0.2,  # Entre lotes, para não monopolizar o banco
+    "lock_timeout_ms": 2000,  # Desiste de um lote bloqueado em vez de esperar (PostgreSQL)
+    "interval_seconds": 3600,
+    "backlog_interval_seconds": 30,  # Intervalo enquanto ainda há linhas elegíveis
+    "vacuum": True  # VACUUM (ANALYZE) após remoções no PostgreSQL
+}
+
+# Replay de eventos históricos com um SECURITY_CONFIG candidato (sem gravar nada)
+REPLAY_CONFIG = {
+    "workers": int(os.getenv("REPLAY_WORKERS", str(os.cpu_count() or 1))),  # Processos; 1 = no próprio processo
+    "partition_rows": 250000,  # Faixa de ids por partição do banco
+    "batch_size": 10000,  # Linhas convertidas e avaliadas por vez
+    "cache_entries": 500000,  # Memo por worker de IPs e níveis de alerta (limpo ao encher)
+    "top_ips": 20,  # IPs com mais eventos alterados no resumo
+    "default_days": 30
+}
+
+# Listeners de rede para ingestão direta (syslog RFC 5424, CEF e NDJSON)
+LISTENER_CONFIG = {
+    "enabled": os.getenv("INTAKE_LISTENERS", "false").lower() == "true",
+    "host": os.getenv("INTAKE_HOST", "0.0.0.0"),
+    "listeners": [
+        {"name": "syslog-udp", "protocol": "syslog", "transport": "udp", "port": 5514},
+        {"name": "syslog-tcp", "protocol": "syslog", "transport": "tcp", "port": 5514},
+        {"name": "cef-tcp", "protocol": "cef", "transport": "tcp", "port": 5515},
+        {"name": "ndjson-tcp", "protocol": "ndjson", "transport": "tcp", "port": 5516}
+        # "tenant_id": "..." num listener atribui o tenant às mensagens que não informam um
+    ],
+    "batch_size": 5000,  # Mensagens por chamada de ingest_batch
+    "flush_interval_seconds": 0.2,  # Grava lotes incompletos após esse intervalo
+    "max_pending": 200000,  # Acima disso o TCP para de ler as conexões e o UDP descarta (dropped)
+    "max_frame_bytes": 65536,  # Mensagens maiores são descartadas (parse_errors)
+    "receive_buffer_bytes": 262144,  # Buffer de recepção por conexão TCP
+    "udp_receive_buffer_bytes": 4 * 1024 * 1024  # SO_RCVBUF dos sockets UDP
+}
+
+# Roteamento e envio de alertas (destinos referenciam SECURITY_CONFIG["notifications"])
+ALERT_CONFIG = {
+    "enabled": os.getenv("ALERTS_ENABLED", "false").lower() == "true",
+    "rules": [
+        {
+            "name": "Evento crítico",
+            "alert_levels": ["CRÍTICO"],
+            "targets": ["email:emergency", "slack:security_channel"]
+        },
+        {
+            "name": "Ativo crítico sob ataque",
+            "alert_levels": ["ALTO"],
+            "asset_criticality": ["ALTA", "CRÍTICA"],
+            "min_score": 0.7,
+            "targets": ["email:security_team", "slack:security_channel"]
+        },
+        {
+            "name": "Alerta na DMZ",
+            "alert_levels": ["ALTO", "CRÍTICO"],
+            "network_zones": ["dmz"],
+            "targets": ["slack:it_channel"]
+        }
+    ],
+    "group_window_seconds": 60,  # O 1º evento (regra, IP, nível) sai na hora; os seguintes, um resumo por janela
+    "queue_size": 10000,  # Eventos além disso são descartados (a ingestão nunca espera)
+    "workers": 4,
+    "max_attempts": 3,
+    "retry_backoff_seconds": 1.0,
+    "dead_letter_size": 1000,
+    "rate_limits": {
+        "email": {"rate_per_second": 1.0, "burst": 5},
+        "slack": {"rate_per_second": 1.0, "burst": 10}
+    },
+    "email": {
+        "host": os.getenv("SMTP_HOST", "localhost"),
+        "port": int(os.getenv("SMTP_PORT", "1025")),
+        "sender": os.getenv("ALERT_SENDER", "safeshield@empresa.com"),
+        "timeout": 10
+    },
+    "slack": {
+        "url": os.getenv("SLACK_WEBHOOK_URL", ""),
+        "timeout": 10
+    }
+}
+
+# Zonas de rede da classificação de IPs (analyze_ip e tenant padrão); fora delas a zona é "external"
+NETWORK_ZONES = {
+    "local": "192.168.1.0/24",
+    "vpn": "10.0.0.0/16",
+    "dmz": "172.16.0.0/24"
+}
+
 # Configuração da Rede Corporativa
 COMPANY_NETWORK = {
     "name": "SafeShield Demo Corp",
@@ -121,6 +350,10 @@ SECURITY_CONFIG = {
     "max_login_attempts": 5,
     "suspicious_transaction_threshold": 5000,
     "session_timeout_minutes": 30,
+
+    # Regras do score de ameaça (model.predict_threat); os limites acima definem o nível de alerta
+    "threat_login_attempts": 3,  # Tentativas acima disso somam 0.4 ao score
+    "threat_score_countries": ["XX", "YY", "ZZ"],  # Países que somam 0.3 ao score (exemplo; substitua pelos reais)
     
     # Países de Alto Risco
     "high_risk_countries": [
@@ -151,7 +384,18 @@ SECURITY_CONFIG = {
     "business_hours": {
         "start": "08:00",
         "end": "18:00",
-        "timezone": "America/Sao_Paulo"
+        "timezone": "America/Sao_Paulo",
+        "weekdays": [0, 1, 2, 3, 4],  # Segunda a sexta
+        # Feriados nacionais fixos (MM-DD) e móveis em dias relativos à Páscoa
+        "holidays": ["01-01", "04-21", "05-01", "09-07", "10-12", "11-02", "11-15", "11-20", "12-25"],
+        "easter_offsets": [-48, -47, -2, 60],  # Carnaval (seg/ter), Sexta-feira Santa, Corpus Christi
+        "extra_dates": [],  # Datas avulsas (YYYY-MM-DD), ex.: recessos da empresa
+        # Tabelas por minuto pré-calculadas para este intervalo em torno de hoje
+        "table_days_back": 400,
+        "table_days_ahead": 35,
+        # Acesso fora do horário a ativos com estas criticidades soma ao score e eleva o alerta
+        "off_hours_criticality": ["ALTA", "CRÍTICA"],
+        "off_hours_score": 0.2
     },
     
     # Configurações de Bloqueio
@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from backend.config import CORRELATION_RULES, CORRELATION_MAX_ENTITIES
+
+
+class CompiledRule:
+    """Regra de correlação pronta para avaliação incremental"""
+
+    def __init__(self, index: int, rule: dict):
+        self.index = index
+        self.name = rule["name"]
+        self.sequence = tuple(rule["sequence"])
+        self.group_by = rule["group_by"]
+        self.window = rule["window_minutes"] * 60.0
+        self.severity = rule["severity"]
+
+
+class CorrelationEngine:
+    """Casa sequências ordenadas de técnicas por entidade com uma máquina de estados incremental
+
+    Para cada (regra, entidade) guarda, por etapa k, o início da casada parcial mais recente que
+    já completou k técnicas. Um evento só avalia as regras que contêm sua técnica (índice
+    técnica -> [(regra, posição)]), então o custo por evento não depende do histórico.
+    Os estados de cada regra ficam em ordem de último passo: a expiração a cada lote só
+    examina os mais antigos, e o relógio é o maior timestamp de evento já visto.
+    """
+
+    def __init__(self, rules: list = CORRELATION_RULES, max_entities: int = CORRELATION_MAX_ENTITIES):
+        self.rules = [CompiledRule(i, rule) for i, rule in enumerate(rules)]
+        self.max_entities = max_entities
+        self._index = {}
+        for rule in self.rules:
+            for position, technique in enumerate(rule.sequence):
+                self._index.setdefault(technique, []).append((rule, position))
+        # Posições em ordem decrescente para que um evento não avance duas etapas da mesma regra
+        for entries in self._index.values():
+            entries.sort(key=lambda item: -item[1])
+        # Por regra: chave da entidade -> [início por etapa, instante do último passo]
+        self._states = {rule.index: OrderedDict() for rule in self.rules}
+        self._clock = 0.0
+        self._lock = threading.Lock()
+        self._events = 0
+        self._total_ns = 0
+        self._max_ns = 0
+        self._incidents = 0
+
+    def process_batch(self, logs) -> list:
+        """Avalia um lote de eventos e retorna os incidentes completados"""
+        incidents = []
+        with self._lock:
+            for log in logs:
+                start = time.perf_counter_ns()
+                technique = log.technique
+                if log.ts > self._clock:
+                    self._clock = log.ts
+                if technique in self._index:
+                    self._advance(log, technique, incidents)
+                elapsed = time.perf_counter_ns() - start
+                self._events += 1
+                self._total_ns += elapsed
+                if elapsed > self._max_ns:
+                    self._max_ns = elapsed
+            self._expire(self._clock)
+            self._incidents += len(incidents)
+        return incidents
+
+    def _advance(self, log, technique: str, incidents: list):
+        ts = log.ts
+        for rule, position in self._index[technique]:
+            entity = getattr(log, rule.group_by, None)
+            if not entity:
+                continue
+            states = self._states[rule.index]
+            state = states.get(entity)
+            if position == 0:
+                if state is None:
+                    state = states[entity] = [None] * len(rule.sequence) + [ts]
+                else:
+                    states.move_to_end(entity)
+                # Nova casada parcial começa agora (a mais recente tem a maior chance de caber na janela)
+                state[0] = ts
+                state[-1] = ts
+                if len(rule.sequence) == 1:
+                    self._emit(rule, entity, ts, ts, incidents)
+                    del states[entity]
+                continue
+            if state is None:
+                continue
+            started = state[position - 1]
+            if started is None or ts - started > rule.window:
+                continue
+            if position == len(rule.sequence) - 1:
+                self._emit(rule, entity, started, ts, incidents)
+                del states[entity]
+            else:
+                current = state[position]
+                state[position] = started if current is None else max(current, started)
+                state[-1] = ts
+                states.move_to_end(entity)
+
+    def _emit(self, rule: CompiledRule, entity: str, first_ts: float, last_ts: float, incidents: list):
+        incidents.append({
+            "rule_name": rule.name,
+            "entity_type": rule.group_by,
+            "entity_key": entity,
+            "techniques": " → ".join(rule.sequence),
+            "severity": rule.severity,
+            "first_seen": datetime.fromtimestamp(first_ts),
+            "last_seen": datetime.fromtimestamp(last_ts)
+        })
+
+    def _expire(self, now: float):
+        """Remove casadas parciais cuja janela já fechou e, acima de max_entities, as mais antigas"""
+        for rule in self.rules:
+            states = self._states[rule.index]
+            while states and now - states[next(iter(states))][-1] > rule.window:
+                states.popitem(last=False)
+        excess = sum(len(states) for states in self._states.values()) - self.max_entities
+        while excess > 0:
+            oldest = min(
+                (states for states in self._states.values() if states),
+                key=lambda states: states[next(iter(states))][-1]
+            )
+            oldest.popitem(last=False)
+            excess -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rules": len(self.rules),
+                "events": self._events,
+                "incidents": self._incidents,
+                "partial_matches": sum(len(states) for states in self._states.values()),
+                "avg_event_us": round(self._total_ns / self._events / 1000, 3) if self._events else 0.0,
+                "max_event_us": round(self._max_ns / 1000, 3)
+            }
+
+
+# Instância compartilhada pelo pipeline de ingestão
+correlation_engine = CorrelationEngine()
@@ -1,31 +1,73 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from backend.models import AccessLog, Asset
-from backend.schemas import AccessLogCreate
+from sqlalchemy import and_, bindparam, case, desc, func, insert, literal_column, not_, or_, update
+from backend.models import AccessLog, AccessLogHourly, Incident
+from backend.events import Event
+from backend.config import THREAT_SCORE_THRESHOLD, TENANT_CONFIG
+from backend.description_parser import parse_search_query
 from datetime import datetime, timedelta
 
-def create_access_log(db: Session, log: AccessLogCreate, threat_score: float):
+def create_access_log(db: Session, event: Event):
     """Cria um novo log de acesso"""
-    db_log = AccessLog(
-        ip_address=log.ip_address,
-        country=log.country,
-        timestamp=log.timestamp or datetime.now(),
-        login_attempts=log.login_attempts,
-        transaction_value=log.transaction_value,
-        description=log.description,
-        threat_score=threat_score,
-        is_threat=threat_score > 0.7,
-        is_internal=log.is_internal,
-        asset_name=log.asset_name,
-        network_zone=log.network_zone,
-        is_authorized=log.is_authorized,
-        alert_level=log.alert_level
-    )
+    db_log = AccessLog(**event.row())
     db.add(db_log)
     db.commit()
     db.refresh(db_log)
     return db_log
 
+def create_access_logs(db: Session, events: list) -> int:
+    """Cria um lote de logs de acesso em uma única transação (INSERT em lote, sem objetos ORM)"""
+    if not events:
+        return 0
+    db.execute(insert(AccessLog), [event.row() for event in events])
+    db.commit()
+    return len(events)
+
+def create_coalesced_logs(db: Session, groups: list, updates: list) -> list:
+    """Grava grupos de ocorrências numa transação: INSERT das linhas novas e incremento das existentes
+
+    Preenche row_id de cada grupo novo (RETURNING na ordem dos parâmetros).
+    """
+    if groups:
+        result = db.execute(
+            insert(AccessLog).returning(AccessLog.id, sort_by_parameter_order=True),
+            [group.row() for group in groups]
+        )
+        for group, row_id in zip(groups, result.scalars()):
+            group.row_id = row_id
+    if updates:
+        table = AccessLog.__table__
+        greatest = func.greatest if db.get_bind().dialect.name == "postgresql" else func.max
+        least = func.least if db.get_bind().dialect.name == "postgresql" else func.min
+        statement = update(table).where(table.c.id == bindparam("row_id")).values(
+            occurrence_count=func.coalesce(table.c.occurrence_count, 1) + bindparam("count"),
+            first_seen=least(func.coalesce(table.c.first_seen, table.c.timestamp), bindparam("first_seen")),
+            last_seen=greatest(func.coalesce(table.c.last_seen, table.c.timestamp), bindparam("last_seen")),
+            threat_score=greatest(func.coalesce(table.c.threat_score, 0.0), bindparam("threat_score")),
+            is_threat=or_(table.c.is_threat, bindparam("is_threat")),
+            login_attempts=greatest(func.coalesce(table.c.login_attempts, 0), bindparam("login_attempts")),
+            # Linhas sem as somas (gravadas antes delas) partem do valor da própria linha
+            threat_count=func.coalesce(
+                table.c.threat_count,
+                case((table.c.is_threat, func.coalesce(table.c.occurrence_count, 1)), else_=0)
+            ) + bindparam("threats"),
+            login_attempts_total=func.coalesce(table.c.login_attempts_total, table.c.login_attempts, 0)
+            + bindparam("login_attempts_total"),
+            transaction_value_total=func.coalesce(table.c.transaction_value_total, table.c.transaction_value, 0.0)
+            + bindparam("transaction_value_total")
+        )
+        db.execute(statement.execution_options(synchronize_session=False), [
+            {
+                "row_id": group.row_id, "count": group.count, "first_seen": group.first_seen,
+                "last_seen": group.last_seen, "threat_score": group.threat_score,
+                "is_threat": group.is_threat, "login_attempts": group.login_attempts,
+                "threats": group.threats, "login_attempts_total": group.login_attempts_total,
+                "transaction_value_total": group.transaction_value_total
+            }
+            for group in updates
+        ])
+    db.commit()
+    return groups
+
 def get_logs(
     db: Session,
     skip: int = 0,
@@ -36,17 +78,18 @@ def get_logs(
     criticality: str = None,
     alert_level: str = None,
     start_time: datetime = None,
-    count_only: bool = False
+    count_only: bool = False,
+    tenant_id: str = TENANT_CONFIG["default_tenant"]
 ):
     """Obtém logs com filtros"""
-    query = db.query(AccessLog)
+    query = db.query(AccessLog).filter(AccessLog.tenant_id == tenant_id)
 
     # Aplica filtros
     if network_zone:
         query = query.filter(AccessLog.network_zone == network_zone)
     
     if asset_type:
-        query = query.join(AccessLog.asset).filter(Asset.type == asset_type)
+        query = query.filter(AccessLog.asset_type == asset_type)
     
     if criticality:
         query = query.filter(AccessLog.alert_level == criticality)
@@ -59,7 +102,10 @@ def get_logs(
 
     # Se só quer a contagem
     if count_only:
-        return query.count()
+        # Linhas coalescidas representam occurrence_count eventos
+        return query.with_entities(
+            func.coalesce(func.sum(func.coalesce(AccessLog.occurrence_count, 1)), 0)
+        ).scalar()
 
     # Aplica ordenação
     if sort == "desc":
@@ -70,8 +116,95 @@ def get_logs(
     # Aplica paginação
     return query.offset(skip).limit(limit).all()
 
-def get_threats(db: Session):
+def search_logs(
+    db: Session,
+    query: str,
+    network_zone: str = None,
+    start_time: datetime = None,
+    end_time: datetime = None,
+    skip: int = 0,
+    limit: int = 100,
+    tenant_id: str = TENANT_CONFIG["default_tenant"]
+):
+    """Busca logs por CVE/técnica (colunas indexadas) e texto livre na descrição"""
+    clauses = parse_search_query(query)
+    db_query = db.query(AccessLog).filter(AccessLog.tenant_id == tenant_id)
+
+    if clauses:
+        postgres = db.get_bind().dialect.name == "postgresql"
+        db_query = db_query.filter(and_(*[
+            or_(*[_search_condition(term, postgres) for term in clause]) for clause in clauses
+        ]))
+
+    if network_zone:
+        db_query = db_query.filter(AccessLog.network_zone == network_zone)
+    if start_time:
+        db_query = db_query.filter(AccessLog.timestamp >= start_time)
+    if end_time:
+        db_query = db_query.filter(AccessLog.timestamp < end_time)
+
+    return db_query.order_by(desc(AccessLog.timestamp)).offset(skip).limit(limit).all()
+
+def _search_condition(term: dict, postgres: bool):
+    """Condição SQL de um termo da busca (ver parse_search_query)"""
+    if term["field"] in ("cve", "technique"):
+        column = getattr(AccessLog, term["field"])
+        if term["negated"]:
+            return or_(column.is_(None), column != term["value"])
+        return column == term["value"]
+    if postgres:
+        # Mesma expressão do índice GIN ix_access_logs_description_fts
+        document = func.to_tsvector(literal_column("'simple'"), func.coalesce(AccessLog.description, ""))
+        condition = document.op("@@")(func.phraseto_tsquery(literal_column("'simple'"), term["value"]))
+    else:
+        condition = func.coalesce(AccessLog.description, "").icontains(term["value"], autoescape=True)
+    return not_(condition) if term["negated"] else condition
+
+def count_logs_by_asset_type(db: Session, tenant_id: str = TENANT_CONFIG["default_tenant"]) -> dict:
+    """Contagem de logs por tipo de ativo em uma única consulta agrupada"""
+    rows = db.query(AccessLog.asset_type, func.sum(func.coalesce(AccessLog.occurrence_count, 1))).filter(
+        AccessLog.tenant_id == tenant_id, AccessLog.asset_type.isnot(None)
+    ).group_by(AccessLog.asset_type).all()
+    return {asset_type: count for asset_type, count in rows}
+
+def get_threats(db: Session, tenant_id: str = TENANT_CONFIG["default_tenant"]):
     """Obtém apenas eventos considerados ameaças"""
     return db.query(AccessLog).filter(
-        AccessLog.threat_score > 0.7
-    ).order_by(desc(AccessLog.timestamp)).all() 
\ No newline at end of file
+        AccessLog.tenant_id == tenant_id,
+        AccessLog.threat_score > THREAT_SCORE_THRESHOLD
+    ).order_by(desc(AccessLog.timestamp)).all()
+
+def get_hourly_stats(
+    db: Session,
+    start_time: datetime,
+    end_time: datetime = None,
+    network_zone: str = None,
+    tenant_id: str = TENANT_CONFIG["default_tenant"]
+):
+    """Totais por hora dos logs já removidos pela retenção (access_log_hourly)"""
+    query = db.query(
+        AccessLogHourly.hour,
+        func.sum(AccessLogHourly.events),
+        func.sum(AccessLogHourly.threats),
+        func.max(AccessLogHourly.max_threat_score)
+    ).filter(AccessLogHourly.tenant_id == tenant_id, AccessLogHourly.hour >= start_time)
+    if end_time:
+        query = query.filter(AccessLogHourly.hour < end_time)
+    if network_zone:
+        query = query.filter(AccessLogHourly.network_zone == network_zone)
+    rows = query.group_by(AccessLogHourly.hour).order_by(AccessLogHourly.hour).all()
+    return [
+        {"hour": hour, "events": events, "threats": threats, "max_threat_score": max_score}
+        for hour, events, threats, max_score in rows
+    ]
+
+def create_incidents(db: Session, incidents: list):
+    """Grava os incidentes gerados pela correlação"""
+    db_incidents = [Incident(**incident) for incident in incidents]
+    db.add_all(db_incidents)
+    db.commit()
+    return db_incidents
+
+def get_incidents(db: Session, skip: int = 0, limit: int = 100):
+    """Obtém incidentes correlacionados, mais recentes primeiro"""
+    return db.query(Incident).order_by(desc(Incident.created_at)).offset(skip).limit(limit).all()
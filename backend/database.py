@@ -1,13 +1,33 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from backend.config import DATABASE_URL
+from backend.config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    READ_REPLICA_URLS, DB_READ_POOL_SIZE, DB_READ_MAX_OVERFLOW
+)
 
-# Criar engine do SQLAlchemy
-engine = create_engine(DATABASE_URL)
+# Criar engine do SQLAlchemy (nenhuma conexão é aberta até o primeiro uso)
+# Primário: ingestão e demais escritas
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=True
+)
+
+
+def _read_engine(url: str):
+    return create_engine(url, pool_size=DB_READ_POOL_SIZE, max_overflow=DB_READ_MAX_OVERFLOW, pool_pre_ping=True)
+
+
+# Leituras: pool próprio no primário (fallback) e um por réplica
+primary_read_engine = _read_engine(DATABASE_URL)
+replica_engines = [_read_engine(url) for url in READ_REPLICA_URLS]
 
 # Criar sessão
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Sessões de leitura recebem o engine escolhido pelo roteador (ReadSession(bind=...))
+ReadSession = sessionmaker(autocommit=False, autoflush=False)
 
 # Criar base para os modelos
 Base = declarative_base()
@@ -18,4 +38,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
@@ -0,0 +1,74 @@
+import re
+
+# O simulador monta a descrição como "[ZONA] [ativo] evento | detalhes | CVE | Txxxx - Nome"
+TECHNIQUE_PATTERN = re.compile(r"\b(T\d{4}(?:\.\d{3})?)\b")
+CVE_PATTERN = re.compile(r"\b(CVE-\d{4}-\d{4,})\b", re.IGNORECASE)
+
+# Prefixos de campo aceitos na busca (cve:..., technique:..., mitre:...)
+_FIELD_PREFIXES = {"cve": "cve", "technique": "technique", "mitre": "technique"}
+# Termo da busca: -"frase negada", "frase" ou palavra (com - opcional)
+_TOKEN_PATTERN = re.compile(r'(-?)"([^"]*)"|(\S+)')
+# Operadores da busca (não são termos)
+_OR, _AND = "OR", "AND"
+
+
+def parse_technique(description):
+    """Extrai o ID da técnica MITRE ATT&CK (ex.: T1110) da descrição, se houver"""
+    if not description:
+        return None
+    match = TECHNIQUE_PATTERN.search(description)
+    return match.group(1) if match else None
+
+
+def parse_cve(description):
+    """Extrai o identificador CVE da descrição, se houver"""
+    if not description:
+        return None
+    match = CVE_PATTERN.search(description)
+    return match.group(1).upper() if match else None
+
+
+def _search_term(value: str, negated: bool, phrase: bool):
+    """Termo da busca: filtro de coluna (CVE/técnica) ou texto livre"""
+    if not phrase:
+        field, _, field_value = value.partition(":")
+        if field_value and field.lower() in _FIELD_PREFIXES:
+            return {"field": _FIELD_PREFIXES[field.lower()], "value": field_value.upper(), "negated": negated}
+        if CVE_PATTERN.fullmatch(value):
+            return {"field": "cve", "value": value.upper(), "negated": negated}
+        if TECHNIQUE_PATTERN.fullmatch(value.upper()):
+            return {"field": "technique", "value": value.upper(), "negated": negated}
+    if not value.strip():
+        return None
+    return {"field": "text", "value": value, "negated": negated}
+
+
+def parse_search_query(query: str) -> list:
+    """Converte a busca numa expressão booleana: lista de cláusulas (AND) de termos alternativos (OR)
+
+    Segue a sintaxe de websearch_to_tsquery: termos separados por espaço são AND, OR une o termo
+    anterior ao seguinte (com precedência sobre o AND), -termo nega e "frases" casam em sequência.
+    Termos como "CVE-2023-5678", "T1486" ou com prefixo "cve:"/"technique:" viram filtros nas
+    colunas indexadas e respeitam OR e - como os demais.
+    """
+    clauses = []
+    pending_or = False
+    for quoted_negation, phrase, word in _TOKEN_PATTERN.findall(query or ""):
+        if word.upper() == _OR:
+            pending_or = bool(clauses)
+            continue
+        if word.upper() == _AND:
+            continue
+        if phrase or quoted_negation:
+            term = _search_term(phrase, bool(quoted_negation), True)
+        else:
+            negated = word.startswith("-") and len(word) > 1
+            term = _search_term(word[1:] if negated else word, negated, False)
+        if term is None:
+            continue
+        if pending_or:
+            clauses[-1].append(term)
+        else:
+            clauses.append([term])
+        pending_or = False
+    return clauses
@@ -0,0 +1,140 @@
+import ipaddress
+import socket
+import sys
+from datetime import datetime
+from backend.config import THREAT_SCORE_THRESHOLD
+from backend.description_parser import parse_cve, parse_technique
+from backend.tenants import tenant_registry, EXTERNAL_ZONE
+from backend.feature_store import country_code
+
+
+def ip_to_int(ip_address: str):
+    """IPv4/IPv6 como inteiro (None se inválido)"""
+    try:
+        return int.from_bytes(socket.inet_aton(ip_address), "big")
+    except (OSError, TypeError):
+        try:
+            return int(ipaddress.ip_address(ip_address))
+        except ValueError:
+            return None
+
+
+def _intern(value):
+    return sys.intern(value) if value else value
+
+
+class Event:
+    """Representação interna de um evento no pipeline de ingestão
+
+    Criado uma vez na entrada (API ou listeners) e usado por score, feature store,
+    correlação, sketches, alertas e persistência sem conversões intermediárias.
+    Dimensões de baixa cardinalidade são internadas (uma única cópia por valor) e os
+    campos derivados (país, técnica, CVE, ativo, epoch) são calculados só aqui.
+    """
+
+    __slots__ = (
+        "tenant_id", "ip_address", "ip_int", "country", "country_code", "timestamp", "ts",
+        "login_attempts", "transaction_value", "description", "technique", "cve",
+        "is_internal", "is_authorized", "network_zone", "alert_level",
+        "asset_name", "asset_id", "asset_type", "asset_criticality", "threat_score", "time_context"
+    )
+
+    def __init__(
+        self,
+        ip_address: str,
+        country: str,
+        description: str,
+        timestamp: datetime = None,
+        login_attempts: int = 0,
+        transaction_value: float = 0.0,
+        is_internal: bool = None,
+        asset_name: str = None,
+        network_zone: str = None,
+        is_authorized: bool = None,
+        alert_level: str = None,
+        tenant_id: str = None
+    ):
+        # Zona, rede interna e autorização omitidas vêm do classificador do tenant
+        tenant = tenant_registry.get(tenant_id)
+        self.tenant_id = tenant.id
+        self.ip_address = ip_address
+        self.ip_int = ip_to_int(ip_address)
+        version = 6 if ":" in (ip_address or "") else 4
+        zone = tenant.zone(self.ip_int, version)
+        self.country = _intern(country)
+        self.country_code = _intern(country_code(country))
+        self.timestamp = timestamp or datetime.now()
+        self.ts = self.timestamp.timestamp()
+        self.login_attempts = login_attempts or 0
+        self.transaction_value = transaction_value or 0.0
+        self.description = description
+        self.technique = parse_technique(description)
+        self.cve = parse_cve(description)
+        self.is_internal = zone != EXTERNAL_ZONE if is_internal is None else bool(is_internal)
+        self.is_authorized = tenant.is_authorized(self.ip_int, version) if is_authorized is None else bool(is_authorized)
+        self.network_zone = _intern(network_zone or zone)
+        self.alert_level = _intern(alert_level)
+        self.threat_score = 0.0
+        self.time_context = None  # Preenchido em lote pelo calendário de expediente no score
+
+        asset = tenant.asset(ip_address)
+        self.asset_name = _intern(asset_name or (asset.name if asset else None))
+        self.asset_id = asset.id if asset else None
+        self.asset_type = asset.type if asset else None
+        self.asset_criticality = asset.criticality if asset else None
+
+    @classmethod
+    def from_schema(cls, log, tenant_id: str = None) -> "Event":
+        """Cria a partir de um AccessLogCreate (campos não enviados ficam para o classificador)"""
+        sent = log.model_fields_set
+        return cls(
+            ip_address=log.ip_address,
+            country=log.country,
+            description=log.description,
+            timestamp=log.timestamp,
+            login_attempts=log.login_attempts,
+            transaction_value=log.transaction_value,
+            is_internal=log.is_internal if "is_internal" in sent else None,
+            asset_name=log.asset_name,
+            network_zone=log.network_zone,
+            is_authorized=log.is_authorized if "is_authorized" in sent else None,
+            alert_level=log.alert_level,
+            tenant_id=log.tenant_id or tenant_id
+        )
+
+    @property
+    def is_threat(self) -> bool:
+        return self.threat_score > THREAT_SCORE_THRESHOLD
+
+    def row(self) -> dict:
+        """Valores da linha de access_logs para inserção em lote"""
+        return {
+            "tenant_id": self.tenant_id,
+            "ip_address": self.ip_address,
+            "country": self.country,
+            "timestamp": self.timestamp,
+            "login_attempts": self.login_attempts,
+            "transaction_value": self.transaction_value,
+            "description": self.description,
+            "threat_score": self.threat_score,
+            "is_threat": self.is_threat,
+            "is_internal": self.is_internal,
+            "asset_name": self.asset_name,
+            "network_zone": self.network_zone,
+            "is_authorized": self.is_authorized,
+            "alert_level": self.alert_level,
+            "cve": self.cve,
+            "technique": self.technique,
+            "asset_id": self.asset_id,
+            "asset_type": self.asset_type,
+            "occurrence_count": 1,
+            "first_seen": self.timestamp,
+            "last_seen": self.timestamp,
+            "threat_count": int(self.is_threat),
+            "login_attempts_total": self.login_attempts,
+            "transaction_value_total": self.transaction_value
+        }
+
+
+def to_event(log, tenant_id: str = None) -> Event:
+    return log if isinstance(log, Event) else Event.from_schema(log, tenant_id)
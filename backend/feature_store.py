@@ -0,0 +1,250 @@
+import json
+import math
+import os
+import struct
+import threading
+import time
+from array import array
+from backend.config import FEATURE_STORE_CONFIG
+
+
+def country_code(value) -> str:
+    """Extrai o código do país de valores como 'RU - 🇷🇺 Rússia'"""
+    return (value or "")[:2].upper()
+
+
+class EntityTable:
+    """Agregados de um tipo de entidade em colunas (arrays), uma linha (slot) por chave"""
+
+    # Colunas float: atividade, contadores com decaimento e estatísticas do valor
+    FLOAT_COLUMNS = ("last_seen", "events", "attempts", "failed", "value_mean", "value_var", "value_n")
+    # Além delas, um bitmap (array "Q") de países vistos: até 64 países distintos por entidade
+    # (a partir do 64º país todos compartilham o último bit e a contagem satura em 64)
+
+    def __init__(self, name: str, max_entities: int, rate_window: float, alpha: float):
+        self.name = name
+        self.max_entities = max_entities
+        self.rate_window = rate_window
+        self.alpha = alpha
+        self._slots = {}
+        self._keys = []
+        self._free = []
+        self._cols = {col: array("d") for col in self.FLOAT_COLUMNS}
+        self._mask = array("Q")
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _allocate(self, key, now: float) -> int:
+        if not self._free and len(self._keys) >= self.max_entities:
+            self._evict_oldest()
+        if self._free:
+            slot = self._free.pop()
+            self._keys[slot] = key
+            for col in self._cols.values():
+                col[slot] = 0.0
+            self._mask[slot] = 0
+        else:
+            slot = len(self._keys)
+            self._keys.append(key)
+            for col in self._cols.values():
+                col.append(0.0)
+            self._mask.append(0)
+        self._cols["last_seen"][slot] = now
+        self._slots[key] = slot
+        return slot
+
+    def _release(self, slot: int):
+        del self._slots[self._keys[slot]]
+        self._keys[slot] = None
+        self._free.append(slot)
+        self.evicted += 1
+
+    def _evict_oldest(self):
+        """Tabela cheia: libera de uma vez 1/16 das entidades inativas há mais tempo"""
+        last_seen = self._cols["last_seen"]
+        count = max(len(self._slots) // 16, 1)
+        for slot in sorted(self._slots.values(), key=last_seen.__getitem__)[:count]:
+            self._release(slot)
+
+    def evict_idle(self, now: float, ttl: float) -> int:
+        """Remove entidades sem eventos há mais de `ttl` segundos"""
+        last_seen = self._cols["last_seen"]
+        cutoff = now - ttl
+        idle = [slot for slot in self._slots.values() if last_seen[slot] < cutoff]
+        for slot in idle:
+            self._release(slot)
+        return len(idle)
+
+    def update(self, key, ts: float, value: float, attempts: int, country_bit: int):
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._allocate(key, ts)
+        cols = self._cols
+
+        # Contadores com decaimento exponencial (eventos fora de ordem não decaem)
+        dt = max(ts - cols["last_seen"][slot], 0.0)
+        decay = math.exp(-dt / self.rate_window)
+        cols["events"][slot] = cols["events"][slot] * decay + 1.0
+        cols["attempts"][slot] = cols["attempts"][slot] * decay + attempts
+        cols["failed"][slot] = cols["failed"][slot] * decay + max(attempts - 1, 0)
+        if ts > cols["last_seen"][slot]:
+            cols["last_seen"][slot] = ts
+
+        # EWMA e variância exponencial do valor da transação
+        n = cols["value_n"][slot]
+        if n == 0:
+            cols["value_mean"][slot] = value
+        else:
+            diff = value - cols["value_mean"][slot]
+            incr = self.alpha * diff
+            cols["value_mean"][slot] += incr
+            cols["value_var"][slot] = (1 - self.alpha) * (cols["value_var"][slot] + diff * incr)
+        cols["value_n"][slot] = n + 1
+
+        self._mask[slot] |= country_bit
+
+    def get(self, key):
+        """Leitura O(1) dos agregados de uma entidade"""
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        cols = self._cols
+        attempts = cols["attempts"][slot]
+        return {
+            "events_per_min": cols["events"][slot] * 60.0 / self.rate_window,
+            "distinct_countries": self._mask[slot].bit_count(),
+            "value_ewma": cols["value_mean"][slot],
+            "value_std": math.sqrt(cols["value_var"][slot]),
+            "failed_login_ratio": cols["failed"][slot] / attempts if attempts else 0.0,
+            "last_seen": cols["last_seen"][slot],
+            "events": int(cols["value_n"][slot])
+        }
+
+    def dump(self):
+        header = {"keys": self._keys, "free": self._free, "evicted": self.evicted}
+        blobs = [self._cols[col].tobytes() for col in self.FLOAT_COLUMNS]
+        blobs.append(self._mask.tobytes())
+        return header, blobs
+
+    def restore(self, header: dict, blobs: list):
+        self._keys = header["keys"]
+        self._free = header["free"]
+        self.evicted = header.get("evicted", 0)
+        self._slots = {key: slot for slot, key in enumerate(self._keys) if key is not None}
+        for col, blob in zip(self.FLOAT_COLUMNS, blobs):
+            self._cols[col] = array("d", blob)
+        self._mask = array("Q", blobs[len(self.FLOAT_COLUMNS)])
+
+
+class FeatureStore:
+    """Agregados comportamentais por IP, ativo e país, atualizados a cada evento ingerido"""
+
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, config: dict = FEATURE_STORE_CONFIG):
+        self.config = config
+        self._lock = threading.Lock()
+        self._last_eviction = time.time()
+        self.reset()
+
+    def reset(self):
+        """Descarta todos os agregados"""
+        config = self.config
+        with self._lock:
+            self.tables = {
+                name: EntityTable(name, config["max_entities"], config["rate_window_seconds"], config["ewma_alpha"])
+                for name in ("ip", "asset", "country")
+            }
+            self._country_bits = {}
+
+    def _country_bit(self, code: str) -> int:
+        bit = self._country_bits.get(code)
+        if bit is None:
+            # Satura no último bit: dar a volta faria um país novo contar como um já visto
+            bit = self._country_bits[code] = 1 << min(len(self._country_bits), 63)
+        return bit
+
+    def update(self, log):
+        self.update_batch([log])
+
+    def update_batch(self, logs):
+        with self._lock:
+            for log in logs:
+                ts = log.ts
+                code = log.country_code
+                bit = self._country_bit(code)
+                value = log.transaction_value
+                attempts = log.login_attempts
+                self.tables["ip"].update(log.ip_address, ts, value, attempts, bit)
+                if log.asset_name:
+                    self.tables["asset"].update(log.asset_name, ts, value, attempts, bit)
+                if code:
+                    self.tables["country"].update(code, ts, value, attempts, bit)
+            self._maybe_evict()
+
+    def _maybe_evict(self):
+        now = time.time()
+        if now - self._last_eviction < self.config["eviction_interval_seconds"]:
+            return
+        self._last_eviction = now
+        for table in self.tables.values():
+            table.evict_idle(now, self.config["idle_ttl_seconds"])
+
+    def get(self, kind: str, key):
+        return self.tables[kind].get(key)
+
+    def features_for(self, log) -> dict:
+        """Agregados atuais das entidades de um evento"""
+        return {
+            "ip": self.get("ip", log.ip_address),
+            "asset": self.get("asset", log.asset_name) if log.asset_name else None,
+            "country": self.get("country", log.country_code)
+        }
+
+    def stats(self) -> dict:
+        return {
+            name: {"entities": len(table), "evicted": table.evicted}
+            for name, table in self.tables.items()
+        }
+
+    def save(self, path: str):
+        """Grava um snapshot binário: cabeçalho JSON + colunas brutas"""
+        with self._lock:
+            dumped = {name: table.dump() for name, table in self.tables.items()}
+            header = {
+                "version": self.SNAPSHOT_VERSION,
+                "country_bits": self._country_bits,
+                "tables": {name: h for name, (h, _) in dumped.items()},
+                "sizes": {name: [len(b) for b in blobs] for name, (_, blobs) in dumped.items()}
+            }
+            raw_header = json.dumps(header).encode("utf-8")
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(struct.pack("<Q", len(raw_header)))
+                f.write(raw_header)
+                for _, blobs in dumped.values():
+                    for blob in blobs:
+                        f.write(blob)
+            os.replace(tmp_path, path)
+
+    def load(self, path: str) -> bool:
+        """Restaura um snapshot; retorna False se o arquivo não existir ou for de outra versão"""
+        if not os.path.exists(path):
+            return False
+        with open(path, "rb") as f:
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len))
+            if header.get("version") != self.SNAPSHOT_VERSION:
+                return False
+            with self._lock:
+                self._country_bits = header["country_bits"]
+                for name, table in self.tables.items():
+                    blobs = [f.read(size) for size in header["sizes"][name]]
+                    table.restore(header["tables"][name], blobs)
+        return True
+
+
+# Instância compartilhada pelo pipeline de ingestão
+feature_store = FeatureStore()
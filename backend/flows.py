@@ -0,0 +1,171 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from backend.config import FLOW_CONFIG, THREAT_SCORE_THRESHOLD
+from backend.feature_store import country_code
+from backend.tenants import EXTERNAL_ZONE
+
+# Severidade máxima por célula (0 = evento sem nível)
+LEVELS = {
+    "BAIXO": 1, "MÉDIO": 2, "ALTO": 3, "CRÍTICO": 4,
+    "BAIXA": 1, "MÉDIA": 2, "ALTA": 3, "CRÍTICA": 4
+}
+LEVEL_NAMES = [None, "BAIXO", "MÉDIO", "ALTO", "CRÍTICO"]
+OTHER = "??"  # Ids além do limite caem nesta entrada
+
+
+class _Dictionary:
+    """Valor -> id compacto, só cresce (o cliente guarda a tabela e pede apenas as novas entradas)"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.ids = {OTHER: 0}
+        self.names = [OTHER]
+
+    def id(self, value: str) -> int:
+        found = self.ids.get(value)
+        if found is not None:
+            return found
+        if len(self.names) >= self.limit:
+            return 0
+        found = self.ids[value] = len(self.names)
+        self.names.append(value)
+        return found
+
+
+class FlowMatrix:
+    """Fluxos país de origem -> zona de destino por minuto, mantidos na ingestão
+
+    Cada tenant tem um dicionário minuto -> {(país << 16) | zona: [eventos, ameaças, nível máx.]}.
+    Só células com eventos existem. Cada lote gravado recebe um número de sequência e cada
+    minuto guarda o do último lote que o alterou: o delta devolve os minutos alterados depois da
+    sequência do cliente, inclusive os antigos que receberam eventos atrasados.
+    """
+
+    def __init__(self, config: dict = FLOW_CONFIG):
+        self.config = config
+        self.bucket_seconds = config["bucket_seconds"]
+        self.countries = _Dictionary(config["max_countries"])
+        self.zones = _Dictionary(config["max_zones"])
+        self._tenants = {}
+        self._changed = {}  # Tenant -> {minuto: sequência do último lote que o alterou}
+        self.sequence = 0
+        self._lock = threading.Lock()
+        # Muda a cada reinício: os ids das tabelas não valem entre instâncias
+        self.epoch = int(time.time() * 1000)
+
+    def _oldest(self) -> int:
+        return int(time.time() // self.bucket_seconds) - self.config["retention_minutes"] * 60 // self.bucket_seconds + 1
+
+    def _add(self, tenant_id, country, zone, ts, level, threats, oldest, count=1):
+        bucket_id = int(ts // self.bucket_seconds)
+        if bucket_id < oldest:
+            return  # Fora da retenção (evento atrasado)
+        buckets = self._tenants.get(tenant_id)
+        if buckets is None:
+            buckets = self._tenants[tenant_id] = {}
+            self._changed[tenant_id] = {}
+        changed = self._changed[tenant_id]
+        changed[bucket_id] = self.sequence
+        cells = buckets.get(bucket_id)
+        if cells is None:
+            cells = buckets[bucket_id] = {}
+            for stale in [b for b in buckets if b < oldest]:
+                del buckets[stale]
+                del changed[stale]
+        key = (self.countries.id(country or OTHER) << 16) | self.zones.id(zone or EXTERNAL_ZONE)
+        cell = cells.get(key)
+        rank = LEVELS.get(level, 0)
+        if cell is None:
+            cells[key] = [count, threats, rank]
+            return
+        cell[0] += count
+        cell[1] += threats
+        if rank > cell[2]:
+            cell[2] = rank
+
+    def update_batch(self, logs, scores):
+        oldest = self._oldest()
+        with self._lock:
+            self.sequence += 1
+            for log, score in zip(logs, scores):
+                self._add(log.tenant_id, log.country_code, log.network_zone, log.ts,
+                          log.alert_level, int(score > THREAT_SCORE_THRESHOLD), oldest)
+
+    def rebuild(self, db: Session, minutes: int = None) -> int:
+        """Recarrega os últimos minutos a partir do banco (a matriz vive só em memória)"""
+        from backend.models import AccessLog
+        minutes = self.config["rebuild_minutes"] if minutes is None else minutes
+        since = datetime.now() - timedelta(minutes=minutes)
+        query = select(
+            AccessLog.tenant_id, AccessLog.country, AccessLog.network_zone, AccessLog.timestamp,
+            AccessLog.alert_level, AccessLog.is_threat, AccessLog.occurrence_count, AccessLog.threat_count
+        ).where(AccessLog.timestamp >= since)
+        rows, oldest = 0, self._oldest()
+        with self._lock:
+            self._tenants.clear()
+            self._changed.clear()
+            self.sequence += 1
+            for tenant_id, country, zone, timestamp, level, is_threat, count, threats in db.execute(query).yield_per(5000):
+                if threats is None:  # Linha gravada antes de threat_count
+                    threats = (count or 1) if is_threat else 0
+                self._add(tenant_id, country_code(country), zone, timestamp.timestamp(), level, threats, oldest,
+                          count or 1)
+                rows += 1
+        return rows
+
+    def flows(self, tenant_id: str, since: int = None, minutes: int = 60,
+              known_countries: int = 0, known_zones: int = 0, sequence: int = None) -> dict:
+        """Células completas dos buckets pedidos; cada bucket devolvido substitui o do cliente
+
+        Com `sequence` (a da resposta anterior), devolve os buckets da retenção alterados depois
+        dela, inclusive por eventos atrasados. Só com `since`, os buckets a partir dele (clientes
+        antigos: não veem eventos atrasados). Sem nenhum, os últimos `minutes` minutos. O cliente
+        envia também o tamanho das tabelas de países/zonas que já tem; se `epoch` mudar (reinício
+        do worker) descarta tudo e pede a janela completa.
+        """
+        latest = int(time.time() // self.bucket_seconds)
+        oldest = self._oldest()
+        start = latest - minutes * 60 // self.bucket_seconds + 1 if since is None else since
+        start = oldest if sequence is not None else max(start, oldest)
+        cells = []
+        with self._lock:
+            buckets = self._tenants.get(tenant_id) or {}
+            changed = self._changed.get(tenant_id) or {}
+            for bucket_id in sorted(
+                b for b in buckets if start <= b <= latest and (sequence is None or changed[b] > sequence)
+            ):
+                for key, (count, threats, rank) in buckets[bucket_id].items():
+                    cells.append([bucket_id, key >> 16, key & 0xFFFF, count, threats, rank])
+            countries = self.countries.names[known_countries:]
+            zones = self.zones.names[known_zones:]
+            current = self.sequence
+        return {
+            "epoch": self.epoch,
+            "bucket_seconds": self.bucket_seconds,
+            "since": start,
+            "latest": latest,
+            "sequence": current,
+            # Entradas novas das tabelas de ids (índice = known_* + posição)
+            "countries": countries,
+            "zones": zones,
+            "levels": LEVEL_NAMES,
+            # [bucket, país, zona, eventos, ameaças, nível máx.]
+            "cells": cells
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tenants": len(self._tenants),
+                "buckets": sum(len(buckets) for buckets in self._tenants.values()),
+                "cells": sum(len(cells) for buckets in self._tenants.values() for cells in buckets.values()),
+                "countries": len(self.countries.names),
+                "zones": len(self.zones.names)
+            }
+
+
+# Instância compartilhada pela ingestão e pela API
+flow_matrix = FlowMatrix()
@@ -0,0 +1,69 @@
+from sqlalchemy.orm import Session
+from backend.crud import create_access_log, create_access_logs, create_coalesced_logs, create_incidents
+from backend.feature_store import feature_store
+from backend.anomaly import anomaly_detector
+from backend.correlation import correlation_engine
+from backend.sketches import sketch_store
+from backend.flows import flow_matrix
+from backend.alerts import alert_dispatcher
+from backend.scoring import scoring_engine
+from backend.events import to_event
+from backend.coalescing import event_coalescer
+from backend.models import AccessLog
+
+
+def score_events(logs) -> list:
+    """Atualiza os agregados com os eventos (Event) e calcula o score de cada um"""
+    feature_store.update_batch(logs)
+    scores = scoring_engine.score_batch(logs)
+    for log, score in zip(logs, scores):
+        log.threat_score = score
+    # As linhas de base só incorporam o lote depois do score (o evento não mascara o próprio desvio)
+    anomaly_detector.update_batch(logs)
+    sketch_store.update_batch(logs, scores)
+    flow_matrix.update_batch(logs, scores)
+    if alert_dispatcher.running:
+        alert_dispatcher.submit(logs, scores)
+    return scores
+
+
+def correlate_events(db: Session, logs) -> list:
+    """Avança as sequências de ataque e grava os incidentes completados"""
+    incidents = correlation_engine.process_batch(logs)
+    if incidents:
+        create_incidents(db, incidents)
+    return incidents
+
+
+def persist_events(db: Session, events, coalescer=event_coalescer) -> list:
+    """Grava eventos já pontuados fundindo repetições; retorna o id da linha de cada evento"""
+    created, updates, targets = coalescer.plan(events)
+    create_coalesced_logs(db, [group for _, group in created], updates)
+    coalescer.register(created)
+    return [group.row_id for group in targets]
+
+
+def ingest_event(db: Session, log, tenant_id: str = None):
+    """Pipeline de ingestão de um evento: agregados, score, persistência e correlação"""
+    event = to_event(log, tenant_id)
+    score_events([event])
+    if event_coalescer.enabled:
+        # A resposta é a linha em que o evento foi contado (nova ou uma ocorrência anterior)
+        db_log = db.get(AccessLog, persist_events(db, [event])[0])
+    else:
+        db_log = create_access_log(db=db, event=event)
+    correlate_events(db, [event])
+    return db_log
+
+
+def ingest_batch(db: Session, logs, tenant_id: str = None) -> list:
+    """Pipeline de ingestão em lote; retorna os scores na ordem dos eventos"""
+    # Conversão única na entrada: o restante do pipeline só vê Event
+    events = [to_event(log, tenant_id) for log in logs]
+    scores = score_events(events)
+    if event_coalescer.enabled:
+        persist_events(db, events)
+    else:
+        create_access_logs(db, events)
+    correlate_events(db, events)
+    return scores
@@ -1,17 +1,64 @@
 from backend.database import engine, Base
-from backend.models import Asset, AccessLog
+from backend.models import Tenant, Asset, AccessLog, AccessLogHourly, Incident, DESCRIPTION_FTS_INDEX
 import logging
-from sqlalchemy import inspect
+from backend.backfill import backfills_for_columns, run_backfills
+from sqlalchemy import inspect, text
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Índices substituídos por versões com tenant_id
+OBSOLETE_INDEXES = ["ix_access_logs_zone_timestamp", "ix_access_logs_asset_type_timestamp"]
+
+def add_missing_columns() -> list:
+    """Adiciona colunas e índices novos a tabelas já existentes (o projeto não usa migrações)
+
+    Retorna as colunas adicionadas em access_logs (para os preenchimentos das linhas antigas).
+    """
+    added = []
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for name in OBSOLETE_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                logger.info(f"Adicionando coluna {table.name}.{column.name}")
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+                if table.name == AccessLog.__tablename__:
+                    added.append(column.name)
+                if column.default is not None and column.default.is_scalar:
+                    # Linhas existentes recebem o valor padrão da coluna nova
+                    conn.execute(
+                        table.update().where(column.is_(None)).values({column.name: column.default.arg})
+                    )
+            existing_indexes = {index["name"]: index for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                current = existing_indexes.get(index.name)
+                if current is not None and bool(current["unique"]) != bool(index.unique):
+                    # Unicidade mudou (ex.: ip_address de assets passou a ser único por tenant)
+                    conn.execute(text(f"DROP INDEX {index.name}"))
+                index.create(bind=conn, checkfirst=True)
+        DESCRIPTION_FTS_INDEX(AccessLog.__table__, conn)
+    return added
+
 def init_db():
     """Initialize the database by creating all tables."""
     try:
         # Create all tables
         logger.info("Creating database tables...")
         Base.metadata.create_all(bind=engine)
+        added = add_missing_columns()
+        # Colunas derivadas novas: preenche as linhas antigas (python -m backend.backfill refaz)
+        backfills = backfills_for_columns(added)
+        if backfills:
+            run_backfills(backfills)
         
         # Verify tables were created
         inspector = inspect(engine)
@@ -19,7 +66,7 @@ def init_db():
         logger.info(f"Created tables: {', '.join(tables)}")
         
         # Verify specific tables exist
-        required_tables = {'assets', 'access_logs'}
+        required_tables = {'tenants', 'assets', 'access_logs', 'access_log_hourly', 'incidents'}
         missing_tables = required_tables - set(tables)
         if missing_tables:
             raise Exception(f"Failed to create tables: {', '.join(missing_tables)}")
@@ -31,4 +78,4 @@ def init_db():
         raise
 
 if __name__ == "__main__":
-    init_db() 
\ No newline at end of file
+    init_db() 
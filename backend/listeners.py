@@ -0,0 +1,568 @@
+"""Listeners de rede para ingestão direta: syslog (RFC 5424), CEF e JSON por linha (NDJSON)
+
+Uso dedicado (sem a API): python -m backend.listeners
+"""
+import asyncio
+import json
+import logging
+import re
+import socket
+import time
+from datetime import datetime
+from backend.config import LISTENER_CONFIG
+from backend.events import Event, ip_to_int
+from backend.tenants import UnknownTenantError
+
+logger = logging.getLogger(__name__)
+
+# Severidade syslog (0 = emergência ... 7 = debug) -> nível de alerta
+SYSLOG_LEVELS = ("CRÍTICO", "CRÍTICO", "CRÍTICO", "ALTO", "MÉDIO", "BAIXO", "BAIXO", "BAIXO")
+
+# Parâmetros de structured data (qualquer SD-ID) aceitos como campos do evento
+SYSLOG_FIELDS = {
+    "src": "ip_address", "ip": "ip_address", "country": "country", "attempts": "login_attempts",
+    "value": "transaction_value", "zone": "network_zone", "asset": "asset_name",
+    "level": "alert_level", "tenant": "tenant_id"
+}
+
+# Extensões CEF mapeadas para campos do evento (msg é anexada à descrição)
+CEF_FIELDS = {
+    "src": "ip_address", "cnt": "login_attempts", "cfp1": "transaction_value", "cs1": "country",
+    "cs2": "network_zone", "dhost": "asset_name", "cs3": "tenant_id"
+}
+CEF_SEVERITIES = {"low": "BAIXO", "medium": "MÉDIO", "high": "ALTO", "very-high": "CRÍTICO"}
+
+# Campos de AccessLogCreate aceitos no NDJSON
+NDJSON_FIELDS = (
+    "ip_address", "country", "description", "timestamp", "login_attempts", "transaction_value",
+    "is_internal", "asset_name", "network_zone", "is_authorized", "alert_level", "tenant_id"
+)
+
+_CEF_KEY = re.compile(r"(?:^| )(\w+)=")
+_CEF_ESCAPES = re.compile(r"\\([=\\nr|])")
+# Elemento SD: [ID param="valor" ...] com \", \\ e \] escapados nos valores
+_SD_ELEMENT = re.compile(r'\[[^ \]"=]+((?: +[^ \]"=]+="[^"\\]*(?:\\.[^"\\]*)*")*) *\]')
+_SD_PARAM = re.compile(r'([^ \]"=]+)="([^"\\]*(?:\\.[^"\\]*)*)"')
+_SD_ESCAPES = re.compile(r'\\(["\\\]])')
+_CEF_UNESCAPED = {"n": "\n", "r": "\r"}
+
+
+class ParseError(ValueError):
+    """Mensagem fora do formato esperado"""
+
+
+_timestamps = {}
+
+
+def _timestamp(value):
+    """RFC 3339 -> datetime local sem fuso (como o restante do banco); '-' ou vazio -> agora
+
+    Rajadas repetem o mesmo carimbo: o resultado da conversão fica num cache pequeno.
+    """
+    if not value or value == "-":
+        return None
+    timestamp = _timestamps.get(value)
+    if timestamp is None:
+        timestamp = datetime.fromisoformat(value)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone().replace(tzinfo=None)
+        if len(_timestamps) >= 4096:
+            _timestamps.clear()
+        _timestamps[value] = timestamp
+    return timestamp
+
+
+def _numbers(fields: dict) -> dict:
+    if "login_attempts" in fields:
+        fields["login_attempts"] = int(fields["login_attempts"])
+    if "transaction_value" in fields:
+        fields["transaction_value"] = float(fields["transaction_value"])
+    return fields
+
+
+def parse_syslog(text: str, peer: str) -> dict:
+    """<PRI>1 TIMESTAMP HOST APP PROCID MSGID [SD] MSG -> campos do Event"""
+    header = text.split(" ", 6)
+    if len(header) < 6 or header[0][:1] != "<":
+        raise ParseError("cabeçalho syslog incompleto")
+    head, timestamp, hostname, app_name, _, msgid = header[:6]
+    severity = int(head[1:head.index(">")]) & 7
+    rest = header[6] if len(header) == 7 else "-"
+
+    fields = {}
+    if rest[:1] == "[":
+        pos = 0
+        while True:
+            element = _SD_ELEMENT.match(rest, pos)
+            if element is None:
+                raise ParseError("structured data inválido")
+            for name, value in _SD_PARAM.findall(element.group(1)):
+                target = SYSLOG_FIELDS.get(name)
+                if target is not None:
+                    fields[target] = _SD_ESCAPES.sub(r"\1", value) if "\\" in value else value
+            pos = element.end()
+            if rest[pos:pos + 1] != "[":
+                break
+        message = rest[pos + 1:]
+    elif rest[:1] == "-":
+        message = rest[2:]
+    else:
+        raise ParseError("structured data inválido")
+    if message[:1] == "\ufeff":
+        message = message[1:]
+
+    if "ip_address" not in fields:
+        # Hostname só vira origem se for um IP (evita o parse caro de nomes)
+        is_ip = hostname[:1].isdigit() or ":" in hostname
+        fields["ip_address"] = hostname if is_ip and ip_to_int(hostname) is not None else peer
+    fields.setdefault("country", "")
+    fields.setdefault("alert_level", SYSLOG_LEVELS[severity])
+    fields["description"] = message or f"{app_name} {msgid}"
+    fields["timestamp"] = _timestamp(timestamp)
+    return _numbers(fields)
+
+
+def _cef_header(text: str, start: int) -> list:
+    if "\\" not in text:
+        return text[start:].split("|", 7)
+    # Cabeçalho com \| ou \\ escapados: varredura caractere a caractere
+    parts, current, pos, size = [], [], start, len(text)
+    while pos < size and len(parts) < 7:
+        char = text[pos]
+        if char == "\\" and pos + 1 < size:
+            current.append(text[pos + 1])
+            pos += 2
+            continue
+        if char == "|":
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+        pos += 1
+    parts.append(text[pos:])
+    return parts
+
+
+def _cef_unescape(match) -> str:
+    char = match.group(1)
+    return _CEF_UNESCAPED.get(char, char)
+
+
+def parse_cef(text: str, peer: str) -> dict:
+    """CEF:Versão|Fornecedor|Produto|Versão|Assinatura|Nome|Severidade|Extensões (com ou sem cabeçalho syslog)"""
+    start = text.find("CEF:")
+    if start < 0:
+        raise ParseError("mensagem sem CEF:")
+    header = _cef_header(text, start + 4)
+    if len(header) < 8:
+        raise ParseError("cabeçalho CEF incompleto")
+    _, _, _, _, signature, name, severity, extension = header
+
+    # split com grupo: ["", chave1, valor1, chave2, valor2, ...]
+    parts = _CEF_KEY.split(extension)
+    params = {}
+    for index in range(1, len(parts) - 1, 2):
+        value = parts[index + 1].rstrip()
+        if "\\" in value:
+            value = _CEF_ESCAPES.sub(_cef_unescape, value)
+        params[parts[index]] = value
+
+    fields = {CEF_FIELDS[key]: value for key, value in params.items() if key in CEF_FIELDS}
+    fields.setdefault("ip_address", peer)
+    fields.setdefault("country", "")
+    severity = severity.strip()
+    if severity.isdigit():
+        level = int(severity)
+        fields["alert_level"] = "CRÍTICO" if level >= 9 else "ALTO" if level >= 7 else "MÉDIO" if level >= 4 else "BAIXO"
+    else:
+        fields["alert_level"] = CEF_SEVERITIES.get(severity.lower())
+    description = f"{name} | {signature}"
+    if "msg" in params:
+        description = f"{description} | {params['msg']}"
+    fields["description"] = description
+    if "rt" in params:
+        rt = params["rt"]
+        fields["timestamp"] = datetime.fromtimestamp(int(rt) / 1000) if rt.isdigit() else _timestamp(rt)
+    return _numbers(fields)
+
+
+def parse_ndjson(text: str, peer: str) -> dict:
+    """Uma linha JSON com os campos de AccessLogCreate"""
+    data = json.loads(text)
+    if type(data) is not dict:
+        raise ParseError("linha JSON não é um objeto")
+    fields = {name: data[name] for name in NDJSON_FIELDS if name in data}
+    if type(fields.get("ip_address")) is not str or type(fields.get("description")) is not str:
+        raise ParseError("ip_address e description são obrigatórios")
+    fields.setdefault("country", "")
+    if "timestamp" in fields:
+        fields["timestamp"] = _timestamp(fields["timestamp"])
+    return _numbers(fields)
+
+
+PARSERS = {"syslog": parse_syslog, "cef": parse_cef, "ndjson": parse_ndjson}
+
+
+def udp_socket_drops(port: int):
+    """Datagramas descartados pelo kernel (buffer do socket cheio) na porta; None fora do Linux"""
+    drops = None
+    for path in ("/proc/net/udp", "/proc/net/udp6"):
+        try:
+            with open(path) as table:
+                next(table)
+                for line in table:
+                    columns = line.split()
+                    if int(columns[1].rsplit(":", 1)[1], 16) == port:
+                        drops = (drops or 0) + int(columns[-1])
+        except (OSError, ValueError, IndexError, StopIteration):
+            continue
+    return drops
+
+
+class Listener:
+    """Um socket de entrada: parse no loop de eventos e contadores próprios"""
+
+    def __init__(self, service, config: dict):
+        self.service = service
+        self.name = config["name"]
+        self.protocol = config["protocol"]
+        self.transport = config["transport"]
+        self.port = config["port"]
+        self.tenant_id = config.get("tenant_id")
+        self.parse = PARSERS[self.protocol]
+        self.server = None
+        self.pending = []
+        self.counters = {
+            "received": 0, "parsed": 0, "parse_errors": 0, "dropped": 0, "rejected": 0,
+            "ingested": 0, "ingest_errors": 0, "bytes": 0, "connections": 0
+        }
+
+    def feed(self, frames, peer: str):
+        """Parse de um lote de quadros já decodificados
+
+        Com a fila da ingestão cheia, UDP descarta; TCP nunca descarta o que o kernel já
+        confirmou ao cliente: a conexão para de ser lida (IntakeService.throttle).
+        """
+        counters = self.counters
+        counters["received"] += len(frames)
+        if self.transport == "udp" and self.service.backlog >= self.service.config["max_pending"]:
+            counters["dropped"] += len(frames)
+            return
+        parse, pending, tenant_id = self.parse, self.pending, self.tenant_id
+        errors = 0
+        for text in frames:
+            try:
+                fields = parse(text, peer)
+            except (ValueError, IndexError, TypeError):
+                errors += 1
+                continue
+            if tenant_id and "tenant_id" not in fields:
+                fields["tenant_id"] = tenant_id
+            pending.append(fields)
+        counters["parse_errors"] += errors
+        parsed = len(frames) - errors
+        counters["parsed"] += parsed
+        self.service.added(parsed)
+
+    def take(self) -> list:
+        batch, self.pending = self.pending, []
+        return batch
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name, "protocol": self.protocol, "transport": self.transport,
+            "port": self.port, "listening": self.server is not None,
+            "pending": len(self.pending), **self.counters,
+            # UDP: perdas antes do listener, quando o buffer do socket enche
+            "socket_drops": udp_socket_drops(self.port) if self.transport == "udp" and self.server else None
+        }
+
+
+class StreamFraming(asyncio.BufferedProtocol):
+    """Conexão TCP: o kernel escreve direto num buffer fixo e os quadros são decodificados dele
+
+    Sem concatenação de pedaços recebidos: cada mensagem é lida uma única vez (na decodificação
+    UTF-8 a partir de um memoryview do buffer). Suporta quadros por \\n e, no syslog, o
+    octet-counting do RFC 6587 ("TAMANHO MENSAGEM").
+    """
+
+    def __init__(self, listener: Listener, buffer_size: int, max_frame: int):
+        self.listener = listener
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.max_frame = max_frame
+        self.octet_counting = listener.protocol == "syslog"
+        self.start = 0
+        self.end = 0
+        self.skipping = False
+        self.peer = ""
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        peer = transport.get_extra_info("peername")
+        self.peer = peer[0] if peer else ""
+        self.listener.counters["connections"] += 1
+
+    def get_buffer(self, sizehint):
+        if self.end == len(self.buffer):
+            if self.start == 0:
+                # Quadro maior que o buffer: descarta até o próximo separador
+                self.listener.counters["parse_errors"] += 1
+                self.skipping = True
+                self.end = 0
+            else:
+                size = self.end - self.start
+                self.buffer[:size] = self.view[self.start:self.end]
+                self.start, self.end = 0, size
+        return self.view[self.end:]
+
+    def buffer_updated(self, nbytes):
+        self.listener.counters["bytes"] += nbytes
+        self.end += nbytes
+        buffer, view, end = self.buffer, self.view, self.end
+        pos = self.start
+        if self.skipping:
+            newline = buffer.find(b"\n", pos, end)
+            if newline < 0:
+                self.start = self.end = 0
+                return
+            pos = newline + 1
+            self.skipping = False
+        frames = []
+        octet_counting = self.octet_counting
+        while pos < end:
+            if octet_counting and 48 <= buffer[pos] <= 57:
+                space = buffer.find(b" ", pos, min(end, pos + 10))
+                if space < 0:
+                    if end - pos >= 10:
+                        # Prefixo numérico sem espaço: não é octet-counting válido
+                        self.listener.counters["parse_errors"] += 1
+                        self.skipping = True
+                        pos = end
+                    break
+                size = int(view[pos:space])
+                if size > self.max_frame:
+                    self.listener.counters["parse_errors"] += 1
+                    self.skipping = True
+                    pos = space + 1
+                    break
+                if space + 1 + size > end:
+                    break
+                frames.append(str(view[space + 1:space + 1 + size], "utf-8", "replace").rstrip("\r\n"))
+                pos = space + 1 + size
+                continue
+            newline = buffer.find(b"\n", pos, end)
+            if newline < 0:
+                break
+            if newline > pos:
+                frames.append(str(view[pos:newline], "utf-8", "replace").rstrip("\r"))
+            pos = newline + 1
+        if pos == end:
+            pos = self.end = 0
+        self.start = pos
+        if frames:
+            self.listener.feed(frames, self.peer)
+            self.listener.service.throttle(self)
+
+    def eof_received(self):
+        # Última linha sem \n ainda é uma mensagem
+        if self.end > self.start and not self.skipping:
+            self.listener.feed([str(self.view[self.start:self.end], "utf-8", "replace").rstrip("\r")], self.peer)
+        self.start = self.end = 0
+        return False
+
+    def connection_lost(self, exc):
+        self.listener.counters["connections"] -= 1
+        self.listener.service.paused.discard(self)
+
+
+class DatagramFraming(asyncio.DatagramProtocol):
+    """Syslog/CEF via UDP: um datagrama por mensagem"""
+
+    def __init__(self, listener: Listener):
+        self.listener = listener
+
+    def datagram_received(self, data, addr):
+        self.listener.counters["bytes"] += len(data)
+        self.listener.feed([data.decode("utf-8", "replace").rstrip("\r\n")], addr[0])
+
+
+def _ingest_events(events: list):
+    from backend.database import SessionLocal
+    from backend.ingest import ingest_batch
+    db = SessionLocal()
+    try:
+        ingest_batch(db, events)
+    finally:
+        db.close()
+
+
+class IntakeService:
+    """Listeners + lotes para o mesmo pipeline de ingestão da API (ingest_batch)
+
+    O loop de eventos só recebe e faz o parse; a criação dos Event, o score e a gravação
+    rodam numa thread, um lote por vez (por tamanho ou intervalo). Se a ingestão não
+    acompanhar e a fila passar de max_pending, as conexões TCP deixam de ser lidas até o
+    lote seguinte ser gravado (o TCP do cliente segura o envio); no UDP as mensagens são
+    descartadas e contadas como dropped.
+    """
+
+    def __init__(self, config: dict = LISTENER_CONFIG, ingest=None):
+        self.config = config
+        self.ingest = ingest or _ingest_events
+        self.listeners = [Listener(self, listener) for listener in config["listeners"]]
+        self.backlog = 0  # Mensagens aguardando ou dentro do lote em gravação
+        self.paused = set()  # Conexões TCP com a leitura suspensa pela fila cheia
+        self.pauses = 0
+        self._wakeup = None
+        self._stopping = False
+        self._task = None
+        self.batches = 0
+        self.last_batch_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def added(self, count: int):
+        self.backlog += count
+        if self.backlog >= self.config["batch_size"] and self._wakeup is not None:
+            self._wakeup.set()
+
+    def throttle(self, connection: StreamFraming):
+        """Suspende a leitura da conexão TCP enquanto a fila estiver cheia"""
+        if self.backlog >= self.config["max_pending"] and connection not in self.paused:
+            connection.transport.pause_reading()
+            self.paused.add(connection)
+            self.pauses += 1
+
+    def _resume(self):
+        if not self.paused or self.backlog >= self.config["max_pending"]:
+            return
+        for connection in self.paused:
+            if not connection.transport.is_closing():
+                connection.transport.resume_reading()
+        self.paused.clear()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        host = self.config["host"]
+        for listener in self.listeners:
+            try:
+                if listener.transport == "udp":
+                    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.config["udp_receive_buffer_bytes"])
+                    sock.bind((host, listener.port))
+                    listener.server, _ = await loop.create_datagram_endpoint(
+                        lambda listener=listener: DatagramFraming(listener), sock=sock
+                    )
+                    listener.port = sock.getsockname()[1]
+                else:
+                    listener.server = await loop.create_server(
+                        lambda listener=listener: StreamFraming(
+                            listener, self.config["receive_buffer_bytes"], self.config["max_frame_bytes"]
+                        ),
+                        host, listener.port, reuse_address=True
+                    )
+                    listener.port = listener.server.sockets[0].getsockname()[1]
+                logger.info(f"Listener {listener.name} ({listener.protocol}/{listener.transport}) na porta {listener.port}")
+            except OSError as e:
+                # Porta ocupada não derruba os demais listeners nem a API
+                logger.warning(f"Falha ao abrir listener {listener.name}: {e}")
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        for listener in self.listeners:
+            if listener.server is not None:
+                listener.server.close()
+                listener.server = None
+        # Espera o lote em gravação (cancelar deixaria a thread gravando em paralelo ao último lote)
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        # O que já foi recebido ainda é gravado
+        await self._flush()
+
+    async def _flush_loop(self):
+        interval = self.config["flush_interval_seconds"]
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._flush()
+
+    async def _flush(self):
+        batch = [(listener, listener.take()) for listener in self.listeners if listener.pending]
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar lote dos listeners: {e}")
+        finally:
+            self.backlog -= sum(len(items) for _, items in batch)
+            self._resume()
+            self.batches += 1
+            self.last_batch_ms = (time.perf_counter() - started) * 1000
+
+    def _write(self, batch):
+        events, built = [], []
+        for listener, items in batch:
+            before = len(events)
+            for fields in items:
+                try:
+                    events.append(Event(**fields))
+                except (UnknownTenantError, ValueError, TypeError):
+                    listener.counters["rejected"] += 1
+            built.append((listener, len(events) - before))
+        try:
+            self.ingest(events)
+        except Exception:
+            for listener, count in built:
+                listener.counters["ingest_errors"] += count
+            raise
+        for listener, count in built:
+            listener.counters["ingested"] += count
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "backlog": self.backlog,
+            "max_pending": self.config["max_pending"],
+            "paused_connections": len(self.paused),
+            "pauses": self.pauses,
+            "batches": self.batches,
+            "last_batch_ms": round(self.last_batch_ms, 1),
+            "listeners": [listener.stats() for listener in self.listeners]
+        }
+
+
+# Instância compartilhada pela API
+intake_service = IntakeService()
+
+
+async def _serve():
+    await intake_service.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await intake_service.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
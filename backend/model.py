@@ -1,20 +1,37 @@
+from backend.config import SECURITY_CONFIG
+from backend.anomaly import anomaly_detector
+from backend.business_hours import off_hours_critical
+from backend.feature_store import country_code
+
 # Versão simplificada sem scikit-learn por enquanto
-def predict_threat(log_data):
+def predict_threat(log_data, config: dict = SECURITY_CONFIG, detector=anomaly_detector):
     """
     Versão simplificada do detector de ameaças
+
+    config e detector permitem reavaliar eventos com outra configuração; sem detector
+    (replay determinístico) o valor da transação usa sempre o limite fixo.
     """
     threat_score = 0.0
     
     # Regras básicas
-    if log_data.login_attempts > 3:
+    if log_data.login_attempts > config["threat_login_attempts"]:
         threat_score += 0.4
         
-    if log_data.transaction_value and log_data.transaction_value > 10000:
+    # Valor da transação: desvio da linha de base do ativo/zona quando já existe,
+    # senão o limite fixo da configuração
+    value_deviation = detector.deviation(log_data, "transaction_value") if detector is not None else None
+    if value_deviation is not None:
+        if value_deviation >= 0.5:
+            threat_score += 0.3
+    elif log_data.transaction_value and log_data.transaction_value > config["suspicious_transaction_threshold"]:
         threat_score += 0.3
         
-    # Lista de países de alto risco (exemplo)
-    high_risk_countries = ['XX', 'YY', 'ZZ']  # Substitua pelos países reais
-    if log_data.country in high_risk_countries:
+    # Acesso a ativo crítico fora do expediente (contexto vem das tabelas do calendário)
+    if off_hours_critical(log_data.time_context, log_data.asset_criticality, config["business_hours"]):
+        threat_score += config["business_hours"]["off_hours_score"]
+
+    # Países que somam ao score (lista de exemplo na configuração)
+    if country_code(log_data.country) in config["threat_score_countries"]:
         threat_score += 0.3
         
-    return min(threat_score, 1.0) 
\ No newline at end of file
+    return min(threat_score, 1.0) 
@@ -1,25 +1,44 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Index, DDL, JSON, event
 from sqlalchemy.orm import relationship
 from backend.database import Base
+from backend.config import TENANT_CONFIG
 from datetime import datetime
 
+class Tenant(Base):
+    """Unidade de negócio com configuração de rede própria"""
+    __tablename__ = "tenants"
+
+    id = Column(String, primary_key=True)  # Ex.: default, varejo, financeiro
+    name = Column(String)
+    # internal_networks e authorized_external_ips no mesmo formato de COMPANY_NETWORK
+    network = Column(JSON)
+    version = Column(Integer, default=1)  # Incrementada a cada alteração
+    updated_at = Column(DateTime, default=datetime.now)
+
 class Asset(Base):
     __tablename__ = "assets"
 
     id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(String, default=TENANT_CONFIG["default_tenant"])
     name = Column(String, index=True)
+    ip_address = Column(String, index=True)  # Chave de COMPANY_NETWORK["critical_assets"] (única por tenant)
     type = Column(String)  # database, web, email, storage, payment, api
     criticality = Column(String)  # BAIXA, MÉDIA, ALTA, CRÍTICA
     logs = relationship("AccessLog", back_populates="asset")
 
+    __table_args__ = (
+        Index("ux_assets_tenant_ip", "tenant_id", "ip_address", unique=True),
+    )
+
 class AccessLog(Base):
     """Modelo para logs de acesso"""
     __tablename__ = "access_logs"
 
     id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(String, default=TENANT_CONFIG["default_tenant"])
     ip_address = Column(String, index=True)
     country = Column(String)
-    timestamp = Column(DateTime, default=datetime.now)
+    timestamp = Column(DateTime, default=datetime.now, index=True)
     login_attempts = Column(Integer, default=0)
     transaction_value = Column(Float, default=0.0)
     description = Column(String)
@@ -32,6 +51,72 @@ class AccessLog(Base):
     network_zone = Column(String)  # Zona da rede (local, vpn, dmz)
     is_authorized = Column(Boolean, default=True)  # Se é um IP autorizado
     alert_level = Column(String)   # BAIXO, MÉDIO, ALTO, CRÍTICO 
+
+    # Extraídos da descrição na ingestão para busca indexada
+    cve = Column(String, index=True)        # Ex.: CVE-2023-5678
+    technique = Column(String, index=True)  # Técnica MITRE, ex.: T1486
+
+    # Eventos idênticos (IP, descrição, nível) dentro da janela de coalescência viram uma linha
+    occurrence_count = Column(Integer, default=1)
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+    # Somas das ocorrências da linha: login_attempts guarda o maior valor e transaction_value o da
+    # primeira; is_threat indica se alguma foi ameaça e threat_count quantas foram
+    threat_count = Column(Integer)
+    login_attempts_total = Column(Integer)
+    transaction_value_total = Column(Float)
     
     asset_id = Column(Integer, ForeignKey("assets.id"))
-    asset = relationship("Asset", back_populates="logs")
\ No newline at end of file
+    asset_type = Column(String)  # Denormalizado de Asset.type para filtrar sem join
+    asset = relationship("Asset", back_populates="logs")
+
+    # Consultas da API são sempre de um tenant: tenant_id lidera os índices compostos
+    __table_args__ = (
+        Index("ix_access_logs_tenant_timestamp", "tenant_id", "timestamp"),
+        Index("ix_access_logs_tenant_zone_timestamp", "tenant_id", "network_zone", "timestamp"),
+        Index("ix_access_logs_tenant_asset_type_timestamp", "tenant_id", "asset_type", "timestamp"),
+    )
+
+class AccessLogHourly(Base):
+    """Agregados por hora dos logs removidos de access_logs pela política de retenção"""
+    __tablename__ = "access_log_hourly"
+
+    id = Column(Integer, primary_key=True)
+    tenant_id = Column(String, nullable=False)
+    hour = Column(DateTime, nullable=False)  # Início da hora
+    # Dimensões vazias gravadas como "" (NULL não conflita na chave única)
+    country = Column(String, nullable=False, default="")
+    network_zone = Column(String, nullable=False, default="")
+    asset_type = Column(String, nullable=False, default="")
+    alert_level = Column(String, nullable=False, default="")
+    events = Column(Integer, default=0)
+    threats = Column(Integer, default=0)
+    login_attempts = Column(Integer, default=0)
+    transaction_value = Column(Float, default=0.0)
+    max_threat_score = Column(Float, default=0.0)
+
+    __table_args__ = (
+        Index("ux_access_log_hourly_key", "tenant_id", "hour", "country", "network_zone", "asset_type",
+              "alert_level", unique=True),
+    )
+
+# Índice GIN de texto completo na descrição (somente PostgreSQL)
+DESCRIPTION_FTS_INDEX = DDL(
+    "CREATE INDEX IF NOT EXISTS ix_access_logs_description_fts ON access_logs "
+    "USING gin (to_tsvector('simple', coalesce(description, '')))"
+).execute_if(dialect="postgresql")
+event.listen(AccessLog.__table__, "after_create", DESCRIPTION_FTS_INDEX)
+
+class Incident(Base):
+    """Incidentes gerados pela correlação de eventos"""
+    __tablename__ = "incidents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    rule_name = Column(String)
+    entity_type = Column(String)   # ip_address ou asset_name
+    entity_key = Column(String, index=True)
+    techniques = Column(String)    # Sequência casada, ex.: T1110 → T1133 → T1048
+    severity = Column(String)      # BAIXO, MÉDIO, ALTO, CRÍTICO
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.now, index=True)
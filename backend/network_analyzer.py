@@ -1,20 +1,13 @@
 import ipaddress
-from config import COMPANY_NETWORK, SECURITY_CONFIG
+from config import COMPANY_NETWORK, NETWORK_ZONES, SECURITY_CONFIG
 
 def analyze_ip(ip_address: str) -> dict:
     """Analisa um IP para determinar se é interno, crítico ou autorizado"""
     ip_obj = ipaddress.ip_address(ip_address)
     
-    # Define network zones
-    networks = {
-        'local': '192.168.1.0/24',
-        'vpn': '10.0.0.0/16',
-        'dmz': '172.16.0.0/24'
-    }
-    
     # Find which network zone the IP belongs to
     network_zone = 'external'  # Default to external
-    for zone, network in networks.items():
+    for zone, network in NETWORK_ZONES.items():
         try:
             if ip_obj in ipaddress.ip_network(network):
                 network_zone = zone
@@ -37,7 +30,18 @@ def analyze_ip(ip_address: str) -> dict:
         'asset_name': f"Host da Rede {network_zone.upper()}" if network_zone != 'external' else None
     }
 
-def calculate_alert_level(ip_info: dict, login_attempts: int, country: str) -> str:
+def classified_ip_info(network_zone: str, is_authorized: bool) -> dict:
+    """ip_info de calculate_alert_level a partir da classificação do tenant (zona e autorização)"""
+    is_internal = network_zone != 'external'
+    return {
+        'network_zone': network_zone,
+        'is_internal': is_internal,
+        'is_authorized': bool(is_authorized),
+        'alert_level': "BAIXO" if is_internal else "MÉDIO"
+    }
+
+def calculate_alert_level(ip_info: dict, login_attempts: int, country: str, off_hours_critical: bool = False,
+                          config: dict = SECURITY_CONFIG) -> str:
     """Calcula o nível de alerta baseado nas informações do IP e comportamento"""
     
     # Se já é crítico, mantém
@@ -45,11 +49,15 @@ def calculate_alert_level(ip_info: dict, login_attempts: int, country: str) -> s
         return "CRÍTICO"
     
     # Muitas tentativas de login
-    if login_attempts > SECURITY_CONFIG["max_login_attempts"]:
+    if login_attempts > config["max_login_attempts"]:
         return "ALTO"
     
     # País de alto risco
-    if country in SECURITY_CONFIG["high_risk_countries"]:
+    if country in config["high_risk_countries"]:
+        return "ALTO"
+    
+    # Ativo crítico acessado fora do expediente (fim de semana, feriado ou fora do horário)
+    if off_hours_critical:
         return "ALTO"
     
     # IP não autorizado
@@ -0,0 +1,189 @@
+import itertools
+import logging
+import threading
+import time
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from backend.config import READ_ROUTING_CONFIG
+from backend.database import primary_read_engine, replica_engines
+
+logger = logging.getLogger(__name__)
+
+# Posição do WAL reproduzida e tempo desde a última transação reproduzida na réplica
+REPLICA_STATUS_SQL = text("""
+    SELECT
+        CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn() ELSE pg_current_wal_lsn() END::text,
+        CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END
+""")
+
+# Posição atual do WAL no primário: a referência do atraso das réplicas
+PRIMARY_LSN_SQL = text("SELECT pg_current_wal_lsn()::text")
+
+
+def parse_lsn(value: str):
+    """'16/B374D848' -> inteiro comparável (None se ausente)"""
+    if not value:
+        return None
+    high, _, low = value.partition("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+class Replica:
+    """Engine de uma réplica com o último lag/LSN medido"""
+
+    def __init__(self, engine, name: str):
+        self.engine = engine
+        self.name = name
+        self.lag = None
+        self.lsn = None
+        self.healthy = True
+        self.error = None
+        self.checked_at = 0.0
+        self.reads = 0
+        self._lock = threading.Lock()
+
+    def refresh(self, config: dict, primary_lsn=None):
+        """Mede lag e LSN se a medida em cache venceu (uma thread por vez; as outras usam o cache)
+
+        primary_lsn() é lido antes da réplica. Réplica que já reproduziu esse LSN está em dia
+        (lag 0, mesmo com o primário ocioso); atrás dele, o lag é o tempo desde a última
+        transação reproduzida, que cresce enquanto o receptor de WAL estiver desconectado.
+        Sem o LSN do primário, vale só esse tempo.
+        """
+        interval = config["lag_check_interval_seconds"] if self.healthy else config["retry_unhealthy_seconds"]
+        if time.monotonic() - self.checked_at < interval or not self._lock.acquire(blocking=False):
+            return
+        try:
+            with self.engine.connect() as connection:
+                if self.engine.dialect.name == "postgresql":
+                    target = primary_lsn() if primary_lsn else None
+                    lsn, lag = connection.execute(REPLICA_STATUS_SQL).one()
+                    self.lsn = parse_lsn(lsn)
+                    caught_up = target is not None and self.lsn is not None and self.lsn >= target
+                    self.lag = 0.0 if caught_up else float(lag)
+                else:
+                    # Sem replicação mensurável (ex.: testes locais): só verifica a conexão
+                    connection.execute(text("SELECT 1"))
+                    self.lag, self.lsn = 0.0, None
+            self.healthy, self.error = True, None
+        except Exception as e:
+            if self.healthy:
+                logger.warning(f"Réplica {self.name} indisponível: {e}")
+            self.healthy, self.error = False, str(e)
+        finally:
+            self.checked_at = time.monotonic()
+            self._lock.release()
+
+
+class ReadRouter:
+    """Escolhe o engine de cada leitura: réplica saudável e em dia, senão o pool de leitura do primário
+
+    Read-your-writes: a ingestão devolve um marcador (instante + LSN do primário após o commit)
+    que o cliente reenvia em cookie ou cabeçalho; enquanto ele for recente, só serve a leitura
+    uma réplica que já reproduziu aquele LSN (sem LSN, fora do PostgreSQL, vai ao primário).
+    """
+
+    def __init__(self, primary_engine, replica_engines: list, config: dict = READ_ROUTING_CONFIG):
+        self.config = config
+        self.primary = primary_engine
+        self.replicas = [
+            Replica(replica, replica.url.render_as_string(hide_password=True)) for replica in replica_engines
+        ]
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self.counters = {"replica": 0, "primary": 0, "no_replicas": 0, "lag": 0, "unhealthy": 0, "read_your_writes": 0}
+
+    def primary_lsn(self):
+        """LSN atual do primário (None fora do PostgreSQL ou se o primário não responder)"""
+        if self.primary.dialect.name != "postgresql":
+            return None
+        try:
+            with self.primary.connect() as connection:
+                return parse_lsn(connection.execute(PRIMARY_LSN_SQL).scalar())
+        except Exception as e:
+            logger.warning(f"LSN do primário indisponível: {e}")
+            return None
+
+    # Marcador de escrita
+
+    def write_marker(self, db: Session) -> str:
+        """Marcador da última escrita da sessão (chamado após o commit da ingestão)"""
+        now_ms = int(time.time() * 1000)
+        if db.get_bind().dialect.name != "postgresql":
+            return str(now_ms)
+        lsn = db.execute(text("SELECT pg_current_wal_lsn()::text")).scalar()
+        return f"{now_ms}-{lsn}"
+
+    def _pending_write(self, marker: str):
+        """LSN que a réplica precisa ter reproduzido: None sem escrita recente, infinito se sem LSN"""
+        if not marker:
+            return None
+        written, _, lsn = marker.partition("-")
+        try:
+            if time.time() * 1000 - int(written) > self.config["sticky_seconds"] * 1000:
+                return None
+            return parse_lsn(lsn) if lsn else float("inf")
+        except ValueError:
+            return None
+
+    # Roteamento
+
+    def choose(self, marker: str = None):
+        """Retorna (engine, motivo)"""
+        if not self.replicas:
+            return self.primary, self._count("no_replicas")
+        pending = self._pending_write(marker)
+        start = next(self._next)
+        reason = "lag"
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            replica.refresh(self.config, self.primary_lsn)
+            if not replica.healthy:
+                reason = "unhealthy"
+                continue
+            if replica.lag is None or replica.lag > self.config["max_lag_seconds"]:
+                continue
+            if pending is not None and (replica.lsn is None or replica.lsn < pending):
+                reason = "read_your_writes"
+                continue
+            replica.reads += 1
+            return replica.engine, self._count("replica")
+        return self.primary, self._count(reason)
+
+    def _count(self, reason: str) -> str:
+        with self._lock:
+            self.counters[reason] += 1
+            if reason != "replica":
+                self.counters["primary"] += 1
+        return reason
+
+    def dispose(self):
+        for replica in self.replicas:
+            replica.engine.dispose()
+        self.primary.dispose()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            **counters,
+            "max_lag_seconds": self.config["max_lag_seconds"],
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "lag_seconds": replica.lag,
+                    "replay_lsn": replica.lsn,
+                    "reads": replica.reads,
+                    "error": replica.error
+                }
+                for replica in self.replicas
+            ]
+        }
+
+
+# Instância compartilhada pela API
+read_router = ReadRouter(primary_read_engine, replica_engines)
@@ -0,0 +1,660 @@
+"""Replay determinístico de eventos históricos com um SECURITY_CONFIG candidato
+
+Lê access_logs (faixas de id) ou arquivos exportados (Parquet do espelho colunar, NDJSON/NDJSON.gz
+dos arquivos da retenção), reavalia cada evento com analyze_ip, calculate_alert_level e
+predict_threat sob a configuração atual e a candidata e devolve só o resumo das diferenças:
+nada é gravado. As partições (faixas de id, row groups ou arquivos) são avaliadas em paralelo
+num pool de processos. O resultado depende só dos eventos e das duas configurações: sem linhas
+de base de streaming (vale sempre o limite fixo de transação) e com os ativos fotografados no início.
+
+Linhas coalescidas (occurrence_count > 1) guardam o maior login_attempts e as somas por
+ocorrência: se as somas mostram ocorrências iguais, a linha vale occurrence_count eventos
+idênticos; senão vira a ocorrência de maior tentativa mais as demais com a média do restante,
+e esses eventos aparecem em approximate_events no resumo.
+
+    python -m backend.replay --days 30 --set max_login_attempts=3 --set high_risk_countries=RU,CN,IR
+    python -m backend.replay --set threat_login_attempts=2 --set threat_score_countries=RU,KP
+    python -m backend.replay --source analytics/access_logs --config candidato.json --workers 8
+    python -m backend.replay --source archive/access_logs --baseline stored
+"""
+import argparse
+import copy
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from backend.config import REPLAY_CONFIG, SECURITY_CONFIG, THREAT_SCORE_THRESHOLD
+from backend.database import SessionLocal, engine
+from backend.models import AccessLog
+
+logger = logging.getLogger(__name__)
+
+# Colunas lidas por evento; occurrence_count ausente (arquivos antigos) vale 1 e as somas por
+# ocorrência ausentes ficam None
+REPLAY_COLUMNS = (
+    "ip_address", "country", "timestamp", "login_attempts", "transaction_value",
+    "alert_level", "threat_score", "occurrence_count", "threat_count", "login_attempts_total",
+    "transaction_value_total"
+)
+OCCURRENCE_COLUMNS = ("threat_count", "login_attempts_total", "transaction_value_total")
+FILE_SUFFIXES = (".parquet", ".ndjson", ".ndjson.gz", ".jsonl", ".jsonl.gz")
+HISTOGRAM_BUCKETS = 10
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+# Um replay por processo: cada um já ocupa um pool de `workers` processos
+_run_lock = threading.Lock()
+
+
+# Configuração candidata
+
+def _coerce(key: str, current, value):
+    """Converte valores vindos da linha de comando (texto) e rejeita tipos incompatíveis"""
+    if isinstance(value, str) and not isinstance(current, str):
+        if isinstance(current, list):
+            return [item.strip() for item in value.split(",") if item.strip()]
+        if isinstance(current, bool):
+            return value.lower() in ("1", "true", "sim", "yes")
+        if isinstance(current, (int, float)):
+            try:
+                return type(current)(value)
+            except ValueError:
+                raise ValueError(f"Valor inválido para {key}: {value}")
+        return json.loads(value)
+    if isinstance(current, list) != isinstance(value, list) or (
+        isinstance(current, (int, float)) and not isinstance(value, (int, float))
+    ):
+        raise ValueError(f"Valor inválido para {key}: {value!r}")
+    return value
+
+
+def candidate_config(overrides: dict, base: dict = SECURITY_CONFIG) -> dict:
+    """Cópia de SECURITY_CONFIG com as chaves alteradas ('business_hours.start' altera uma subchave)"""
+    config = copy.deepcopy(base)
+    for key, value in overrides.items():
+        section, _, field = key.partition(".")
+        if section not in config:
+            raise ValueError(f"Chave desconhecida em SECURITY_CONFIG: {section}")
+        if field:
+            if not isinstance(config[section], dict) or field not in config[section]:
+                raise ValueError(f"Chave desconhecida em SECURITY_CONFIG: {key}")
+            config[section][field] = _coerce(key, config[section][field], value)
+        elif isinstance(config[section], dict) and isinstance(value, dict):
+            unknown = set(value) - set(config[section])
+            if unknown:
+                raise ValueError(f"Chave desconhecida em SECURITY_CONFIG: {section}.{sorted(unknown)[0]}")
+            for field, field_value in value.items():
+                config[section][field] = _coerce(f"{section}.{field}", config[section][field], field_value)
+        else:
+            config[section] = _coerce(key, config[section], value)
+    return config
+
+
+def config_changes(current: dict, candidate: dict) -> dict:
+    """Chaves que diferem entre as duas configurações: {chave: [atual, candidata]}"""
+    changes = {}
+    for key, value in candidate.items():
+        if isinstance(value, dict):
+            for field, field_value in value.items():
+                if current[key].get(field) != field_value:
+                    changes[f"{key}.{field}"] = [current[key].get(field), field_value]
+        elif current.get(key) != value:
+            changes[key] = [current.get(key), value]
+    return changes
+
+
+# Leitura das partições (listas por coluna, com o epoch já calculado em "ts")
+
+def _epoch_seconds(naive_us) -> list:
+    """Epoch de timestamps sem fuso (array numpy em µs) interpretados no fuso local, como
+    datetime.timestamp() na ingestão
+
+    O deslocamento do fuso é calculado uma vez por hora distinta do lote, não por evento.
+    """
+    # Import tardio: a API importa este módulo no startup e o numpy só é usado no replay
+    import numpy as np
+
+    hours = naive_us // 3_600_000_000
+    unique, inverse = np.unique(hours, return_inverse=True)
+    offsets = np.array([
+        (_NAIVE_EPOCH + timedelta(hours=int(hour))).timestamp() - int(hour) * 3600 for hour in unique
+    ])
+    return (naive_us / 1e6 + offsets[inverse]).tolist()
+
+
+def _columns_from_rows(rows: list) -> dict:
+    import numpy as np
+
+    if not rows:
+        return None
+    columns = dict(zip(REPLAY_COLUMNS, (list(values) for values in zip(*rows))))
+    timestamps = np.array([t or _NAIVE_EPOCH for t in columns["timestamp"]], dtype="datetime64[us]")
+    columns["ts"] = _epoch_seconds(timestamps.astype(np.int64))
+    return columns
+
+
+def _columns_from_arrow(table, since: datetime = None, until: datetime = None) -> dict:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if since is not None:
+        table = table.filter(pc.greater_equal(table["timestamp"], pa.scalar(since, pa.timestamp("us"))))
+    if until is not None:
+        table = table.filter(pc.less(table["timestamp"], pa.scalar(until, pa.timestamp("us"))))
+    if table.num_rows == 0:
+        return None
+    columns = {}
+    for name in REPLAY_COLUMNS:
+        if name == "timestamp":
+            continue  # Só o epoch ("ts") é usado: evita criar um datetime por evento
+        if name not in table.column_names:
+            columns[name] = [1 if name == "occurrence_count" else None] * table.num_rows
+        elif name in OCCURRENCE_COLUMNS:
+            columns[name] = table[name].to_pylist()
+        elif pa.types.is_string(table[name].type) or pa.types.is_large_string(table[name].type):
+            # Poucos valores distintos (IPs, países, níveis): converte o dicionário e indexa
+            encoded = pc.dictionary_encode(table[name].combine_chunks())
+            values = encoded.dictionary.to_pylist() + [None]
+            columns[name] = [values[i] for i in encoded.indices.fill_null(len(values) - 1).to_numpy().tolist()]
+        else:
+            default = 1 if name == "occurrence_count" else 0
+            columns[name] = pc.fill_null(table[name], default).to_numpy().tolist()
+    timestamps = pc.fill_null(table["timestamp"].cast(pa.timestamp("us")), 0).cast(pa.int64())
+    columns["ts"] = _epoch_seconds(timestamps.to_numpy())
+    return columns
+
+
+def _ndjson_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("ip_address", pa.string()),
+        ("country", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("login_attempts", pa.int64()),
+        ("transaction_value", pa.float64()),
+        ("alert_level", pa.string()),
+        ("threat_score", pa.float64()),
+        ("occurrence_count", pa.int64()),
+        ("threat_count", pa.int64()),
+        ("login_attempts_total", pa.int64()),
+        ("transaction_value_total", pa.float64()),
+    ])
+
+
+def read_partition(partition: tuple, batch_size: int, since: datetime = None, until: datetime = None):
+    """Lotes de uma partição: ("database", id_inicial, id_final), ("parquet", caminho, row group) ou
+    ("ndjson", caminho)"""
+    kind = partition[0]
+    if kind == "database":
+        _, low, high = partition
+        table = AccessLog.__table__
+        query = select(*[table.c[name] for name in REPLAY_COLUMNS]).where(table.c.id > low, table.c.id <= high)
+        if since is not None:
+            query = query.where(table.c.timestamp >= since)
+        if until is not None:
+            query = query.where(table.c.timestamp < until)
+        with engine.connect() as connection:
+            result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+            for rows in result.partitions(batch_size):
+                yield _columns_from_rows(rows)
+    elif kind == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        _, path, row_group = partition
+        parquet = pq.ParquetFile(path)
+        names = [name for name in REPLAY_COLUMNS if name in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=batch_size, row_groups=[row_group], columns=names):
+            columns = _columns_from_arrow(pa.Table.from_batches([batch]), since, until)
+            if columns:
+                yield columns
+    else:
+        import pyarrow as pa
+        import pyarrow.json as pj
+        _, path = partition
+        options = pj.ParseOptions(explicit_schema=_ndjson_schema(), unexpected_field_behavior="ignore")
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            while True:
+                lines = [line for line in (f.readline() for _ in range(batch_size)) if line]
+                if not lines:
+                    break
+                # Parse colunar do bloco de linhas (o arquivo inteiro não precisa caber na memória)
+                table = pj.read_json(pa.BufferReader(b"".join(
+                    line if line.endswith(b"\n") else line + b"\n" for line in lines
+                )), parse_options=options)
+                columns = _columns_from_arrow(table, since, until)
+                if columns:
+                    yield columns
+
+
+# Avaliação
+
+def new_summary() -> dict:
+    return {
+        "rows": 0, "events": 0, "invalid_ip": 0, "changed": 0, "coalesced": 0, "approximate": 0,
+        "levels": {"current": {}, "candidate": {}},
+        "transitions": {},
+        "threats": {"current": 0, "candidate": 0, "flagged": 0, "cleared": 0},
+        "scores": {"current": [0] * HISTOGRAM_BUCKETS, "candidate": [0] * HISTOGRAM_BUCKETS},
+        "ips": {}
+    }
+
+
+def merge_summaries(target: dict, other: dict) -> dict:
+    for key in ("rows", "events", "invalid_ip", "changed", "coalesced", "approximate"):
+        target[key] += other[key]
+    for name in ("current", "candidate"):
+        for level, count in other["levels"][name].items():
+            target["levels"][name][level] = target["levels"][name].get(level, 0) + count
+        target["scores"][name] = [a + b for a, b in zip(target["scores"][name], other["scores"][name])]
+    for key, count in other["threats"].items():
+        target["threats"][key] += count
+    for field in ("transitions", "ips"):
+        for key, count in other[field].items():
+            target[field][key] = target[field].get(key, 0) + count
+    return target
+
+
+def _occurrence_groups(count: int, attempts, value, attempts_total, value_total) -> tuple:
+    """Grupos (peso, tentativas, valor) das ocorrências de uma linha coalescida e se são exatos"""
+    attempts, value = attempts or 0, value or 0.0
+    if attempts_total is None or value_total is None:
+        # Linha gravada antes das somas: só se conhece a primeira ocorrência
+        return [(count, attempts, value)], False
+    if attempts_total == attempts * count and abs(value_total - value * count) <= 1e-6 * max(abs(value_total), 1.0):
+        return [(count, attempts, value)], True
+    # Ocorrência de maior tentativa e as demais com a média do restante; valor médio para todas
+    mean_value = value_total / count
+    return [(1, attempts, mean_value), (count - 1, (attempts_total - attempts) / (count - 1), mean_value)], False
+
+
+def _expand_coalesced(columns: dict, stored: bool, summary: dict) -> dict:
+    """Linhas coalescidas viram grupos de ocorrências com peso em occurrence_count
+
+    Com baseline "stored", cada grupo ainda se divide entre ocorrências gravadas como ameaça
+    (threat_count, atribuídas primeiro às de maior tentativa) e as demais.
+    """
+    counts = columns["occurrence_count"]
+    if all(count in (None, 1) for count in counts):
+        return columns
+    names = ("ip_address", "country", "ts", "login_attempts", "transaction_value", "alert_level",
+             "threat_score", "occurrence_count")
+    expanded = {name: [] for name in names}
+
+    def append(i, weight, attempts, value, score):
+        for name, item in zip(names, (
+            columns["ip_address"][i], columns["country"][i], columns["ts"][i], attempts, value,
+            columns["alert_level"][i], score, weight
+        )):
+            expanded[name].append(item)
+
+    for i, count in enumerate(counts):
+        count = count or 1
+        score = columns["threat_score"][i]
+        if count == 1:
+            append(i, 1, columns["login_attempts"][i], columns["transaction_value"][i], score)
+            continue
+        groups, exact = _occurrence_groups(
+            count, columns["login_attempts"][i], columns["transaction_value"][i],
+            columns["login_attempts_total"][i], columns["transaction_value_total"][i]
+        )
+        summary["coalesced"] += count
+        if not exact:
+            summary["approximate"] += count
+        if not stored:
+            for weight, attempts, value in groups:
+                append(i, weight, attempts, value, score)
+            continue
+        score = score or 0.0
+        threats = columns["threat_count"][i]
+        if threats is None:
+            threats = count if score > THREAT_SCORE_THRESHOLD else 0
+        for weight, attempts, value in groups:
+            flagged = min(weight, threats)
+            threats -= flagged
+            if flagged:
+                append(i, flagged, attempts, value, score)
+            if weight > flagged:
+                # O score gravado é o maior do grupo; as ocorrências sem ameaça ficam no limite
+                append(i, weight - flagged, attempts, value, min(score, THREAT_SCORE_THRESHOLD))
+    return expanded
+
+
+class _ReplayEvent:
+    """Campos lidos por predict_threat (um objeto reaproveitado por worker)"""
+    __slots__ = ("login_attempts", "transaction_value", "time_context", "asset_criticality", "country")
+
+
+class _Scenario:
+    """Uma configuração avaliada: calendário de expediente próprio e memo de níveis de alerta"""
+
+    def __init__(self, config: dict):
+        from backend.business_hours import BusinessCalendar
+        self.config = config
+        self.hours = config["business_hours"]
+        self.calendar = BusinessCalendar(self.hours)
+        self.levels = {}
+
+
+class ReplayEvaluator:
+    """Estado de um worker: cenários, ativos fotografados e caches por IP/país"""
+
+    def __init__(self, current: dict, candidate: dict, baseline: str, assets: dict, config: dict = REPLAY_CONFIG):
+        self.stored = baseline == "stored"
+        # Com baseline "stored" o lado atual são os valores gravados; senão a configuração atual reavaliada
+        self.scenarios = [_Scenario(candidate)] if self.stored else [_Scenario(current), _Scenario(candidate)]
+        self.assets = assets
+        self.cache_entries = config["cache_entries"]
+        self._ips = {}
+        self._codes = {}
+        self._event = _ReplayEvent()
+
+    def _ip_info(self, ip: str):
+        info = self._ips.get(ip, False)
+        if info is False:
+            from backend.network_analyzer import analyze_ip
+            if len(self._ips) >= self.cache_entries:
+                self._ips.clear()
+            try:
+                ip_info = analyze_ip(ip)
+                # IPs com a mesma análise compartilham o memo de níveis de alerta
+                info = (ip_info, self.assets.get(ip), tuple(sorted(ip_info.items())))
+            except (TypeError, ValueError):
+                info = None
+            self._ips[ip] = info
+        return info
+
+    def _code(self, country: str) -> str:
+        code = self._codes.get(country)
+        if code is None:
+            from backend.feature_store import country_code
+            code = self._codes[country] = country_code(country)
+        return code
+
+    def _evaluate(self, scenario: _Scenario, columns: dict, infos: list, codes: list) -> tuple:
+        """Nível de alerta e score de cada evento sob uma configuração (None para IP inválido)"""
+        from backend.business_hours import off_hours_critical
+        from backend.model import predict_threat
+        from backend.network_analyzer import calculate_alert_level
+
+        config, hours, memo, event = scenario.config, scenario.hours, scenario.levels, self._event
+        if len(memo) >= self.cache_entries:
+            memo.clear()
+        contexts = scenario.calendar.context_batch(columns["ts"])
+        levels, scores = [], []
+        for info, code, country, attempts, value, context in zip(
+            infos, codes, columns["country"], columns["login_attempts"],
+            columns["transaction_value"], contexts
+        ):
+            if info is None:
+                levels.append(None)
+                scores.append(None)
+                continue
+            ip_info, criticality, profile = info
+            attempts = attempts or 0
+            off_hours = off_hours_critical(context, criticality, hours)
+            key = (profile, attempts, code, off_hours)
+            level = memo.get(key)
+            if level is None:
+                level = memo[key] = calculate_alert_level(ip_info, attempts, code, off_hours, config)
+            levels.append(level)
+            event.login_attempts = attempts
+            event.transaction_value = value or 0.0
+            event.time_context = context
+            event.asset_criticality = criticality
+            event.country = country
+            scores.append(predict_threat(event, config, None))
+        return levels, scores
+
+    def evaluate(self, columns: dict, summary: dict):
+        summary["rows"] += len(columns["ip_address"])
+        columns = _expand_coalesced(columns, self.stored, summary)
+        infos = [self._ip_info(ip) for ip in columns["ip_address"]]
+        codes = [self._code(country) for country in columns["country"]]
+        results = [self._evaluate(scenario, columns, infos, codes) for scenario in self.scenarios]
+        if self.stored:
+            current_levels, current_scores = columns["alert_level"], columns["threat_score"]
+        else:
+            current_levels, current_scores = results[0]
+        candidate_levels, candidate_scores = results[-1]
+
+        # Conta combinações distintas (nível e score antes/depois) e só depois distribui nos totais
+        outcomes, changed, ips = {}, {}, summary["ips"]
+        for ip, weight, old_level, old_score, new_level, new_score in zip(
+            columns["ip_address"], columns["occurrence_count"], current_levels, current_scores,
+            candidate_levels, candidate_scores
+        ):
+            weight = weight or 1
+            key = (old_level, old_score or 0.0, new_level, new_score)
+            outcomes[key] = outcomes.get(key, 0) + weight
+            is_changed = changed.get(key)
+            if is_changed is None:
+                is_changed = changed[key] = new_score is not None and _changed(*key)
+            if is_changed:
+                ips[ip] = ips.get(ip, 0) + weight
+        for key, weight in outcomes.items():
+            _tally(summary, key, weight, changed[key])
+
+
+def _changed(old_level, old_score, new_level, new_score) -> bool:
+    return old_level != new_level or (old_score > THREAT_SCORE_THRESHOLD) != (new_score > THREAT_SCORE_THRESHOLD)
+
+
+def _tally(summary: dict, outcome: tuple, weight: int, changed: bool):
+    old_level, old_score, new_level, new_score = outcome
+    summary["events"] += weight
+    if new_score is None:
+        summary["invalid_ip"] += weight
+        return
+    levels, threats, histogram = summary["levels"], summary["threats"], summary["scores"]
+    old_threat = old_score > THREAT_SCORE_THRESHOLD
+    new_threat = new_score > THREAT_SCORE_THRESHOLD
+    levels["current"][old_level] = levels["current"].get(old_level, 0) + weight
+    levels["candidate"][new_level] = levels["candidate"].get(new_level, 0) + weight
+    histogram["current"][min(int(old_score * HISTOGRAM_BUCKETS), HISTOGRAM_BUCKETS - 1)] += weight
+    histogram["candidate"][min(int(new_score * HISTOGRAM_BUCKETS), HISTOGRAM_BUCKETS - 1)] += weight
+    threats["current"] += weight if old_threat else 0
+    threats["candidate"] += weight if new_threat else 0
+    if not changed:
+        return
+    summary["changed"] += weight
+    if old_level != new_level:
+        key = f"{old_level} → {new_level}"
+        summary["transitions"][key] = summary["transitions"].get(key, 0) + weight
+    if new_threat and not old_threat:
+        threats["flagged"] += weight
+    elif old_threat and not new_threat:
+        threats["cleared"] += weight
+
+
+def replay_partition_with(evaluator: ReplayEvaluator, partition: tuple, since, until, batch_size: int) -> dict:
+    summary = new_summary()
+    for columns in read_partition(partition, batch_size, since, until):
+        if columns:
+            evaluator.evaluate(columns, summary)
+    return summary
+
+
+# Workers (processos)
+
+_worker = {}
+
+
+def _init_worker(current, candidate, baseline, assets, since, until, config):
+    # Conexões herdadas do processo pai não podem ser usadas no filho
+    engine.dispose(close=False)
+    _worker.update(
+        evaluator=ReplayEvaluator(current, candidate, baseline, assets, config),
+        since=since, until=until, batch_size=config["batch_size"]
+    )
+
+
+def replay_partition(partition: tuple) -> dict:
+    return replay_partition_with(
+        _worker["evaluator"], partition, _worker["since"], _worker["until"], _worker["batch_size"]
+    )
+
+
+# Coordenador
+
+class ReplayJob:
+    """Divide a fonte em partições, avalia em paralelo e junta o resumo das diferenças"""
+
+    def __init__(self, candidate: dict, current: dict = SECURITY_CONFIG, baseline: str = "config",
+                 config: dict = REPLAY_CONFIG):
+        if baseline not in ("config", "stored"):
+            raise ValueError(f"Baseline desconhecida: {baseline}")
+        from backend.business_hours import BusinessCalendar
+        BusinessCalendar(candidate["business_hours"])  # Valida o horário candidato antes de distribuir
+        self.candidate = candidate
+        self.current = current
+        self.baseline = baseline
+        self.config = config
+
+    def database_partitions(self, since: datetime = None, until: datetime = None) -> list:
+        query = select(func.min(AccessLog.id), func.max(AccessLog.id))
+        if since is not None:
+            query = query.where(AccessLog.timestamp >= since)
+        if until is not None:
+            query = query.where(AccessLog.timestamp < until)
+        with SessionLocal() as db:
+            low, high = db.execute(query).one()
+        if high is None:
+            return []
+        step = self.config["partition_rows"]
+        return [("database", start, min(start + step, high)) for start in range(low - 1, high, step)]
+
+    @staticmethod
+    def file_partitions(path: str) -> list:
+        """Row groups dos Parquet e arquivos NDJSON (.gz) sob o caminho, em ordem de nome"""
+        if os.path.isdir(path):
+            files = sorted(
+                os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+                if name.endswith(FILE_SUFFIXES)
+            )
+        elif os.path.exists(path):
+            files = [path]
+        else:
+            raise ValueError(f"Fonte não encontrada: {path}")
+        partitions = []
+        for file_path in files:
+            if file_path.endswith(".parquet"):
+                import pyarrow.parquet as pq
+                row_groups = pq.ParquetFile(file_path).num_row_groups
+                partitions.extend(("parquet", file_path, index) for index in range(row_groups))
+            else:
+                partitions.append(("ndjson", file_path))
+        return partitions
+
+    def _assets(self) -> dict:
+        from backend.asset_registry import asset_registry
+        return {ip: entry.criticality for ip, entry in asset_registry.entries()}
+
+    def run(self, source: str = None, since: datetime = None, until: datetime = None, workers: int = None) -> dict:
+        if not _run_lock.acquire(blocking=False):
+            raise RuntimeError("Replay já em execução")
+        try:
+            return self._run(source, since, until, workers)
+        finally:
+            _run_lock.release()
+
+    def _run(self, source: str, since: datetime, until: datetime, workers: int) -> dict:
+        started = time.perf_counter()
+        partitions = self.file_partitions(source) if source else self.database_partitions(since, until)
+        workers = max(1, min(workers or self.config["workers"], len(partitions) or 1))
+        args = (self.current, self.candidate, self.baseline, self._assets(), since, until, self.config)
+        summary = new_summary()
+        if workers == 1:
+            evaluator = ReplayEvaluator(*args[:4], self.config)
+            for partition in partitions:
+                merge_summaries(summary, replay_partition_with(
+                    evaluator, partition, since, until, self.config["batch_size"]
+                ))
+        else:
+            # spawn: fork copiaria o heap da API e poderia herdar locks presos por outras threads
+            # (logging, pool do SQLAlchemy, dispatcher de alertas, listener dos tenants)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=args,
+                                     mp_context=multiprocessing.get_context("spawn")) as pool:
+                # Resumos são somas: a ordem de chegada não altera o resultado
+                for partial in pool.map(replay_partition, partitions):
+                    merge_summaries(summary, partial)
+        return self.report(summary, source, since, until, len(partitions), workers,
+                           time.perf_counter() - started)
+
+    def report(self, summary: dict, source, since, until, partitions: int, workers: int, seconds: float) -> dict:
+        bucket = 1 / HISTOGRAM_BUCKETS
+        order = lambda item: (-item[1], str(item[0]))
+        return {
+            "source": source or "access_logs",
+            "baseline": self.baseline,
+            "since": since.isoformat() if since else None,
+            "until": until.isoformat() if until else None,
+            "changes": config_changes(self.current, self.candidate),
+            "rows": summary["rows"],
+            "events": summary["events"],
+            "invalid_ip": summary["invalid_ip"],
+            "changed_events": summary["changed"],
+            # Eventos de linhas coalescidas e, entre eles, os com tentativas/valor estimados
+            "coalesced_events": summary["coalesced"],
+            "approximate_events": summary["approximate"],
+            "alert_levels": {
+                name: dict(sorted(counts.items(), key=order)) for name, counts in summary["levels"].items()
+            },
+            "transitions": dict(sorted(summary["transitions"].items(), key=order)),
+            "threats": {**summary["threats"], "diff": summary["threats"]["candidate"] - summary["threats"]["current"]},
+            "score_distribution": [
+                {"bucket": f"{i * bucket:.1f}-{(i + 1) * bucket:.1f}", "current": current, "candidate": candidate,
+                 "diff": candidate - current}
+                for i, (current, candidate) in enumerate(zip(summary["scores"]["current"], summary["scores"]["candidate"]))
+            ],
+            "top_changed_ips": [
+                {"ip_address": ip, "events": count}
+                for ip, count in sorted(summary["ips"].items(), key=order)[:self.config["top_ips"]]
+            ],
+            "partitions": partitions,
+            "workers": workers,
+            "seconds": round(seconds, 2),
+            "events_per_second": round(summary["rows"] / seconds) if seconds else 0
+        }
+
+
+def _parse_overrides(pairs: list) -> dict:
+    overrides = {}
+    for pair in pairs:
+        key, separator, value = pair.partition("=")
+        if not separator:
+            raise ValueError(f"Use chave=valor: {pair}")
+        overrides[key.strip()] = value.strip()
+    return overrides
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", help="Arquivo ou diretório Parquet/NDJSON; sem ele, lê access_logs")
+    parser.add_argument("--days", type=float, default=REPLAY_CONFIG["default_days"],
+                        help="Janela até agora (0 = tudo)")
+    parser.add_argument("--config", help="JSON com as chaves alteradas de SECURITY_CONFIG")
+    parser.add_argument("--set", action="append", default=[], metavar="CHAVE=VALOR",
+                        help="Altera uma chave (listas separadas por vírgula; business_hours.start=07:00)")
+    parser.add_argument("--baseline", choices=["config", "stored"], default="config",
+                        help="Comparar com a configuração atual reavaliada ou com os valores gravados")
+    parser.add_argument("--workers", type=int, default=REPLAY_CONFIG["workers"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    overrides = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            overrides.update(json.load(f))
+    overrides.update(_parse_overrides(args.set))
+    if not args.source:
+        from backend.asset_registry import asset_registry
+        with SessionLocal() as db:
+            asset_registry.sync(db)
+    since = datetime.now() - timedelta(days=args.days) if args.days else None
+    job = ReplayJob(candidate_config(overrides), baseline=args.baseline)
+    print(json.dumps(job.run(args.source, since=since, workers=args.workers), indent=2, ensure_ascii=False))
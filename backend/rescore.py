@@ -0,0 +1,350 @@
+"""Reprocessa threat_score, is_threat e alert_level dos logs históricos
+
+Varre access_logs em faixas de id (cursor do lado do servidor), calcula os scores num pool de
+processos e grava só as linhas alteradas com UPDATE ... FROM (VALUES ...) em transações curtas.
+O progresso fica num checkpoint: uma execução interrompida continua de onde parou. Dias já
+compactados no espelho colunar com linhas alteradas são marcados antes da gravação e
+recompactados no fim, para /api/analytics/query não servir os valores antigos.
+
+    python -m backend.rescore                 # aplica
+    python -m backend.rescore --dry-run       # só compara distribuições
+    python -m backend.rescore --restart       # ignora o checkpoint
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from sqlalchemy import Boolean, Float, Integer, String, bindparam, case, column, func, text, update, values
+from sqlalchemy.exc import OperationalError
+from backend.analytics import columnar_mirror
+from backend.config import RESCORE_CONFIG, SCORING_BACKEND, MODEL_ARTIFACT_PATH, THREAT_SCORE_THRESHOLD
+from backend.database import SessionLocal, engine
+from backend.models import AccessLog
+
+logger = logging.getLogger(__name__)
+
+# Colunas lidas por linha, na ordem das tuplas enviadas aos workers
+SCAN_COLUMNS = (
+    "id", "ip_address", "country", "timestamp", "login_attempts", "transaction_value", "description",
+    "is_internal", "asset_name", "network_zone", "is_authorized", "alert_level", "threat_score", "is_threat",
+    "tenant_id"
+)
+
+HISTOGRAM_BUCKETS = 10
+
+
+def _is_lock_error(error: OperationalError) -> bool:
+    """lock_timeout do PostgreSQL (55P03) ou banco bloqueado no SQLite"""
+    return getattr(error.orig, "pgcode", None) == "55P03" or "locked" in str(error.orig)
+
+
+# Workers (processos)
+
+_recompute_alert_level = True
+
+
+def _init_worker(backend: str, artifact_path: str, alert_level: bool):
+    global _recompute_alert_level
+    from backend.scoring import scoring_engine
+    # Conexões herdadas do processo pai não podem ser usadas no filho
+    engine.dispose(close=False)
+    if backend != "rules":
+        scoring_engine.load(backend, artifact_path)
+    _recompute_alert_level = alert_level
+
+
+def score_chunk(rows: list) -> list:
+    """Recalcula uma faixa: [(id, score, is_threat, alert_level), ...]
+
+    Sem estado de streaming (feature store, linhas de base): o score usa só o próprio evento,
+    o que torna o resultado determinístico e independente da ordem dos chunks.
+    """
+    from backend.events import Event
+    from backend.scoring import scoring_engine
+    from backend.business_hours import off_hours_critical
+
+    events = []
+    for row in rows:
+        event = Event(
+            ip_address=row[1], country=row[2], timestamp=row[3], login_attempts=row[4],
+            transaction_value=row[5], description=row[6] or "", is_internal=row[7], asset_name=row[8],
+            network_zone=row[9], is_authorized=row[10], alert_level=row[11], tenant_id=row[14]
+        )
+        events.append(event)
+    scores = scoring_engine.score_batch(events)
+
+    levels = [row[11] for row in rows]
+    if _recompute_alert_level:
+        from backend.network_analyzer import classified_ip_info, calculate_alert_level
+        # Zona e autorização vêm da classificação do tenant da linha (Event), não da rede padrão
+        ip_info = {}
+        for i, event in enumerate(events):
+            if event.ip_int is None:
+                continue  # IP inválido: mantém o nível gravado
+            profile = (event.network_zone, event.is_authorized)
+            info = ip_info.get(profile)
+            if info is None:
+                info = ip_info[profile] = classified_ip_info(*profile)
+            levels[i] = calculate_alert_level(
+                info, event.login_attempts, event.country_code,
+                off_hours_critical(event.time_context, event.asset_criticality)
+            )
+    return [
+        (row[0], score, score > THREAT_SCORE_THRESHOLD, level)
+        for row, score, level in zip(rows, scores, levels)
+    ]
+
+
+# Coordenador
+
+class RescoreJob:
+    """Varredura por faixas de id com checkpoint, limite de carga no banco e modo de simulação"""
+
+    def __init__(self, config: dict = RESCORE_CONFIG, dry_run: bool = False, alert_level: bool = True,
+                 backend: str = SCORING_BACKEND, artifact_path: str = MODEL_ARTIFACT_PATH):
+        self.config = config
+        self.dry_run = dry_run
+        self.alert_level = alert_level
+        self.backend = backend
+        self.artifact_path = artifact_path
+        self.db_seconds = 0.0
+        self.throttled_seconds = 0.0
+        self.changed_days = set()
+        self.marked_days = set()
+        self.recompacted = []
+        self.report = {
+            "scanned": 0, "changed": 0, "updated": 0, "threat_flips": 0, "retries": 0,
+            "before": [0] * HISTOGRAM_BUCKETS, "after": [0] * HISTOGRAM_BUCKETS, "alert_levels": {}
+        }
+
+    # Checkpoint
+
+    def load_checkpoint(self):
+        path = self.config["checkpoint_path"]
+        if self.dry_run or not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_checkpoint(self, state: dict):
+        if self.dry_run:
+            return
+        path = self.config["checkpoint_path"]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({**state, "updated_at": datetime.now().isoformat()}, f)
+        os.replace(tmp_path, path)
+
+    # Banco
+
+    def _throttle(self, started: float):
+        """Dorme o necessário para o job ocupar o banco no máximo target_db_load do tempo"""
+        elapsed = time.perf_counter() - started
+        self.db_seconds += elapsed
+        load = self.config["target_db_load"]
+        if 0 < load < 1:
+            pause = elapsed * (1 / load - 1)
+            self.throttled_seconds += pause
+            time.sleep(pause)
+
+    def read_chunk(self, low: int, high: int) -> list:
+        """Linhas com low < id <= high via cursor do lado do servidor (transação só de leitura)"""
+        started = time.perf_counter()
+        columns = [getattr(AccessLog, name) for name in SCAN_COLUMNS]
+        with SessionLocal() as db:
+            result = db.execute(
+                AccessLog.__table__.select().with_only_columns(*columns)
+                .where(AccessLog.id > low, AccessLog.id <= high).order_by(AccessLog.id)
+                .execution_options(stream_results=True, yield_per=self.config["write_batch_size"])
+            )
+            rows = [tuple(row) for row in result]
+            db.rollback()
+        self._throttle(started)
+        return rows
+
+    def _update_statement(self, changes: list):
+        """UPDATE ... FROM (VALUES ...) no PostgreSQL; executemany por id nos demais bancos"""
+        table = AccessLog.__table__
+        # O score novo vale para todas as ocorrências de uma linha coalescida
+        def threat_count(threat):
+            return case((threat, func.coalesce(table.c.occurrence_count, 1)), else_=0)
+
+        if engine.dialect.name != "postgresql":
+            statement = (
+                update(table).where(table.c.id == bindparam("row_id"))
+                .values(threat_score=bindparam("score"), is_threat=bindparam("threat"), alert_level=bindparam("level"),
+                        threat_count=threat_count(bindparam("threat", type_=Boolean)))
+            )
+            params = [{"row_id": i, "score": s, "threat": t, "level": lv} for i, s, t, lv in changes]
+            return statement, params
+        data = values(
+            column("id", Integer), column("threat_score", Float),
+            column("is_threat", Boolean), column("alert_level", String),
+            name="v"
+        ).data(changes)
+        statement = (
+            update(table)
+            .where(table.c.id == data.c.id)
+            .values(threat_score=data.c.threat_score, is_threat=data.c.is_threat, alert_level=data.c.alert_level,
+                    threat_count=threat_count(data.c.is_threat))
+        )
+        return statement, None
+
+    def write_batch(self, changes: list):
+        """Grava um lote numa transação curta; no PostgreSQL com lock_timeout"""
+        statement, params = self._update_statement(changes)
+        for attempt in range(self.config["max_retries"] + 1):
+            started = time.perf_counter()
+            try:
+                with SessionLocal() as db:
+                    if engine.dialect.name == "postgresql":
+                        db.execute(text(f"SET LOCAL lock_timeout = {int(self.config['lock_timeout_ms'])}"))
+                    db.execute(statement, params)
+                    db.commit()
+                self._throttle(started)
+                self.report["updated"] += len(changes)
+                return
+            except OperationalError as e:
+                if not _is_lock_error(e):
+                    raise
+                # Linhas bloqueadas por outra transação: desiste rápido e tenta de novo mais tarde
+                self._throttle(started)
+                self.report["retries"] += 1
+                logger.warning(f"Lote de rescore bloqueado (tentativa {attempt + 1}): {e.orig}")
+                time.sleep(min(2 ** attempt, 30))
+        raise RuntimeError("Lote de rescore não gravado após o número máximo de tentativas")
+
+    # Execução
+
+    def _collect(self, rows: list, results: list) -> list:
+        """Atualiza o relatório e retorna só as linhas que mudaram"""
+        report = self.report
+        changes = []
+        for row, (row_id, score, is_threat, level) in zip(rows, results):
+            old_score, old_threat, old_level = row[12] or 0.0, bool(row[13]), row[11]
+            report["before"][min(int(old_score * HISTOGRAM_BUCKETS), HISTOGRAM_BUCKETS - 1)] += 1
+            report["after"][min(int(score * HISTOGRAM_BUCKETS), HISTOGRAM_BUCKETS - 1)] += 1
+            if is_threat != old_threat:
+                report["threat_flips"] += 1
+            if level != old_level:
+                key = f"{old_level} → {level}"
+                report["alert_levels"][key] = report["alert_levels"].get(key, 0) + 1
+            if abs(score - old_score) > 1e-9 or is_threat != old_threat or level != old_level:
+                changes.append((row_id, score, is_threat, level))
+                self.changed_days.add(row[3].date())
+        report["scanned"] += len(rows)
+        report["changed"] += len(changes)
+        return changes
+
+    def run(self, restart: bool = False) -> dict:
+        with SessionLocal() as db:
+            min_id, max_id = db.query(func.min(AccessLog.id), func.max(AccessLog.id)).one()
+        if max_id is None:
+            return self.summary(None)
+
+        checkpoint = None if restart else self.load_checkpoint()
+        if checkpoint and checkpoint.get("backend") == self.backend and checkpoint["last_id"] < checkpoint["max_id"]:
+            # Linhas criadas depois do início já foram pontuadas pelas regras atuais
+            low, max_id = checkpoint["last_id"], checkpoint["max_id"]
+            logger.info(f"Retomando rescore a partir do id {low}")
+        else:
+            low = min_id - 1
+        state = {"backend": self.backend, "max_id": max_id, "last_id": low,
+                 "started_at": datetime.now().isoformat()}
+
+        chunk_size = self.config["chunk_size"]
+        workers = self.config["workers"]
+        started = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            initargs=(self.backend, self.artifact_path, self.alert_level)
+        ) as pool:
+            # Mantém até 2 chunks por worker em voo; resultados são gravados na ordem dos ids,
+            # então o checkpoint sempre aponta para um prefixo completo
+            pending = deque()
+            while low < max_id or pending:
+                while low < max_id and len(pending) < workers * 2:
+                    high = min(low + chunk_size, max_id)
+                    rows = self.read_chunk(low, high)
+                    pending.append((high, rows, pool.submit(score_chunk, rows) if rows else None))
+                    low = high
+                high, rows, future = pending.popleft()
+                if future is not None:
+                    changes = self._collect(rows, future.result())
+                    if not self.dry_run:
+                        self._invalidate_mirror()
+                        batch = self.config["write_batch_size"]
+                        for i in range(0, len(changes), batch):
+                            self.write_batch(changes[i:i + batch])
+                state["last_id"] = high
+                self.save_checkpoint(state)
+                logger.info(f"Rescore até id {high}/{max_id}: {self.report['scanned']} lidas, "
+                            f"{self.report['changed']} alteradas")
+        if not self.dry_run:
+            self._recompact_mirror()
+        return self.summary(time.perf_counter() - started)
+
+    # Espelho colunar
+
+    def _invalidate_mirror(self):
+        """Marca os dias alterados ainda não marcados (antes da gravação: sobrevive a uma interrupção)"""
+        days = self.changed_days - self.marked_days
+        if days:
+            columnar_mirror.invalidate(days)
+            self.marked_days |= days
+
+    def _recompact_mirror(self):
+        # Dias compactados durante a execução também podem ter ficado com valores antigos
+        columnar_mirror.invalidate(self.changed_days)
+        with SessionLocal() as db:
+            self.recompacted = columnar_mirror.recompact_stale(db)
+        if self.recompacted:
+            logger.info(f"Espelho colunar: {len(self.recompacted)} dias recompactados")
+
+    def summary(self, seconds) -> dict:
+        report = self.report
+        bucket = 1 / HISTOGRAM_BUCKETS
+        return {
+            "dry_run": self.dry_run,
+            "backend": self.backend,
+            "scanned": report["scanned"],
+            "changed": report["changed"],
+            "updated": report["updated"],
+            "threat_flips": report["threat_flips"],
+            "alert_level_changes": report["alert_levels"],
+            "score_distribution": [
+                {"bucket": f"{i * bucket:.1f}-{(i + 1) * bucket:.1f}", "before": before, "after": after,
+                 "diff": after - before}
+                for i, (before, after) in enumerate(zip(report["before"], report["after"]))
+            ],
+            "lock_retries": report["retries"],
+            "recompacted_days": [entry["day"] for entry in self.recompacted],
+            "seconds": round(seconds, 2) if seconds else 0.0,
+            "db_seconds": round(self.db_seconds, 2),
+            "throttled_seconds": round(self.throttled_seconds, 2),
+            "rows_per_second": round(report["scanned"] / seconds) if seconds else 0
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="Não grava; só relata as diferenças")
+    parser.add_argument("--restart", action="store_true", help="Ignora o checkpoint e começa do início")
+    parser.add_argument("--no-alert-level", action="store_true", help="Mantém o alert_level gravado")
+    parser.add_argument("--backend", default=SCORING_BACKEND)
+    parser.add_argument("--artifact", default=MODEL_ARTIFACT_PATH)
+    parser.add_argument("--workers", type=int, default=RESCORE_CONFIG["workers"])
+    parser.add_argument("--chunk-size", type=int, default=RESCORE_CONFIG["chunk_size"])
+    parser.add_argument("--target-db-load", type=float, default=RESCORE_CONFIG["target_db_load"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    config = dict(RESCORE_CONFIG, workers=args.workers, chunk_size=args.chunk_size,
+                  target_db_load=args.target_db_load)
+    job = RescoreJob(config, dry_run=args.dry_run, alert_level=not args.no_alert_level,
+                     backend=args.backend, artifact_path=args.artifact)
+    print(json.dumps(job.run(restart=args.restart), indent=2, ensure_ascii=False))
@@ -0,0 +1,334 @@
+"""Política de retenção de access_logs: agregação por hora, arquivamento e remoção
+
+Linhas normais mais antigas que raw_days e ameaças mais antigas que threat_days são processadas
+em lotes: gravadas em NDJSON comprimido (um arquivo por dia e lote), somadas em access_log_hourly
+e removidas de access_logs. Agregados e DELETE vão na mesma transação, então um lote interrompido
+não é contado duas vezes; o arquivo do lote é regravado com o mesmo nome na próxima tentativa.
+Cada execução processa no máximo max_batches_per_run lotes e relata linhas e bytes recuperados.
+
+    python -m backend.retention             # aplica
+    python -m backend.retention --dry-run   # só conta o que seria removido
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, literal_column, or_, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import OperationalError
+from backend.config import RETENTION_CONFIG, ANALYTICS_CONFIG, TENANT_CONFIG
+from backend.database import SessionLocal, engine
+from backend.models import AccessLog, AccessLogHourly
+
+logger = logging.getLogger(__name__)
+
+LOG_COLUMNS = [column.name for column in AccessLog.__table__.columns]
+HOURLY_DIMENSIONS = ("country", "network_zone", "asset_type", "alert_level")
+HOURLY_INSERT_ROWS = 1000  # Linhas por INSERT ... ON CONFLICT
+
+
+def _is_lock_error(error: OperationalError) -> bool:
+    """lock_timeout do PostgreSQL (55P03) ou banco bloqueado no SQLite"""
+    return getattr(error.orig, "pgcode", None) == "55P03" or "locked" in str(error.orig)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def hourly_groups(rows) -> list:
+    """Soma as linhas por (tenant, hora, dimensões) no formato de access_log_hourly"""
+    groups = {}
+    for row in rows:
+        key = (
+            row.tenant_id or TENANT_CONFIG["default_tenant"],
+            row.timestamp.replace(minute=0, second=0, microsecond=0),
+            *(getattr(row, name) or "" for name in HOURLY_DIMENSIONS)
+        )
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = [0, 0, 0, 0.0, 0.0]
+        # Linhas coalescidas contam como occurrence_count eventos, com as somas das ocorrências
+        count = row.occurrence_count or 1
+        group[0] += count
+        if row.threat_count is not None:
+            group[1] += row.threat_count
+        elif row.is_threat:
+            group[1] += count
+        group[2] += row.login_attempts_total if row.login_attempts_total is not None else (row.login_attempts or 0)
+        group[3] += (
+            row.transaction_value_total if row.transaction_value_total is not None else (row.transaction_value or 0.0)
+        )
+        group[4] = max(group[4], row.threat_score or 0.0)
+    return [
+        {
+            "tenant_id": key[0], "hour": key[1], **dict(zip(HOURLY_DIMENSIONS, key[2:])),
+            "events": events, "threats": threats, "login_attempts": attempts,
+            "transaction_value": value, "max_threat_score": max_score
+        }
+        for key, (events, threats, attempts, value, max_score) in groups.items()
+    ]
+
+
+class RetentionJob:
+    """Aplica a política em lotes limitados; uma execução por vez"""
+
+    def __init__(self, config: dict = RETENTION_CONFIG):
+        self.config = config
+        self.last_report = None
+        self._lock = threading.Lock()
+
+    # Política
+
+    def cutoffs(self, now: datetime = None) -> dict:
+        """Limite de idade por classe de linha; com o espelho colunar ativo, nunca além do watermark"""
+        now = now or datetime.now()
+        limits = {
+            "normal": now - timedelta(days=self.config["raw_days"]),
+            "threat": now - timedelta(days=self.config["threat_days"])
+        }
+        if ANALYTICS_CONFIG["enabled"]:
+            # Dias ainda não compactados no Parquet não podem sair do banco de linhas
+            from backend.analytics import columnar_mirror
+            watermark = columnar_mirror.watermark() or datetime.min
+            limits = {name: min(cutoff, watermark) for name, cutoff in limits.items()}
+        return limits
+
+    @staticmethod
+    def _condition(name: str):
+        if name == "threat":
+            return AccessLog.is_threat.is_(True)
+        return or_(AccessLog.is_threat.is_(False), AccessLog.is_threat.is_(None))
+
+    # Lotes
+
+    def _archive(self, rows, lines) -> tuple:
+        """Grava o lote em NDJSON gzip, um arquivo por dia nomeado pelo primeiro id: (arquivos, bytes)"""
+        by_day = {}
+        for row, line in zip(rows, lines):
+            day = row.timestamp.date()
+            if day not in by_day:
+                by_day[day] = (row.id, [])
+            by_day[day][1].append(line)
+        root = os.path.join(self.config["archive_dir"], "access_logs")
+        written = 0
+        for day, (first_id, day_lines) in by_day.items():
+            path = os.path.join(root, f"date={day.isoformat()}", f"{first_id}.ndjson.gz")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=self.config["compression_level"]) as f:
+                f.write("\n".join(day_lines) + "\n")
+            os.replace(tmp_path, path)
+            written += os.path.getsize(path)
+        return len(by_day), written
+
+    def _upsert_hourly(self, db, groups: list):
+        table = AccessLogHourly.__table__
+        dialect = db.get_bind().dialect.name
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        greatest = func.greatest if dialect == "postgresql" else func.max
+        for i in range(0, len(groups), HOURLY_INSERT_ROWS):
+            statement = insert(table).values(groups[i:i + HOURLY_INSERT_ROWS])
+            excluded = statement.excluded
+            db.execute(statement.on_conflict_do_update(
+                index_elements=["tenant_id", "hour", *HOURLY_DIMENSIONS],
+                set_={
+                    "events": table.c.events + excluded.events,
+                    "threats": table.c.threats + excluded.threats,
+                    "login_attempts": table.c.login_attempts + excluded.login_attempts,
+                    "transaction_value": table.c.transaction_value + excluded.transaction_value,
+                    "max_threat_score": greatest(table.c.max_threat_score, excluded.max_threat_score)
+                }
+            ))
+
+    def process_batch(self, name: str, cutoff: datetime, report: dict) -> int:
+        """Arquiva, agrega e remove as linhas mais antigas da classe; retorna quantas removeu"""
+        table = AccessLog.__table__
+        postgres = engine.dialect.name == "postgresql"
+        columns = [table.c[column] for column in LOG_COLUMNS]
+        if postgres:
+            columns.append(literal_column("pg_column_size(access_logs.*)").label("row_bytes"))
+        query = (
+            select(*columns).where(self._condition(name), table.c.timestamp < cutoff)
+            .order_by(table.c.timestamp, table.c.id).limit(self.config["batch_size"])
+        )
+        with SessionLocal() as db:
+            if postgres:
+                db.execute(text(f"SET LOCAL lock_timeout = {int(self.config['lock_timeout_ms'])}"))
+            rows = db.execute(query).all()
+            if not rows:
+                return 0
+            lines = [
+                json.dumps(dict(zip(LOG_COLUMNS, row)), default=_json_default, ensure_ascii=False)
+                for row in rows
+            ]
+            if self.config["archive"]:
+                files, archive_bytes = self._archive(rows, lines)
+                report["archive_files"] += files
+                report["archive_bytes"] += archive_bytes
+            groups = hourly_groups(rows)
+            self._upsert_hourly(db, groups)
+            db.execute(delete(AccessLog).where(AccessLog.id.in_([row.id for row in rows])))
+            db.commit()
+        report["deleted"][name] += len(rows)
+        report["hourly_rows"] += len(groups)
+        # Tamanho das tuplas no PostgreSQL; nos demais bancos, o NDJSON sem compressão
+        report["bytes_reclaimed"] += (
+            sum(row.row_bytes for row in rows) if postgres else sum(len(line.encode()) for line in lines)
+        )
+        return len(rows)
+
+    def expire_hourly(self, now: datetime) -> int:
+        if not self.config["hourly_days"]:
+            return 0
+        with SessionLocal() as db:
+            result = db.execute(delete(AccessLogHourly).where(
+                AccessLogHourly.hour < now - timedelta(days=self.config["hourly_days"])
+            ))
+            db.commit()
+        return result.rowcount
+
+    # Execução
+
+    def _table_bytes(self):
+        if engine.dialect.name != "postgresql":
+            return None
+        with engine.connect() as connection:
+            return connection.execute(text("SELECT pg_total_relation_size('access_logs')")).scalar()
+
+    def _vacuum(self):
+        # VACUUM não roda dentro de transação; libera o espaço das tuplas removidas para reuso
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM (ANALYZE) access_logs"))
+
+    def preview(self) -> dict:
+        """Linhas (e bytes, no PostgreSQL) que a política removeria hoje, sem alterar nada"""
+        cutoffs = self.cutoffs()
+        postgres = engine.dialect.name == "postgresql"
+        eligible = {}
+        with SessionLocal() as db:
+            for name, cutoff in cutoffs.items():
+                metrics = [func.count(AccessLog.id)]
+                if postgres:
+                    metrics.append(func.sum(literal_column("pg_column_size(access_logs.*)")))
+                row = db.execute(
+                    select(*metrics).where(self._condition(name), AccessLog.timestamp < cutoff)
+                ).one()
+                eligible[name] = {"rows": row[0], "bytes": int(row[1] or 0) if postgres else None}
+        return {
+            "dry_run": True,
+            "cutoffs": {name: cutoff.isoformat() for name, cutoff in cutoffs.items()},
+            "eligible": eligible,
+            "batches_needed": sum(
+                -(-entry["rows"] // self.config["batch_size"]) for entry in eligible.values()
+            )
+        }
+
+    def run(self) -> dict:
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Retenção já em execução")
+        try:
+            return self._run()
+        finally:
+            self._lock.release()
+
+    def _run(self) -> dict:
+        started = time.perf_counter()
+        now = datetime.now()
+        cutoffs = self.cutoffs(now)
+        report = {
+            "deleted": {name: 0 for name in cutoffs}, "bytes_reclaimed": 0, "hourly_rows": 0,
+            "archive_files": 0, "archive_bytes": 0, "batches": 0, "lock_retries": 0
+        }
+        table_before = self._table_bytes()
+        remaining = False
+        batch_size = self.config["batch_size"]
+        for name, cutoff in cutoffs.items():
+            while True:
+                if report["batches"] >= self.config["max_batches_per_run"]:
+                    remaining = True
+                    break
+                try:
+                    deleted = self.process_batch(name, cutoff, report)
+                except OperationalError as e:
+                    if not _is_lock_error(e):
+                        raise
+                    # Linhas bloqueadas por outra transação: tenta na próxima execução
+                    report["lock_retries"] += 1
+                    logger.warning(f"Lote de retenção bloqueado ({name}): {e.orig}")
+                    remaining = True
+                    break
+                if deleted:
+                    report["batches"] += 1
+                if deleted < batch_size:
+                    break
+                time.sleep(self.config["pause_seconds"])
+
+        rows = sum(report["deleted"].values())
+        hourly_expired = self.expire_hourly(now)
+        if rows and self.config["vacuum"] and engine.dialect.name == "postgresql":
+            self._vacuum()
+        table_after = self._table_bytes() if table_before is not None else None
+        self.last_report = {
+            "dry_run": False,
+            "cutoffs": {name: cutoff.isoformat() for name, cutoff in cutoffs.items()},
+            **report,
+            "rows_reclaimed": rows,
+            "hourly_expired": hourly_expired,
+            "compression_ratio": (
+                round(report["bytes_reclaimed"] / report["archive_bytes"], 1) if report["archive_bytes"] else None
+            ),
+            # VACUUM libera o espaço para reuso; o arquivo da tabela raramente encolhe
+            "table_bytes": {"before": table_before, "after": table_after} if table_before is not None else None,
+            "remaining": remaining,
+            "seconds": round(time.perf_counter() - started, 2),
+            "finished_at": datetime.now().isoformat()
+        }
+        return self.last_report
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.config["enabled"],
+            "policy": {
+                "raw_days": self.config["raw_days"],
+                "threat_days": self.config["threat_days"],
+                "hourly_days": self.config["hourly_days"],
+                "archive": self.config["archive"],
+                "archive_dir": self.config["archive_dir"]
+            },
+            "running": self._lock.locked(),
+            "last_run": self.last_report
+        }
+
+
+# Instância compartilhada pela API e pelo job em segundo plano
+retention_job = RetentionJob()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="Não altera nada; só conta as linhas elegíveis")
+    parser.add_argument("--raw-days", type=int, default=RETENTION_CONFIG["raw_days"])
+    parser.add_argument("--threat-days", type=int, default=RETENTION_CONFIG["threat_days"])
+    parser.add_argument("--max-batches", type=int, default=RETENTION_CONFIG["max_batches_per_run"])
+    parser.add_argument("--until-done", action="store_true", help="Repete execuções até não sobrar backlog")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    config = dict(RETENTION_CONFIG, raw_days=args.raw_days, threat_days=args.threat_days,
+                  max_batches_per_run=args.max_batches)
+    job = RetentionJob(config)
+    if args.dry_run:
+        print(json.dumps(job.preview(), indent=2, ensure_ascii=False))
+    else:
+        while True:
+            report = job.run()
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+            if not (args.until_done and report["remaining"]):
+                break
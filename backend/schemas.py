@@ -22,9 +22,13 @@ class AccessLogCreate(BaseModel):
     network_zone: Optional[str] = None
     is_authorized: Optional[bool] = True
     alert_level: Optional[str] = None
+    tenant_id: Optional[str] = None
 
 class AccessLog(AccessLogCreate):
     id: int
+    occurrence_count: Optional[int] = 1
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
     
     class Config:
         from_attributes = True 
\ No newline at end of file
@@ -0,0 +1,295 @@
+import abc
+import json
+import math
+import os
+import time
+import threading
+from backend.config import SECURITY_CONFIG, MODEL_DIR
+from backend.model import predict_threat
+from backend.feature_store import feature_store
+from backend.anomaly import anomaly_detector
+from backend.business_hours import business_calendar, BUSINESS, WEEKEND, HOLIDAY
+
+# Codificação fixa das zonas e níveis de alerta usados como features
+NETWORK_ZONES = ("local", "vpn", "dmz", "external")
+ALERT_LEVELS = {"BAIXO": 0.0, "MÉDIO": 1.0, "ALTO": 2.0, "CRÍTICO": 3.0}
+
+_HIGH_RISK = frozenset(SECURITY_CONFIG["high_risk_countries"])
+
+
+def _entity_feature(kind: str, key_of, field: str):
+    """Extrator que lê um agregado do feature store (0.0 se a entidade ainda não existe)"""
+    def extract(log):
+        key = key_of(log)
+        stats = feature_store.get(kind, key) if key else None
+        return float(stats[field]) if stats else 0.0
+    return extract
+
+
+def _value_zscore(kind: str, key_of):
+    """Desvio do valor da transação em relação à EWMA da entidade"""
+    def extract(log):
+        key = key_of(log)
+        stats = feature_store.get(kind, key) if key else None
+        if not stats or not stats["value_std"]:
+            return 0.0
+        return (float(log.transaction_value or 0.0) - stats["value_ewma"]) / stats["value_std"]
+    return extract
+
+
+# Extratores disponíveis: nome da feature -> função(log) -> float
+FEATURES = {
+    "login_attempts": lambda log: float(log.login_attempts or 0),
+    "transaction_value": lambda log: float(log.transaction_value or 0.0),
+    "log_transaction_value": lambda log: math.log1p(max(log.transaction_value or 0.0, 0.0)),
+    "is_internal": lambda log: 1.0 if log.is_internal else 0.0,
+    "is_authorized": lambda log: 1.0 if log.is_authorized else 0.0,
+    "high_risk_country": lambda log: 1.0 if log.country_code in _HIGH_RISK else 0.0,
+    "alert_level": lambda log: ALERT_LEVELS.get(log.alert_level, 0.0),
+    "off_hours": lambda log: 0.0 if log.time_context == BUSINESS else 1.0,
+    "non_working_day": lambda log: 1.0 if log.time_context in (WEEKEND, HOLIDAY) else 0.0,
+}
+for _zone in NETWORK_ZONES:
+    FEATURES[f"zone_{_zone}"] = (lambda z: lambda log: 1.0 if log.network_zone == z else 0.0)(_zone)
+
+# Agregados comportamentais do feature store (leitura O(1) por entidade)
+_ENTITY_KEYS = {
+    "ip": lambda log: log.ip_address,
+    "asset": lambda log: log.asset_name,
+    "country": lambda log: log.country_code,
+}
+for _kind, _key_of in _ENTITY_KEYS.items():
+    for _field in ("events_per_min", "distinct_countries", "failed_login_ratio"):
+        FEATURES[f"{_kind}_{_field}"] = _entity_feature(_kind, _key_of, _field)
+    FEATURES[f"{_kind}_value_zscore"] = _value_zscore(_kind, _key_of)
+
+# Desvio em relação às linhas de base de ativo/zona do detector de anomalias
+for _metric in anomaly_detector.METRICS:
+    FEATURES[f"{_metric}_anomaly"] = (lambda m: lambda log: anomaly_detector.deviation(log, m) or 0.0)(_metric)
+
+
+class FeatureTransformer:
+    """Compila uma lista de features em uma tupla de extratores aplicada ao lote inteiro"""
+
+    def __init__(self, feature_names):
+        unknown = [name for name in feature_names if name not in FEATURES]
+        if unknown:
+            raise ValueError(f"Features desconhecidas: {', '.join(unknown)}")
+        self.feature_names = list(feature_names)
+        self._extractors = tuple(FEATURES[name] for name in feature_names)
+
+    def transform(self, logs):
+        """Converte um lote de AccessLogCreate em uma matriz (lista de linhas)"""
+        extractors = self._extractors
+        return [[extract(log) for extract in extractors] for log in logs]
+
+
+def _sigmoid(x: float) -> float:
+    if x >= 0:
+        return 1.0 / (1.0 + math.exp(-x))
+    z = math.exp(x)
+    return z / (1.0 + z)
+
+
+class ScoringBackend(abc.ABC):
+    """Interface dos backends de score: recebe um lote e devolve um score (0 a 1) por evento"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def score_batch(self, logs):
+        ...
+
+    def describe(self) -> dict:
+        return {"backend": self.name}
+
+
+class RulesBackend(ScoringBackend):
+    """Regras fixas de backend.model.predict_threat"""
+
+    name = "rules"
+
+    def score_batch(self, logs):
+        return [predict_threat(log) for log in logs]
+
+
+class LogisticBackend(ScoringBackend):
+    """Regressão logística treinada offline"""
+
+    name = "logistic"
+
+    def __init__(self, artifact: dict):
+        self.transformer = FeatureTransformer(artifact["features"])
+        self.weights = [float(w) for w in artifact["weights"]]
+        self.bias = float(artifact.get("bias", 0.0))
+        self.version = artifact.get("version")
+        # Normalização opcional (média/desvio do treino)
+        n = len(self.weights)
+        self.mean = [float(m) for m in artifact.get("mean", [0.0] * n)]
+        self.scale = [float(s) or 1.0 for s in artifact.get("scale", [1.0] * n)]
+        if not (len(self.transformer.feature_names) == n == len(self.mean) == len(self.scale)):
+            raise ValueError("Artefato inconsistente: tamanhos de features/pesos diferentes")
+        # Pré-combina normalização e pesos: w' = w/scale, b' = b - sum(w*mean/scale)
+        self._coef = [w / s for w, s in zip(self.weights, self.scale)]
+        self._intercept = self.bias - sum(c * m for c, m in zip(self._coef, self.mean))
+
+    def score_batch(self, logs):
+        coef = self._coef
+        intercept = self._intercept
+        return [
+            _sigmoid(intercept + sum(c * x for c, x in zip(coef, row)))
+            for row in self.transformer.transform(logs)
+        ]
+
+    def describe(self) -> dict:
+        return {"backend": self.name, "version": self.version, "features": self.transformer.feature_names}
+
+
+class TreeEnsembleBackend(ScoringBackend):
+    """Árvores de gradient boosting em formato de arrays (feature, threshold, left, right, value)"""
+
+    name = "gbt"
+
+    def __init__(self, artifact: dict):
+        self.transformer = FeatureTransformer(artifact["features"])
+        self.base_score = float(artifact.get("base_score", 0.0))
+        self.learning_rate = float(artifact.get("learning_rate", 1.0))
+        self.version = artifact.get("version")
+        n_features = len(self.transformer.feature_names)
+        self.trees = []
+        for tree in artifact["trees"]:
+            nodes = (
+                tuple(int(f) for f in tree["feature"]),
+                tuple(float(t) for t in tree["threshold"]),
+                tuple(int(i) for i in tree["left"]),
+                tuple(int(i) for i in tree["right"]),
+                tuple(float(v) for v in tree["value"]),
+            )
+            if any(f >= n_features for f in nodes[0]):
+                raise ValueError("Artefato inconsistente: árvore referencia feature inexistente")
+            self.trees.append(nodes)
+
+    def _predict_row(self, row) -> float:
+        total = 0.0
+        for feature, threshold, left, right, value in self.trees:
+            node = 0
+            # Nós folha têm feature == -1
+            while feature[node] >= 0:
+                node = left[node] if row[feature[node]] <= threshold[node] else right[node]
+            total += value[node]
+        return _sigmoid(self.base_score + self.learning_rate * total)
+
+    def score_batch(self, logs):
+        predict = self._predict_row
+        return [predict(row) for row in self.transformer.transform(logs)]
+
+    def describe(self) -> dict:
+        return {
+            "backend": self.name,
+            "version": self.version,
+            "features": self.transformer.feature_names,
+            "trees": len(self.trees)
+        }
+
+
+MODEL_BACKENDS = {
+    "logistic": LogisticBackend,
+    "gbt": TreeEnsembleBackend,
+}
+
+
+def artifact_path_for(name: str, model_dir: str = MODEL_DIR) -> str:
+    """Caminho de um artefato pelo nome do arquivo, restrito ao diretório de modelos"""
+    base = os.path.realpath(model_dir)
+    path = os.path.realpath(os.path.join(base, name))
+    # Só nomes de arquivo: sem separadores, ".." ou link simbólico para fora do diretório
+    if not name or os.path.basename(name) != name or os.path.dirname(path) != base:
+        raise ValueError(f"Artefato inválido: {name!r} (use o nome de um arquivo em {model_dir})")
+    return path
+
+
+def load_backend(name: str, artifact_path: str = None) -> ScoringBackend:
+    """Cria um backend; backends treinados leem o artefato JSON uma única vez"""
+    if name == RulesBackend.name:
+        return RulesBackend()
+    if not artifact_path:
+        raise ValueError(f"Backend '{name}' requer um artefato de modelo")
+    with open(artifact_path, encoding="utf-8") as f:
+        artifact = json.load(f)
+    model_type = artifact.get("type", name)
+    if model_type not in MODEL_BACKENDS:
+        raise ValueError(f"Tipo de modelo desconhecido: {model_type}")
+    return MODEL_BACKENDS[model_type](artifact)
+
+
+def _batch_bucket(size: int) -> int:
+    """Agrupa tamanhos de lote em potências de 2 (1, 2, 4, 8, ...)"""
+    return 1 << (max(size, 1).bit_length() - 1)
+
+
+class ScoringEngine:
+    """Ponto único de score: troca de backend a quente e latência por tamanho de lote"""
+
+    def __init__(self, backend: ScoringBackend = None):
+        self.backend = backend or RulesBackend()
+        self.loaded_at = time.time()
+        self._lock = threading.Lock()
+        self._latency = {}
+
+    def load(self, name: str, artifact_path: str = None) -> dict:
+        """Carrega um novo backend e só então o coloca em uso (falhas mantêm o atual)"""
+        backend = load_backend(name, artifact_path)
+        with self._lock:
+            self.backend = backend
+            self.loaded_at = time.time()
+            self._latency = {}
+        return self.describe()
+
+    def score(self, log) -> float:
+        return self.score_batch([log])[0]
+
+    def score_batch(self, logs):
+        if not logs:
+            return []
+        backend = self.backend
+        start = time.perf_counter()
+        business_calendar.annotate(logs)
+        scores = backend.score_batch(logs)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._record(len(logs), elapsed_ms)
+        return scores
+
+    def _record(self, size: int, elapsed_ms: float):
+        bucket = _batch_bucket(size)
+        with self._lock:
+            stats = self._latency.get(bucket)
+            if stats is None:
+                stats = self._latency[bucket] = {"batches": 0, "events": 0, "total_ms": 0.0, "max_ms": 0.0}
+            stats["batches"] += 1
+            stats["events"] += size
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def latency_report(self) -> list:
+        with self._lock:
+            items = sorted(self._latency.items())
+        return [
+            {
+                "batch_size": bucket,
+                "batches": s["batches"],
+                "events": s["events"],
+                "avg_batch_ms": round(s["total_ms"] / s["batches"], 4),
+                "avg_event_us": round(s["total_ms"] * 1000 / s["events"], 2),
+                "max_batch_ms": round(s["max_ms"], 4)
+            }
+            for bucket, s in items
+        ]
+
+    def describe(self) -> dict:
+        info = self.backend.describe()
+        info["loaded_at"] = self.loaded_at
+        return info
+
+
+# Instância compartilhada pela API
+scoring_engine = ScoringEngine()
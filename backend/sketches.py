@@ -0,0 +1,285 @@
+import base64
+import hashlib
+import heapq
+import math
+import threading
+import time
+from backend.config import SKETCH_CONFIG, THREAT_SCORE_THRESHOLD
+
+_POW2_NEG = [2.0 ** -r for r in range(65)]
+
+
+def _hash64(item: str) -> int:
+    return int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """Contagem aproximada de distintos: 2^p registradores de 1 byte, erro relativo ~1.04/sqrt(2^p)"""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, item: str):
+        h = _hash64(item)
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        if other.p != self.p:
+            raise ValueError("HyperLogLog com precisões diferentes")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(_POW2_NEG[r] for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Correção para cardinalidades pequenas (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def to_state(self) -> dict:
+        return {"p": self.p, "registers": base64.b64encode(bytes(self.registers)).decode("ascii")}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "HyperLogLog":
+        sketch = cls(state["p"])
+        sketch.registers = bytearray(base64.b64decode(state["registers"]))
+        return sketch
+
+
+class SpaceSaving:
+    """Top-K aproximado (Space-Saving): k contadores que nunca subestimam
+
+    Num único fluxo a superestimação de cada item é no máximo total/k; depois de merges vale o
+    erro acumulado em cada contador (max_overestimate).
+    """
+
+    def __init__(self, k: int = 100):
+        self.k = k
+        self.counters = {}  # item -> [peso, erro]
+        self.total = 0.0
+        # Heap (peso, item) com uma entrada por item; incrementos não atualizam a entrada,
+        # que só é corrigida ao chegar ao topo (o peso real nunca é menor que o da entrada)
+        self._heap = []
+
+    def add(self, item: str, weight: float = 1.0):
+        self.total += weight
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+            return
+        if len(self.counters) < self.k:
+            self.counters[item] = [weight, 0.0]
+            heapq.heappush(self._heap, (weight, item))
+            return
+        # Substitui o menor contador; o novo item herda o valor dele como erro
+        floor = self._pop_min()
+        self.counters[item] = [floor + weight, floor]
+        heapq.heappush(self._heap, (floor + weight, item))
+
+    def _pop_min(self) -> float:
+        heap = self._heap
+        while True:
+            weight, item = heapq.heappop(heap)
+            current = self.counters[item][0]
+            if current == weight:
+                del self.counters[item]
+                return weight
+            heapq.heappush(heap, (current, item))
+
+    def _rebuild_heap(self):
+        self._heap = [(counter[0], item) for item, counter in self.counters.items()]
+        heapq.heapify(self._heap)
+
+    def floor(self) -> float:
+        """Menor contador com o resumo cheio: limite do valor real de qualquer item fora dele"""
+        if len(self.counters) < self.k:
+            return 0.0
+        return min(counter[0] for counter in self.counters.values())
+
+    def merge(self, other: "SpaceSaving"):
+        """Merge de Agarwal et al. (Mergeable Summaries)
+
+        Um item ausente de um dos resumos pode ter até o menor contador daquele resumo: soma esse
+        valor ao peso e ao erro do item. Depois ficam os k maiores; os descartados têm valor real
+        no máximo igual ao novo menor contador.
+        """
+        floor, other_floor = self.floor(), other.floor()
+        merged = {}
+        for item in self.counters.keys() | other.counters.keys():
+            weight, error = self.counters.get(item, (floor, floor))
+            other_weight, other_error = other.counters.get(item, (other_floor, other_floor))
+            merged[item] = [weight + other_weight, error + other_error]
+        if len(merged) > self.k:
+            merged = dict(heapq.nlargest(self.k, merged.items(), key=lambda kv: (kv[1][0], kv[0])))
+        self.counters = merged
+        self.total += other.total
+        self._rebuild_heap()
+
+    def max_overestimate(self) -> float:
+        """Maior superestimação possível de um valor devolvido (erro acumulado dos contadores)"""
+        return max((counter[1] for counter in self.counters.values()), default=0.0)
+
+    def top(self, n: int) -> list:
+        items = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)[:n]
+        return [{"item": item, "value": weight, "max_error": error} for item, (weight, error) in items]
+
+    def to_state(self) -> dict:
+        return {"k": self.k, "total": self.total, "counters": self.counters}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "SpaceSaving":
+        sketch = cls(state["k"])
+        sketch.total = state["total"]
+        sketch.counters = {item: list(counter) for item, counter in state["counters"].items()}
+        sketch._rebuild_heap()
+        return sketch
+
+
+# Dimensões mantidas por bucket: nome -> função(log) -> chave
+DIMENSIONS = {
+    "ip_address": lambda log: log.ip_address,
+    "country": lambda log: log.country_code,
+    "asset_name": lambda log: log.asset_name,
+    "network_zone": lambda log: log.network_zone,
+}
+TOP_METRICS = ("events", "threat_score")
+
+
+class SketchBucket:
+    """Sketches de um intervalo de tempo (HLL e Space-Saving por dimensão)"""
+
+    def __init__(self, config: dict):
+        self.distinct = {dim: HyperLogLog(config["hll_precision"]) for dim in DIMENSIONS}
+        self.distinct_threats = {dim: HyperLogLog(config["hll_precision"]) for dim in DIMENSIONS}
+        self.top = {(dim, metric): SpaceSaving(config["top_k"]) for dim in DIMENSIONS for metric in TOP_METRICS}
+
+    def merge(self, other: "SketchBucket"):
+        """Mescla outro bucket (ex.: o mesmo intervalo vindo de outro worker)"""
+        for dim in DIMENSIONS:
+            self.distinct[dim].merge(other.distinct[dim])
+            self.distinct_threats[dim].merge(other.distinct_threats[dim])
+        for key, sketch in other.top.items():
+            self.top[key].merge(sketch)
+
+    def to_state(self) -> dict:
+        return {
+            "distinct": {dim: s.to_state() for dim, s in self.distinct.items()},
+            "distinct_threats": {dim: s.to_state() for dim, s in self.distinct_threats.items()},
+            "top": {f"{dim}|{metric}": s.to_state() for (dim, metric), s in self.top.items()}
+        }
+
+    @classmethod
+    def from_state(cls, state: dict, config: dict) -> "SketchBucket":
+        bucket = cls(config)
+        bucket.distinct = {dim: HyperLogLog.from_state(s) for dim, s in state["distinct"].items()}
+        bucket.distinct_threats = {dim: HyperLogLog.from_state(s) for dim, s in state["distinct_threats"].items()}
+        bucket.top = {tuple(key.split("|")): SpaceSaving.from_state(s) for key, s in state["top"].items()}
+        return bucket
+
+
+class SketchStore:
+    """Sketches por bucket de tempo; consultas mesclam no máximo `retention_buckets` buckets"""
+
+    def __init__(self, config: dict = SKETCH_CONFIG):
+        self.config = config
+        self.bucket_seconds = config["bucket_seconds"]
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, bucket_id: int) -> SketchBucket:
+        bucket = self._buckets.get(bucket_id)
+        if bucket is None:
+            bucket = self._buckets[bucket_id] = SketchBucket(self.config)
+            oldest_allowed = bucket_id - self.config["retention_buckets"]
+            for stale in [b for b in self._buckets if b <= oldest_allowed]:
+                del self._buckets[stale]
+        return bucket
+
+    def update_batch(self, logs, scores):
+        with self._lock:
+            for log, score in zip(logs, scores):
+                bucket = self._bucket(int(log.ts // self.bucket_seconds))
+                is_threat = score > THREAT_SCORE_THRESHOLD
+                for dim, key_of in DIMENSIONS.items():
+                    key = key_of(log)
+                    if not key:
+                        continue
+                    bucket.distinct[dim].add(key)
+                    if is_threat:
+                        bucket.distinct_threats[dim].add(key)
+                    bucket.top[(dim, "events")].add(key)
+                    bucket.top[(dim, "threat_score")].add(key, score)
+
+    def _merged(self, hours: float, pick, empty):
+        """Mescla um sketch dos buckets da janela (custo proporcional à janela, não ao histórico)"""
+        now_bucket = int(time.time() // self.bucket_seconds)
+        first = now_bucket - int(math.ceil(hours * 3600 / self.bucket_seconds)) + 1
+        merged = empty()
+        with self._lock:
+            for bucket_id, bucket in self._buckets.items():
+                if first <= bucket_id <= now_bucket:
+                    merged.merge(pick(bucket))
+        return merged
+
+    def distinct(self, dimension: str, hours: float, threats_only: bool = False) -> dict:
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Dimensão desconhecida: {dimension}")
+        sketch = self._merged(
+            hours,
+            lambda bucket: (bucket.distinct_threats if threats_only else bucket.distinct)[dimension],
+            lambda: HyperLogLog(self.config["hll_precision"])
+        )
+        return {
+            "dimension": dimension,
+            "hours": hours,
+            "threats_only": threats_only,
+            "estimate": sketch.count(),
+            "relative_std_error": round(sketch.relative_error, 4)
+        }
+
+    def top(self, dimension: str, metric: str, hours: float, n: int) -> dict:
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Dimensão desconhecida: {dimension}")
+        if metric not in TOP_METRICS:
+            raise ValueError(f"Métrica desconhecida: {metric}")
+        sketch = self._merged(
+            hours,
+            lambda bucket: bucket.top[(dimension, metric)],
+            lambda: SpaceSaving(self.config["top_k"])
+        )
+        return {
+            "dimension": dimension,
+            "metric": metric,
+            "hours": hours,
+            "total": sketch.total,
+            # Space-Saving nunca subestima; cada item traz o próprio max_error
+            "max_overestimate": sketch.max_overestimate(),
+            "items": sketch.top(n)
+        }
+
+    def export_state(self) -> dict:
+        with self._lock:
+            return {str(bucket_id): bucket.to_state() for bucket_id, bucket in self._buckets.items()}
+
+    def merge_state(self, state: dict) -> int:
+        with self._lock:
+            for bucket_id, bucket_state in state.items():
+                other = SketchBucket.from_state(bucket_state, self.config)
+                self._bucket(int(bucket_id)).merge(other)
+        return len(state)
+
+
+# Instância compartilhada pelo pipeline de ingestão
+sketch_store = SketchStore()
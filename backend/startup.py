@@ -0,0 +1,103 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Momento em que este módulo foi importado (fallback quando /proc não existe)
+_IMPORT_TIME = time.time()
+
+
+def process_start_time() -> float:
+    """Retorna o epoch de início do processo (Linux via /proc, senão o import do módulo)"""
+    try:
+        with open("/proc/self/stat") as f:
+            # O nome do processo pode conter espaços, então corta após o ')'
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        boot_time = time.time() - uptime
+        return boot_time + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return _IMPORT_TIME
+
+
+class StartupReport:
+    """Registra a duração de cada fase da inicialização do worker"""
+
+    def __init__(self, target_ms: float):
+        self.target_ms = target_ms
+        self.process_start = process_start_time()
+        self.phases = []
+        self.ready_at = None
+
+    def phase(self, name: str):
+        """Context manager que cronometra uma fase da inicialização"""
+        report = self
+
+        class _Phase:
+            def __enter__(self):
+                self.start = time.perf_counter()
+                return self
+
+            def __exit__(self, exc_type, exc, tb):
+                elapsed = (time.perf_counter() - self.start) * 1000
+                report.phases.append({
+                    "name": name,
+                    "ms": round(elapsed, 2),
+                    "ok": exc_type is None
+                })
+                return False
+
+        return _Phase()
+
+    def mark_ready(self):
+        """Marca o worker como pronto e registra o relatório no log"""
+        self.ready_at = time.time()
+        total = self.ready_ms
+        phases = ", ".join(f"{p['name']}={p['ms']}ms" for p in self.phases)
+        if total > self.target_ms:
+            logger.warning(f"Worker pronto em {total:.0f}ms (meta {self.target_ms:.0f}ms): {phases}")
+        else:
+            logger.info(f"Worker pronto em {total:.0f}ms: {phases}")
+
+    @property
+    def ready_ms(self) -> float:
+        if self.ready_at is None:
+            return 0.0
+        return (self.ready_at - self.process_start) * 1000
+
+    def as_dict(self) -> dict:
+        return {
+            "ready": self.ready_at is not None,
+            "ready_ms": round(self.ready_ms, 2),
+            "target_ms": self.target_ms,
+            "within_target": self.ready_at is not None and self.ready_ms <= self.target_ms,
+            "phases": self.phases
+        }
+
+
+def warm_pool(engine, size: int) -> int:
+    """Abre `size` conexões em paralelo para aquecer o pool e as devolve em seguida"""
+    if size <= 0:
+        return 0
+
+    connections = []
+    error = None
+    try:
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            futures = [executor.submit(engine.connect) for _ in range(size)]
+            # Cada resultado é coletado: uma falha não pode deixar abertas as conexões das demais
+            for future in futures:
+                try:
+                    connections.append(future.result())
+                except Exception as e:
+                    error = error or e
+    finally:
+        for conn in connections:
+            conn.close()
+    if error is not None:
+        raise error
+    return len(connections)
@@ -0,0 +1,267 @@
+import ipaddress
+import logging
+import select
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from backend.config import TENANT_CONFIG, COMPANY_NETWORK, NETWORK_ZONES
+from backend.models import Tenant, Asset
+from backend.asset_registry import AssetEntry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = TENANT_CONFIG["default_tenant"]
+# Zona de IPs fora de todas as redes internas do tenant
+EXTERNAL_ZONE = "external"
+
+
+class UnknownTenantError(KeyError):
+    """Tenant sem configuração no banco"""
+
+
+class CidrIndex:
+    """Longest-prefix match: um dicionário rede -> valor por tamanho de prefixo
+
+    O custo de um lookup é proporcional ao número de tamanhos de prefixo distintos (em geral
+    poucos), não ao número de redes cadastradas.
+    """
+
+    def __init__(self, entries):
+        tables = {}
+        for cidr, value in entries:
+            network = ipaddress.ip_network(cidr, strict=False)
+            key = (network.version, network.prefixlen)
+            tables.setdefault(key, {})[int(network.network_address)] = value
+        self._tables = {4: [], 6: []}
+        for (version, prefixlen), table in sorted(tables.items(), key=lambda item: -item[0][1]):
+            bits = 32 if version == 4 else 128
+            mask = ((1 << prefixlen) - 1) << (bits - prefixlen)
+            self._tables[version].append((mask, table))
+
+    def lookup(self, ip_int: int, version: int = 4):
+        if ip_int is None:
+            return None
+        for mask, table in self._tables[version]:
+            value = table.get(ip_int & mask)
+            if value is not None:
+                return value
+        return None
+
+
+class CompiledTenant:
+    """Classificador de um tenant: zonas por CIDR, IPs autorizados e mapa de ativos"""
+
+    def __init__(self, tenant_id: str, network: dict, assets: dict, version: int = 0):
+        self.id = tenant_id
+        self.version = version
+        self.assets = assets
+        internal = network.get("internal_networks") or {}
+        self.zones = CidrIndex(
+            (info["range"], info.get("zone", name)) for name, info in internal.items()
+        )
+        self.authorized = CidrIndex(
+            [(info["range"], True) for info in internal.values()]
+            + [(ip, True) for ip in (network.get("authorized_external_ips") or {})]
+        )
+
+    def asset(self, ip_address: str):
+        return self.assets.get(ip_address)
+
+    def zone(self, ip_int: int, version: int = 4) -> str:
+        return self.zones.lookup(ip_int, version) or EXTERNAL_ZONE
+
+    def is_authorized(self, ip_int: int, version: int = 4) -> bool:
+        return self.authorized.lookup(ip_int, version) is not None
+
+
+def default_network() -> dict:
+    """Rede do tenant padrão com as mesmas zonas de analyze_ip (local/vpn/dmz)"""
+    return {
+        "internal_networks": {zone: {"range": cidr} for zone, cidr in NETWORK_ZONES.items()},
+        "authorized_external_ips": COMPANY_NETWORK["authorized_external_ips"],
+    }
+
+
+class TenantRegistry:
+    """Classificadores compilados por tenant em cache LRU, invalidados por notificação
+
+    O acesso na ingestão é um lookup no OrderedDict (custo independente do número de tenants);
+    só uma falta de cache lê o banco. Alterações feitas por qualquer worker disparam
+    NOTIFY no PostgreSQL e os demais descartam a versão compilada.
+    """
+
+    def __init__(self, config: dict = TENANT_CONFIG, session_factory=None):
+        self.config = config
+        self._session_factory = session_factory
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._listener = None
+        self._stop = threading.Event()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _session(self) -> Session:
+        if self._session_factory is None:
+            from backend.database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    # Lookup
+
+    def get(self, tenant_id: str = None) -> CompiledTenant:
+        tenant_id = tenant_id or DEFAULT_TENANT
+        with self._lock:
+            tenant = self._cache.get(tenant_id)
+            if tenant is not None:
+                self._cache.move_to_end(tenant_id)
+                self.counters["hits"] += 1
+                return tenant
+            self.counters["misses"] += 1
+        tenant = self._load(tenant_id)
+        with self._lock:
+            self._cache[tenant_id] = tenant
+            self._cache.move_to_end(tenant_id)
+            while len(self._cache) > self.config["cache_size"]:
+                self._cache.popitem(last=False)
+                self.counters["evictions"] += 1
+        return tenant
+
+    def _load(self, tenant_id: str) -> CompiledTenant:
+        try:
+            with self._session() as db:
+                row = db.get(Tenant, tenant_id)
+                if row is None:
+                    if tenant_id == DEFAULT_TENANT:
+                        return self._fallback_default()
+                    raise UnknownTenantError(tenant_id)
+                assets = db.query(Asset).filter(Asset.tenant_id == tenant_id).all()
+                return CompiledTenant(
+                    tenant_id, row.network or {},
+                    {
+                        asset.ip_address: AssetEntry(asset.ip_address, asset.name, asset.type,
+                                                     asset.criticality, asset.id)
+                        for asset in assets
+                    },
+                    row.version or 0
+                )
+        except UnknownTenantError:
+            raise
+        except Exception as e:
+            if tenant_id != DEFAULT_TENANT:
+                raise
+            # Sem banco o tenant padrão continua funcionando com a configuração local
+            logger.warning(f"Tenant padrão carregado da configuração local: {e}")
+            return self._fallback_default()
+
+    @staticmethod
+    def _fallback_default() -> CompiledTenant:
+        from backend.asset_registry import asset_registry
+        return CompiledTenant(DEFAULT_TENANT, default_network(), dict(asset_registry.entries()))
+
+    def invalidate(self, tenant_id: str):
+        with self._lock:
+            if self._cache.pop(tenant_id, None) is not None:
+                self.counters["invalidations"] += 1
+
+    # Administração
+
+    def ensure_default(self, db: Session):
+        """Cria o tenant padrão a partir de COMPANY_NETWORK se ainda não existir"""
+        row = db.get(Tenant, DEFAULT_TENANT)
+        if row is None:
+            db.add(Tenant(id=DEFAULT_TENANT, name=COMPANY_NETWORK["name"], network=default_network(), version=1))
+            db.commit()
+        elif (row.network or {}).get("internal_networks") == COMPANY_NETWORK["internal_networks"]:
+            # Semeado por versões anteriores com os nomes de COMPANY_NETWORK (office/servers/wifi)
+            row.network = default_network()
+            row.version = (row.version or 0) + 1
+            row.updated_at = datetime.now()
+            db.commit()
+        self.invalidate(DEFAULT_TENANT)
+
+    def upsert(self, db: Session, tenant_id: str, name: str, network: dict, critical_assets: dict) -> dict:
+        """Grava a configuração de um tenant e avisa os demais workers"""
+        # Compila antes de gravar: CIDR inválido não chega ao banco
+        CompiledTenant(tenant_id, network, {})
+        row = db.get(Tenant, tenant_id)
+        if row is None:
+            row = Tenant(id=tenant_id, version=0)
+            db.add(row)
+        row.name = name
+        row.network = network
+        row.version = (row.version or 0) + 1
+        row.updated_at = datetime.now()
+
+        existing = {asset.ip_address: asset for asset in db.query(Asset).filter(Asset.tenant_id == tenant_id)}
+        for ip, info in critical_assets.items():
+            asset = existing.get(ip)
+            if asset is None:
+                asset = Asset(tenant_id=tenant_id, ip_address=ip)
+                db.add(asset)
+            asset.name, asset.type, asset.criticality = info["name"], info["type"], info["criticality"]
+        if db.get_bind().dialect.name == "postgresql":
+            # Entregue aos ouvintes somente no commit
+            db.execute(text("SELECT pg_notify(:channel, :tenant)"),
+                       {"channel": self.config["notify_channel"], "tenant": tenant_id})
+        db.commit()
+        self.invalidate(tenant_id)
+        return {"id": tenant_id, "version": row.version, "assets": len(critical_assets)}
+
+    def list_tenants(self, db: Session) -> list:
+        return [
+            {"id": row.id, "name": row.name, "version": row.version, "updated_at": row.updated_at}
+            for row in db.query(Tenant).order_by(Tenant.id)
+        ]
+
+    # Notificações (PostgreSQL LISTEN)
+
+    def start_listener(self, engine):
+        if self._listener is not None or engine.dialect.name != "postgresql" or not self.config["listen"]:
+            return
+        self._stop.clear()
+        self._listener = threading.Thread(target=self._listen, args=(engine,), name="tenant-listener", daemon=True)
+        self._listener.start()
+
+    def stop_listener(self):
+        if self._listener is None:
+            return
+        self._stop.set()
+        self._listener.join(timeout=5)
+        self._listener = None
+
+    def _listen(self, engine):
+        while not self._stop.is_set():
+            try:
+                connection = engine.raw_connection()
+                try:
+                    driver = connection.driver_connection
+                    driver.autocommit = True
+                    with driver.cursor() as cursor:
+                        cursor.execute(f'LISTEN "{self.config["notify_channel"]}"')
+                    # Reconectado: o que mudou no intervalo é desconhecido, descarta tudo
+                    with self._lock:
+                        self._cache.clear()
+                    while not self._stop.is_set():
+                        if select.select([driver], [], [], 1.0)[0]:
+                            driver.poll()
+                            while driver.notifies:
+                                self.invalidate(driver.notifies.pop(0).payload)
+                finally:
+                    connection.invalidate()
+            except Exception as e:
+                logger.warning(f"Falha no listener de tenants: {e}")
+                self._stop.wait(5)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "cached": len(self._cache),
+                "cache_size": self.config["cache_size"],
+                "listening": self._listener is not None
+            }
+
+
+# Instância compartilhada pela ingestão e pela API
+tenant_registry = TenantRegistry()
@@ -18,6 +18,7 @@ import {
 import * as d3 from "d3";
 import * as topojson from "topojson-client";
 import { Attack } from "../../types/components";
+import { Flow, FlowTracker, FlowUpdate } from "../../services/mapService";
 import {
   WorldTopology,
   GeoFeatureCollection,
@@ -28,6 +29,63 @@ const width = 1200;
 const height = 600;
 const minZoom = 1;
 const maxZoom = 8;
+const pollInterval = 5000;
+const windowMinutes = 60;
+
+// Centro aproximado [longitude, latitude] dos países de origem
+const COUNTRY_COORDINATES: Record<string, [number, number]> = {
+  AR: [-63.6167, -38.4161],
+  AU: [133.7751, -25.2744],
+  BR: [-51.9253, -14.235],
+  BY: [27.9534, 53.7098],
+  CA: [-106.3468, 56.1304],
+  CL: [-71.543, -35.6751],
+  CN: [104.1954, 35.8617],
+  CO: [-74.2973, 4.5709],
+  CU: [-77.7812, 21.5218],
+  DE: [10.4515, 51.1657],
+  EG: [30.8025, 26.8206],
+  ES: [-3.7492, 40.4637],
+  FR: [2.2137, 46.2276],
+  GB: [-3.436, 55.3781],
+  HK: [114.1095, 22.3964],
+  ID: [113.9213, -0.7893],
+  IN: [78.9629, 20.5937],
+  IR: [53.688, 32.4279],
+  IT: [12.5674, 41.8719],
+  JP: [138.2529, 36.2048],
+  KP: [127.5101, 40.3399],
+  KR: [127.7669, 35.9078],
+  MM: [95.956, 21.9162],
+  MX: [-102.5528, 23.6345],
+  NG: [8.6753, 9.082],
+  NL: [5.2913, 52.1326],
+  PK: [69.3451, 30.3753],
+  PL: [19.1451, 51.9194],
+  PT: [-8.2245, 39.3999],
+  RO: [24.9668, 45.9432],
+  RU: [37.6173, 55.7558],
+  SE: [18.6435, 60.1282],
+  SG: [103.8198, 1.3521],
+  TR: [35.2433, 38.9637],
+  UA: [31.1656, 48.3794],
+  US: [-98.5795, 39.8283],
+  VE: [-66.5897, 6.4238],
+  VN: [108.2772, 14.0583],
+  ZA: [22.9375, -30.5595],
+};
+
+// Sede (destino de todos os fluxos); zonas internas ficam ao redor dela
+const HEADQUARTERS: [number, number] = [-46.6333, -23.5505]; // São Paulo
+
+// Cor por nível máximo do fluxo (sem nível, BAIXO, MÉDIO, ALTO, CRÍTICO)
+const LEVEL_COLORS = ["#00ccff", "#00ccff", "#ffd000", "#ff4500", "#ff0000"];
+
+const REGION_CODES: Record<string, string> = {
+  USA: "US",
+  CHINA: "CN",
+  RUSSIA: "RU",
+};
 
 export default function AttackMap() {
   const theme = useTheme();
@@ -81,6 +139,7 @@ export default function AttackMap() {
       .data(world.features)
       .enter()
       .append("path")
+      .attr("class", "country")
       .attr("d", function (d) {
         return path(d) || "";
       })
@@ -89,93 +148,6 @@ export default function AttackMap() {
       .style("stroke-width", "0.5px")
       .style("vector-effect", "non-scaling-stroke");
 
-    // Adiciona pontos de alerta
-    const alertPoints = [
-      { color: "#ff0000", count: 50, opacity: 0.4 }, // Vermelho (crítico)
-      { color: "#ff4500", count: 35, opacity: 0.35 }, // Laranja (alto)
-      { color: "#00ccff", count: 25, opacity: 0.3 }, // Ciano (médio)
-    ];
-
-    // Adiciona pontos apenas dentro dos países
-    alertPoints.forEach(({ color, count, opacity }) => {
-      // Distribui os pontos entre os países
-      for (let i = 0; i < count; i++) {
-        // Seleciona um país aleatório
-        const randomFeature =
-          world.features[Math.floor(Math.random() * world.features.length)];
-
-        // Tenta encontrar um ponto válido dentro do país
-        let attempts = 0;
-        let validPoint = false;
-
-        while (!validPoint && attempts < 15) {
-          // Calcula o bounding box do país
-          const bounds = path.bounds(randomFeature);
-
-          // Gera um ponto aleatório dentro do bounding box
-          const x =
-            bounds[0][0] + Math.random() * (bounds[1][0] - bounds[0][0]);
-          const y =
-            bounds[0][1] + Math.random() * (bounds[1][1] - bounds[0][1]);
-
-          // Cria o grupo para o alerta
-          const alertGroup = g.append("g");
-
-          // Círculo externo (halo)
-          alertGroup
-            .append("circle")
-            .attr("cx", x)
-            .attr("cy", y)
-            .attr("r", 4)
-            .style("fill", "none")
-            .style("stroke", color)
-            .style("stroke-width", "1px")
-            .style("opacity", opacity);
-
-          // Ponto central
-          const point = alertGroup
-            .append("circle")
-            .attr("cx", x)
-            .attr("cy", y)
-            .attr("r", 2)
-            .style("fill", color)
-            .style("opacity", opacity + 0.2);
-
-          // Animação de alerta
-          function pulse() {
-            const duration = 2000 + Math.random() * 1000;
-
-            // Anima o halo
-            alertGroup
-              .select("circle:first-child")
-              .transition()
-              .duration(duration)
-              .attr("r", 8)
-              .style("opacity", 0)
-              .transition()
-              .duration(0)
-              .attr("r", 4)
-              .style("opacity", opacity)
-              .on("end", pulse);
-
-            // Pisca o ponto central
-            point
-              .transition()
-              .duration(duration / 2)
-              .style("opacity", opacity + 0.4)
-              .transition()
-              .duration(duration / 2)
-              .style("opacity", opacity + 0.2);
-          }
-
-          // Inicia a animação com delay aleatório
-          setTimeout(pulse, Math.random() * 2000);
-          validPoint = true;
-          attempts++;
-        }
-      }
-    });
-
     // Configuração do zoom
     const zoom = d3
       .zoom<SVGSVGElement, unknown>()
@@ -183,7 +155,7 @@ export default function AttackMap() {
       .on("zoom", (event) => {
         g.attr("transform", event.transform);
         const scale = event.transform.k;
-        g.selectAll("path").style("stroke-width", `${0.5 / scale}px`);
+        g.selectAll("path.country").style("stroke-width", `${0.5 / scale}px`);
         g.selectAll("circle").attr("r", (_d, i, nodes) => {
           const baseRadius = d3.select(nodes[i]).attr("data-base-radius");
           return baseRadius ? Number(baseRadius) / scale : 3 / scale;
@@ -217,7 +189,7 @@ export default function AttackMap() {
           `M${sourcePos[0]},${sourcePos[1]}L${targetPos[0]},${targetPos[1]}`
         )
         .style("fill", "none")
-        .style("stroke", "rgba(0, 255, 255, 0.2)")
+        .style("stroke", attack.color ?? "rgba(0, 255, 255, 0.2)")
         .style("stroke-width", "2px")
         .style("vector-effect", "non-scaling-stroke");
 
@@ -227,7 +199,7 @@ export default function AttackMap() {
         .style("stroke-dasharray", `${length} ${length}`)
         .style("stroke-dashoffset", length)
         .transition()
-        .duration(2000)
+        .duration(attackSpeed * 10)
         .ease(d3.easeLinear)
         .style("stroke-dashoffset", 0)
         .on("end", () => {
@@ -267,107 +239,96 @@ export default function AttackMap() {
         .remove();
     };
 
-    // Simulação de ataques aleatórios
-    const generateRandomAttack = () => {
-      // Países com alta intensidade de ataques (IDs)
-      const highIntensityCountries = [
-        199, 214, 211, 178, 110, 162, 17, 203, 134, 58, 221, 44, 127,
+    // Fluxos reais: país de origem -> zona, a partir da matriz agregada do backend
+    const flowLayer = g.append("g");
+    const tracker = new FlowTracker(windowMinutes);
+    const zoneOrder: string[] = [];
+    const regions = selectedRegions.includes("ALL")
+      ? null
+      : selectedRegions.map((region) => REGION_CODES[region] ?? region);
+
+    const zonePosition = (zone: string): [number, number] => {
+      if (!zoneOrder.includes(zone)) zoneOrder.push(zone);
+      const angle = (zoneOrder.indexOf(zone) * 2 * Math.PI) / 6;
+      return [
+        HEADQUARTERS[0] + 3 * Math.cos(angle),
+        HEADQUARTERS[1] + 3 * Math.sin(angle),
       ];
+    };
 
-      // Obtém os centroides dos países de alta intensidade
-      const highIntensityTargets = world.features
-        .filter((_, index) => highIntensityCountries.includes(index + 1))
-        .map((feature) => path.centroid(feature))
-        .filter((coords) => coords && !isNaN(coords[0]) && !isNaN(coords[1]));
-
-      // 70% de chance de usar um país de alta intensidade
-      const useHighIntensity = Math.random() < 0.7;
-
-      let source, target;
-      if (useHighIntensity) {
-        // Seleciona aleatoriamente entre os países de alta intensidade
-        source =
-          highIntensityTargets[
-            Math.floor(Math.random() * highIntensityTargets.length)
-          ];
-        target =
-          highIntensityTargets[
-            Math.floor(Math.random() * highIntensityTargets.length)
-          ];
-      } else {
-        // Usa as cidades padrão para o resto dos ataques
-        const attacks: [number, number][] = [
-          [-23.5505, -46.6333], // São Paulo
-          [40.7128, -74.006], // New York
-          [51.5074, -0.1278], // London
-          [35.6762, 139.6503], // Tokyo
-          [22.3964, 114.1095], // Hong Kong
-          [-33.8688, 151.2093], // Sydney
-          [55.7558, 37.6173], // Moscow
-          [48.8566, 2.3522], // Paris
-          [1.3521, 103.8198], // Singapore
-          [-33.9249, 18.4241], // Cape Town
-        ];
-        source = projection(
-          attacks[Math.floor(Math.random() * attacks.length)]
-        );
-        target = projection(
-          attacks[Math.floor(Math.random() * attacks.length)]
-        );
-      }
-
-      if (source && target && source !== target) {
-        // Verifica se as coordenadas são válidas antes de adicionar o ataque
-        if (
-          !isNaN(source[0]) &&
-          !isNaN(source[1]) &&
-          !isNaN(target[0]) &&
-          !isNaN(target[1])
-        ) {
-          addAttack({
-            source: [source[0], source[1]],
-            target: [target[0], target[1]],
-            type: "attack",
-          });
-        }
-      }
+    const isVisible = (flow: Flow) =>
+      COUNTRY_COORDINATES[flow.country] !== undefined &&
+      (regions === null || regions.includes(flow.country));
+
+    const render = (update: FlowUpdate) => {
+      const flows = update.flows.filter(isVisible);
+      const maxEvents = d3.max(flows, (flow) => flow.events) ?? 1;
+      const strokeWidth = d3
+        .scaleSqrt()
+        .domain([1, Math.max(maxEvents, 1)])
+        .range([0.5, 4]);
+
+      flowLayer.selectAll("*").remove();
+      flows.forEach((flow) => {
+        const source = projection(COUNTRY_COORDINATES[flow.country]);
+        const target = projection(zonePosition(flow.zone));
+        if (!source || !target) return;
+
+        flowLayer
+          .append("path")
+          .attr("d", `M${source[0]},${source[1]}L${target[0]},${target[1]}`)
+          .style("fill", "none")
+          .style("stroke", LEVEL_COLORS[flow.level] ?? LEVEL_COLORS[0])
+          .style("stroke-width", `${strokeWidth(flow.events)}px`)
+          .style("opacity", 0.35)
+          .style("vector-effect", "non-scaling-stroke")
+          .append("title")
+          .text(
+            `${flow.country} → ${flow.zone}: ${flow.events} eventos, ${
+              flow.threats
+            } ameaças (${update.levels[flow.level] ?? "sem nível"})`
+          );
+
+        flowLayer
+          .append("circle")
+          .attr("cx", source[0])
+          .attr("cy", source[1])
+          .attr("r", 2)
+          .attr("data-base-radius", 2)
+          .style("fill", LEVEL_COLORS[flow.level] ?? LEVEL_COLORS[0])
+          .style("opacity", flow.threats > 0 ? 0.9 : 0.5);
+      });
 
-      // Gera múltiplos ataques simultaneamente para países de alta intensidade
-      if (useHighIntensity) {
-        const numExtraAttacks = Math.floor(Math.random() * 3) + 1; // 1 a 3 ataques extras
-        for (let i = 0; i < numExtraAttacks; i++) {
-          const extraSource =
-            highIntensityTargets[
-              Math.floor(Math.random() * highIntensityTargets.length)
-            ];
-          const extraTarget =
-            highIntensityTargets[
-              Math.floor(Math.random() * highIntensityTargets.length)
-            ];
-
-          if (extraSource && extraTarget && extraSource !== extraTarget) {
-            if (
-              !isNaN(extraSource[0]) &&
-              !isNaN(extraSource[1]) &&
-              !isNaN(extraTarget[0]) &&
-              !isNaN(extraTarget[1])
-            ) {
-              addAttack({
-                source: [extraSource[0], extraSource[1]],
-                target: [extraTarget[0], extraTarget[1]],
-                type: "attack",
-              });
-            }
-          }
-        }
-      }
+      // Anima só os fluxos que receberam eventos desde a última consulta
+      update.changed.filter(isVisible).forEach((flow) =>
+        addAttack({
+          source: COUNTRY_COORDINATES[flow.country],
+          target: zonePosition(flow.zone),
+          type: update.levels[flow.level] ?? "event",
+          color: LEVEL_COLORS[flow.level],
+        })
+      );
     };
 
-    // Inicia a simulação com intervalo mais curto para mais ataques
-    const interval = setInterval(generateRandomAttack, 500);
+    let active = true;
+    const poll = () =>
+      tracker
+        .poll()
+        .then((update) => {
+          if (active) render(update);
+        })
+        .catch(() => {
+          // Backend indisponível: tenta de novo no próximo ciclo
+        });
+
+    poll();
+    const interval = setInterval(poll, pollInterval);
 
-    return () => clearInterval(interval);
-  }, [worldData, isDark]);
+    return () => {
+      active = false;
+      clearInterval(interval);
+    };
+  }, [worldData, isDark, selectedRegions, attackSpeed]);
 
   return (
     <Paper
@@ -30,6 +30,8 @@ interface Threat {
   threat_score: number;
   is_internal: boolean;
   login_attempts: number;
+  occurrence_count?: number;
+  last_seen?: string | null;
 }
 
 export default function Threats() {
@@ -264,6 +266,17 @@ export default function Threats() {
                           fontWeight: 500,
                         }}
                       />
+                      {(threat.occurrence_count ?? 1) > 1 && (
+                        <Chip
+                          size="small"
+                          label={`${threat.occurrence_count}× ocorrências`}
+                          sx={{
+                            backgroundColor: alpha(theme.palette.error.main, 0.1),
+                            color: theme.palette.error.main,
+                            fontWeight: 500,
+                          }}
+                        />
+                      )}
                       <Chip
                         size="small"
                         label={`${threat.login_attempts} tentativas`}
@@ -313,6 +326,19 @@ export default function Threats() {
                     >
                       Detectado em: {formatDate(threat.timestamp)}
                     </Typography>
+                    {(threat.occurrence_count ?? 1) > 1 && threat.last_seen && (
+                      <Typography
+                        variant="caption"
+                        sx={{
+                          color: isDark
+                            ? alpha(theme.palette.common.white, 0.5)
+                            : alpha(theme.palette.common.black, 0.5),
+                          fontSize: "0.75rem",
+                        }}
+                      >
+                        Última ocorrência: {formatDate(threat.last_seen)}
+                      </Typography>
+                    )}
                   </Grid>
                 </Grid>
               </CardContent>
@@ -8,9 +8,27 @@ const api = axios.create({
   },
 });
 
+// Marcador da última escrita: reenviado para que as leituras seguintes não caiam
+// numa réplica que ainda não recebeu o que acabou de ser gravado
+const LAST_WRITE_HEADER = "X-Last-Write";
+let lastWrite: string | null = null;
+
+api.interceptors.request.use((config) => {
+  if (lastWrite) {
+    config.headers.set(LAST_WRITE_HEADER, lastWrite);
+  }
+  return config;
+});
+
 // Interceptor para tratar erros
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const marker = response.headers[LAST_WRITE_HEADER.toLowerCase()];
+    if (marker) {
+      lastWrite = marker;
+    }
+    return response;
+  },
   (error) => {
     if (error.code === "ERR_NETWORK") {
       console.error(
@@ -0,0 +1,145 @@
+import api from "./api";
+
+// [bucket, país, zona, eventos, ameaças, nível máximo]
+export type FlowCell = [number, number, number, number, number, number];
+
+export interface FlowResponse {
+  epoch: number;
+  bucket_seconds: number;
+  since: number;
+  latest: number;
+  sequence: number;
+  countries: string[];
+  zones: string[];
+  levels: (string | null)[];
+  cells: FlowCell[];
+}
+
+export interface Flow {
+  country: string;
+  zone: string;
+  events: number;
+  threats: number;
+  level: number;
+}
+
+export interface FlowUpdate {
+  flows: Flow[]; // Totais da janela
+  changed: Flow[]; // Eventos novos desde a consulta anterior
+  levels: (string | null)[];
+}
+
+const flowKey = (country: number, zone: number) => country * 65536 + zone;
+
+// Mantém as células da janela e pede ao backend só os buckets alterados desde a última resposta
+export class FlowTracker {
+  private epoch: number | null = null;
+  private sequence: number | null = null;
+  private countries: string[] = [];
+  private zones: string[] = [];
+  private levels: (string | null)[] = [];
+  private buckets = new Map<number, Map<number, FlowCell>>();
+
+  constructor(private minutes: number = 60, private tenantId?: string) {}
+
+  private reset() {
+    this.epoch = null;
+    this.sequence = null;
+    this.countries = [];
+    this.zones = [];
+    this.buckets.clear();
+  }
+
+  private async fetch(): Promise<FlowResponse> {
+    const params =
+      this.sequence === null
+        ? { minutes: this.minutes, tenant_id: this.tenantId }
+        : {
+            sequence: this.sequence,
+            countries: this.countries.length,
+            zones: this.zones.length,
+            tenant_id: this.tenantId,
+          };
+    const response = await api.get<FlowResponse>("/api/map/flows", { params });
+    return response.data;
+  }
+
+  async poll(): Promise<FlowUpdate> {
+    let data = await this.fetch();
+    if (this.epoch !== null && data.epoch !== this.epoch) {
+      // Worker reiniciado: ids das tabelas mudaram
+      this.reset();
+      data = await this.fetch();
+    }
+    const firstPoll = this.epoch === null;
+    this.epoch = data.epoch;
+    this.countries.push(...data.countries);
+    this.zones.push(...data.zones);
+    this.levels = data.levels;
+
+    // Buckets recebidos vêm completos e substituem os locais (inclusive antigos que
+    // receberam eventos atrasados)
+    const previous = new Map<number, number>();
+    const windowStart =
+      data.latest - (this.minutes * 60) / data.bucket_seconds + 1;
+    const updated = new Set(data.cells.map((cell) => cell[0]));
+    for (const [bucket, cells] of this.buckets) {
+      if (updated.has(bucket) || bucket < windowStart) {
+        if (updated.has(bucket)) {
+          cells.forEach((cell, key) =>
+            previous.set(key, (previous.get(key) ?? 0) + cell[3])
+          );
+        }
+        this.buckets.delete(bucket);
+      }
+    }
+    const received = new Map<number, number>();
+    for (const cell of data.cells) {
+      if (cell[0] < windowStart) continue;
+      const key = flowKey(cell[1], cell[2]);
+      let cells = this.buckets.get(cell[0]);
+      if (!cells) {
+        cells = new Map();
+        this.buckets.set(cell[0], cells);
+      }
+      cells.set(key, cell);
+      received.set(key, (received.get(key) ?? 0) + cell[3]);
+    }
+    this.sequence = data.sequence;
+
+    const totals = this.aggregate();
+    const changed = firstPoll
+      ? []
+      : [...totals]
+          .filter(
+            ([key]) => (received.get(key) ?? 0) > (previous.get(key) ?? 0)
+          )
+          .map(([, flow]) => flow);
+    const flows = [...totals.values()];
+    return { flows, changed, levels: this.levels };
+  }
+
+  private aggregate(): Map<number, Flow> {
+    const totals = new Map<number, Flow>();
+    for (const cells of this.buckets.values()) {
+      for (const [, country, zone, events, threats, level] of cells.values()) {
+        const key = flowKey(country, zone);
+        const flow = totals.get(key);
+        if (!flow) {
+          totals.set(key, {
+            country: this.countries[country] ?? "??",
+            zone: this.zones[zone] ?? "??",
+            events,
+            threats,
+            level,
+          });
+          continue;
+        }
+        flow.events += events;
+        flow.threats += threats;
+        flow.level = Math.max(flow.level, level);
+      }
+    }
+    return totals;
+  }
+}
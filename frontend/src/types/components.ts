@@ -11,4 +11,5 @@ export interface Attack {
   source: [number, number];
   target: [number, number];
   type: string;
+  color?: string;
 }
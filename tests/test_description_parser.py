@@ -0,0 +1,31 @@
+from backend.description_parser import parse_cve, parse_search_query, parse_technique
+
+
+def _terms(query: str) -> list:
+    """Cláusulas como tuplas (campo, valor, negado) para comparar"""
+    return [[(t["field"], t["value"], t["negated"]) for t in clause] for clause in parse_search_query(query)]
+
+
+def test_parse_description_fields():
+    description = "🔒 Ransomware | CVE-2023-5678 | T1486 - Data Encrypted for Impact"
+    assert parse_cve(description) == "CVE-2023-5678"
+    assert parse_technique(description) == "T1486"
+    assert parse_cve(None) is None and parse_technique("sem técnica") is None
+
+
+def test_structured_terms_respect_or():
+    assert _terms("CVE-2023-5678 OR T1486") == [[("cve", "CVE-2023-5678", False), ("technique", "T1486", False)]]
+
+
+def test_negated_structured_term_stays_structured():
+    assert _terms("-T1486 ransomware") == [[("technique", "T1486", True)], [("text", "ransomware", False)]]
+    assert _terms("-cve:cve-2021-44228") == [[("cve", "CVE-2021-44228", True)]]
+
+
+def test_phrases_and_operators_are_not_text():
+    assert _terms('"força bruta" OR ddos AND -"login ok"') == [
+        [("text", "força bruta", False), ("text", "ddos", False)],
+        [("text", "login ok", True)],
+    ]
+    assert _terms("OR") == []
+    assert parse_search_query("") == []
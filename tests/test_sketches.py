@@ -0,0 +1,100 @@
+import random
+from collections import Counter
+import pytest
+from backend.sketches import HyperLogLog, SpaceSaving
+
+
+def _stream(seed: int, events: int, heavy: dict, noise: int) -> list:
+    """Itens de ruído uniformes com alguns itens pesados misturados"""
+    rng = random.Random(seed)
+    items = [f"noise-{rng.randrange(noise)}" for _ in range(events)]
+    for item, count in heavy.items():
+        items.extend([item] * count)
+    rng.shuffle(items)
+    return items
+
+
+def _sketch(items: list, k: int) -> SpaceSaving:
+    sketch = SpaceSaving(k)
+    for item in items:
+        sketch.add(item)
+    return sketch
+
+
+def test_space_saving_single_stream_bounds():
+    items = _stream(1, 5000, {"heavy-a": 800, "heavy-b": 400}, 2000)
+    truth = Counter(items)
+    sketch = _sketch(items, 20)
+    for item, (weight, error) in sketch.counters.items():
+        assert truth[item] <= weight <= truth[item] + error
+        assert error <= sketch.total / sketch.k
+    for item, count in truth.items():
+        if item not in sketch.counters:
+            assert count <= sketch.floor()
+    assert [entry["item"] for entry in sketch.top(2)] == ["heavy-a", "heavy-b"]
+
+
+def test_space_saving_merge_never_underestimates():
+    # Um item com 30 eventos em cada uma de 24 horas, diluído em ruído em cada bucket
+    buckets = [_stream(hour, 300, {"steady": 30}, 500) for hour in range(24)]
+    merged = SpaceSaving(10)
+    for items in buckets:
+        merged.merge(_sketch(items, 10))
+    truth = Counter(item for items in buckets for item in items)
+
+    assert merged.total == sum(truth.values())
+    assert merged.counters["steady"][0] >= 720
+    assert merged.top(1)[0]["item"] == "steady"
+    for item, (weight, error) in merged.counters.items():
+        assert truth[item] <= weight <= truth[item] + error
+        assert error <= merged.max_overestimate()
+    for item, count in truth.items():
+        if item not in merged.counters:
+            assert count <= merged.floor()
+
+
+def test_space_saving_merge_of_partial_summaries_is_exact():
+    left, right = _sketch(["a", "a", "b"], 10), _sketch(["a", "c"], 10)
+    left.merge(right)
+    assert {item: counter[0] for item, counter in left.counters.items()} == {"a": 3, "b": 1, "c": 1}
+    assert left.max_overestimate() == 0
+
+
+def test_space_saving_state_round_trip():
+    sketch = _sketch(_stream(2, 1000, {"x": 100}, 300), 15)
+    restored = SpaceSaving.from_state(sketch.to_state())
+    assert restored.top(5) == sketch.top(5)
+    restored.add("x")
+    assert restored.counters["x"][0] == sketch.counters["x"][0] + 1
+
+
+def test_hyperloglog_estimate_within_error():
+    sketch = HyperLogLog(12)
+    for i in range(20000):
+        sketch.add(f"ip-{i}")
+    assert abs(sketch.count() - 20000) <= 3 * sketch.relative_error * 20000
+
+
+def test_hyperloglog_small_cardinality_and_duplicates():
+    sketch = HyperLogLog(12)
+    for _ in range(5):
+        for i in range(50):
+            sketch.add(f"ip-{i}")
+    assert abs(sketch.count() - 50) <= 2
+
+
+def test_hyperloglog_merge_is_union():
+    left, right, union = HyperLogLog(10), HyperLogLog(10), HyperLogLog(10)
+    for i in range(6000):
+        (left if i < 4000 else right).add(f"ip-{i}")
+        union.add(f"ip-{i}")
+    for i in range(2000, 4000):
+        right.add(f"ip-{i}")
+    left.merge(right)
+    assert left.registers == union.registers
+    assert HyperLogLog.from_state(left.to_state()).count() == left.count()
+
+
+def test_hyperloglog_merge_rejects_different_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(10).merge(HyperLogLog(12))